@@ -0,0 +1,74 @@
+"""
+Compares command dispatch cost against the number of registered commands.
+
+"per-handler" evaluates every handler pattern against the message, as
+Telethon does when each plugin registers its own NewMessage(pattern=...).
+"router" resolves the same message through `smartbot.router.CommandRouter`.
+Run from the repository root:
+
+    python -m benchmarks.command_dispatch
+"""
+import argparse
+import timeit
+
+from telethon import events
+
+from smartbot.router import CommandRouter
+
+
+class NullClient:
+    """Client stand-in that only accepts handler registrations."""
+
+    def add_event_handler(self, callback, event=None):
+        pass
+
+
+async def handler(event):
+    pass
+
+
+def build(count: int):
+    """
+    Builds `count` command handlers and two free-text handlers.
+
+    :return: The event builders and a router holding the same handlers.
+    """
+    builders = [events.NewMessage(pattern=f"/command{i}") for i in range(count)]
+    builders += [
+        events.NewMessage(pattern=r"(?:hello|hi) there"),
+        events.NewMessage(pattern=r"\d{4}-\d{2}-\d{2}"),
+    ]
+    router = CommandRouter(NullClient())
+    for builder in builders:
+        router.add(handler, builder)
+    return builders, router
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    messages = ["/command1 argument", "some free text message", "/unknown"]
+    print(f"{'commands':>8} | {'per-handler':>12} | {'router':>10}")
+    for count in (5, 50, 500, 5000):
+        builders, router = build(count)
+        patterns = [builder.pattern for builder in builders]
+
+        def per_handler():
+            for text in messages:
+                for pattern in patterns:
+                    pattern(text)
+
+        def routed():
+            for text in messages:
+                router.match(text)
+
+        calls = args.number * len(messages) // max(1, count // 50)
+        per_handler_cost = timeit.timeit(per_handler, number=calls // len(messages)) / calls
+        router_cost = timeit.timeit(routed, number=calls // len(messages)) / calls
+        print(f"{count:>8} | {per_handler_cost * 1e6:9.2f} µs | {router_cost * 1e6:7.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Compares conversation transition lookup against the number of transitions.
+
+"scan" checks every declared transition against the state and message, as
+flows written with one handler per step do. "table" resolves the same
+message through the table compiled by `smartbot.fsm.ConversationFlow`.
+Run from the repository root:
+
+    python -m benchmarks.fsm_dispatch
+"""
+import argparse
+import random
+import timeit
+from enum import Enum
+
+from smartbot.fsm import ANY_INPUT, ConversationFlow
+
+
+def build(states: int, triggers: int):
+    state_class = Enum("State", ["IDLE"] + [f"STEP_{i}" for i in range(states)])
+    flow = ConversationFlow()
+    transitions = []
+    for i in range(states):
+        source = f"STEP_{i}"
+        target = f"STEP_{(i + 1) % states}"
+        for j in range(triggers):
+            flow.transition(source, target, on=f"/option{j}")
+            transitions.append((state_class[source], f"/option{j}"))
+        flow.transition(source, "IDLE")
+        transitions.append((state_class[source], ANY_INPUT))
+    return state_class, flow.compile(state_class), transitions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--triggers", type=int, default=5, help="command triggers per state")
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f"{args.triggers} triggers per state, µs per message")
+    for states in (10, 100, 1000):
+        state_class, engine, transitions = build(states, args.triggers)
+        rng = random.Random(0)
+        messages = [
+            (state_class[f"STEP_{rng.randrange(states)}"], rng.choice([f"/option{rng.randrange(args.triggers)}", "texto"]))
+            for _ in range(1000)
+        ]
+
+        def scan():
+            for state, text in messages:
+                for source, trigger in transitions:
+                    if source is state and (trigger == text or trigger is ANY_INPUT):
+                        break
+
+        def table():
+            for state, text in messages:
+                engine.resolve(state, text)
+
+        number = max(1, args.number // 1000 // states * 10)
+        scanned = timeit.timeit(scan, number=number) / number / len(messages) * 1e6
+        compiled = timeit.timeit(table, number=50) / 50 / len(messages) * 1e6
+        print(f"  {len(transitions):6d} transitions   scan {scanned:9.3f}   table {compiled:6.3f}")
+
+
+if __name__ == "__main__":
+    main()
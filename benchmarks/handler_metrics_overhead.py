@@ -0,0 +1,57 @@
+"""
+Measures the overhead of the handler instrumentation on each call.
+
+Calls a trivial handler, plain and wrapped by `HandlerMetrics.instrument`,
+driving its coroutine directly so the event loop does not hide the
+difference, and reports the cost per call. Run from the repository root:
+
+    python -m benchmarks.handler_metrics_overhead --calls 1000000
+"""
+import argparse
+import time
+
+from telethon import events
+
+from smartbot.metrics import HandlerMetrics
+
+
+async def handler(event):
+    return event
+
+
+def measure(callback, calls: int) -> float:
+    """
+    Returns the seconds per call of `callback`, best of five runs.
+    """
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(calls):
+            try:
+                callback(None).send(None)
+            except StopIteration:
+                pass
+        best = min(best, time.perf_counter() - started)
+    return best / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    metrics = HandlerMetrics()
+    instrumented = metrics.instrument(handler, "benchmark.handler", events.NewMessage())
+    plain = measure(handler, args.calls)
+    wrapped = measure(instrumented, args.calls)
+
+    stats = next(iter(metrics))
+    print(f"{args.calls} calls, best of 5")
+    print(f"  plain         {plain * 1e6:6.3f} µs/call")
+    print(f"  instrumented  {wrapped * 1e6:6.3f} µs/call")
+    print(f"  overhead      {(wrapped - plain) * 1e6:6.3f} µs/call")
+    print(f"  recorded p50 {stats.latency.quantile(0.5) * 1e6:.1f} µs, p99 {stats.latency.quantile(0.99) * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Drives a `Client` with synthetic updates through a fake Telegram transport.
+
+N simulated users send commands (/start, /help, /button, /text) and press
+the buttons of the menus (`discipline:*`, `back_menu`) to the bundled
+plugins, loaded by the real `PluginLoader`. Nothing reaches the network:
+raw updates are fed to `Client._dispatch_update`, and every request the
+client makes (send, edit, delete, callback answers, lookups) is answered
+locally after a configurable latency. Reports updates per second,
+latency percentiles from arrival to the end of their dispatch, API calls
+and the process RSS. Run from the repository root:
+
+    python -m benchmarks.load_harness --users 1000 --updates 10 --latency 5
+
+Outbound rate limits are lifted by default, so the run measures SmartBot
+rather than Telegram's limits; `--limits` keeps the real ones. `--json`
+prints a single JSON line, for CI.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import resource
+from collections import Counter
+from datetime import datetime, timezone
+
+from telethon.sessions import MemorySession
+from telethon.tl import functions, types
+
+from smartbot.bot import Client
+from smartbot.outbound import OutboundLimiter
+
+BOT_ID = 999
+PLUGINS = dict(
+    root="plugins",
+    include=[
+        "commands.start",
+        "commands.help",
+        "commands.button",
+        "callbacks.go_back",
+        "message",
+    ],
+    manifest=None,
+)
+# Weighted actions of a simulated user: command text or callback data
+ACTIONS = [
+    ("/start", 1),
+    ("/help", 2),
+    ("/button", 3),
+    ("/text", 1),
+    (b"discipline:matematica", 3),
+    (b"back_menu", 2),
+]
+
+
+class FakeTransportClient(Client):
+    """
+    `Client` answering its requests locally instead of calling Telegram.
+    """
+
+    def __init__(self, latency: float, users: dict[int, types.User], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.users = users
+        self.requests: Counter = Counter()
+        # Chat of the messages whose buttons the users press
+        self.message_chats: dict[int, int] = {}
+        self._message_id = 0
+        self._mb_entity_cache.set_self_user(BOT_ID, True, 1)
+
+    def _next_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    def _message(self, user_id: int, message_id: int, text: str = "", markup=None) -> types.Message:
+        return types.Message(
+            id=message_id,
+            peer_id=types.PeerUser(user_id),
+            date=datetime.now(timezone.utc),
+            message=text,
+            out=True,
+            reply_markup=markup,
+        )
+
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if isinstance(request, list):
+            return [self._answer(item) for item in request]
+        return self._answer(request)
+
+    def _answer(self, request):
+        self.requests[type(request).__name__] += 1
+        now = datetime.now(timezone.utc)
+        if isinstance(request, functions.messages.SendMessageRequest):
+            return types.UpdateShortSentMessage(out=True, id=self._next_id(), pts=1, pts_count=1, date=now)
+        if isinstance(request, functions.messages.EditMessageRequest):
+            user_id = getattr(request.peer, "user_id", BOT_ID)
+            message = self._message(user_id, request.id, request.message or "", request.reply_markup)
+            return types.Updates(
+                updates=[types.UpdateEditMessage(message=message, pts=1, pts_count=1)],
+                users=[], chats=[], date=now, seq=0
+            )
+        if isinstance(request, functions.messages.DeleteMessagesRequest):
+            return types.messages.AffectedMessages(pts=1, pts_count=len(request.id))
+        if isinstance(request, functions.messages.SetBotCallbackAnswerRequest):
+            return True
+        if isinstance(request, functions.messages.GetMessagesRequest):
+            ids = [getattr(item, "id", item) for item in request.id]
+            messages = [self._message(self.message_chats.get(i, BOT_ID), i, "📚 Menu") for i in ids]
+            return types.messages.Messages(messages=messages, chats=[], users=[])
+        if isinstance(request, functions.users.GetUsersRequest):
+            return [self.users.get(getattr(item, "user_id", None)) or types.UserEmpty(0) for item in request.id]
+        raise NotImplementedError(f"The fake transport does not answer {type(request).__name__}")
+
+
+def make_update(user: types.User, action: str | bytes, update_id: int) -> types.TypeUpdate:
+    """
+    Builds the raw update a user action would produce.
+    """
+    now = datetime.now(timezone.utc)
+    peer = types.PeerUser(user.id)
+    if isinstance(action, bytes):
+        update = types.UpdateBotCallbackQuery(
+            query_id=update_id, user_id=user.id, peer=peer, msg_id=update_id,
+            chat_instance=user.id, data=action
+        )
+    else:
+        message = types.Message(id=update_id, peer_id=peer, date=now, message=action, from_id=peer)
+        update = types.UpdateNewMessage(message=message, pts=update_id, pts_count=1)
+    # Entities Telethon attaches to updates it receives
+    update._entities = {user.id: user}
+    return update
+
+
+async def drive(args: argparse.Namespace) -> dict:
+    users = {
+        user_id: types.User(id=user_id, access_hash=user_id * 7, first_name=f"User {user_id}")
+        for user_id in range(1, args.users + 1)
+    }
+    total = args.users * args.updates
+    limiter = None if args.limits else OutboundLimiter(
+        global_rate=1e9, chat_rate=1e9, chat_burst=1e9, group_rate=1e9, group_burst=1e9
+    )
+    client = FakeTransportClient(
+        args.latency / 1000,
+        users,
+        session=MemorySession(),
+        api_id=1,
+        api_hash="0" * 32,
+        plugins=PLUGINS,
+        update_workers=args.workers,
+        outbound_limiter=limiter,
+        trace_sample_rate=1.0,
+        trace_capacity=total,
+    )
+    client._mb_entity_cache.extend(list(users.values()), [])
+
+    from smartbot.plugin_loader import PluginLoader
+    client.plugin_loader = PluginLoader(client, PLUGINS)
+    client.plugin_loader.load_plugins()
+
+    rng = random.Random(0)
+    actions, weights = zip(*ACTIONS)
+    plan = [
+        make_update(users[user_id], rng.choices(actions, weights)[0], index * args.users + user_id)
+        for index in range(args.updates)
+        for user_id in users
+    ]
+    client.message_chats = {
+        update.msg_id: update.user_id
+        for update in plan if isinstance(update, types.UpdateBotCallbackQuery)
+    }
+
+    started = time.perf_counter()
+    interval = 1 / args.rate if args.rate else 0
+    for position, update in enumerate(plan):
+        await client._dispatch_update(update)
+        if interval:
+            delay = started + position * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif position % 1000 == 999:
+            # Let the workers run between bursts, as a socket read would
+            await asyncio.sleep(0)
+
+    scheduler = client.update_scheduler
+    while scheduler is not None and (scheduler.pending or scheduler.running):
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    await client.deletion_queue.flush()
+
+    latencies = sorted(
+        (trace.spans[1].end - trace.arrived) / 1e6
+        for trace in client.tracer.traces
+        if len(trace.spans) > 1 and trace.spans[1].end is not None
+    )
+
+    def percentile(q: float) -> float:
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+    if scheduler is not None:
+        await scheduler.close()
+    return {
+        "users": args.users,
+        "updates": total,
+        "latency_ms": args.latency,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(total / elapsed, 1),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "api_calls": sum(client.requests.values()),
+        "handler_errors": sum(stats.errors for stats in client.plugin_loader.metrics),
+        "rss_mib": round(_rss_mib(), 1),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _rss_mib() -> float:
+    """
+    Returns the current resident set size, or 0 where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--updates", type=int, default=10, help="updates sent by each user")
+    parser.add_argument("--latency", type=float, default=5.0, help="fake API latency in milliseconds")
+    parser.add_argument("--rate", type=float, default=0, help="updates per second, 0 sends them as fast as possible")
+    parser.add_argument("--workers", type=int, default=64, help="update workers of the client")
+    parser.add_argument("--limits", action="store_true", help="keep the real outbound rate limits")
+    parser.add_argument("--json", action="store_true", help="print a single JSON line")
+    args = parser.parse_args()
+
+    # The bundled plugins log every call at INFO
+    logging.basicConfig(level=logging.WARNING, force=True)
+    result = asyncio.run(drive(args))
+    if args.json:
+        print(json.dumps(result))
+        return
+
+    print(
+        f"{result['users']} users, {result['updates']} updates, "
+        f"{result['latency_ms']} ms API latency, {args.workers} workers"
+    )
+    print(f"  throughput  {result['updates_per_s']:10.1f} updates/s ({result['elapsed_s']} s)")
+    print(f"  latency     p50 {result['p50_ms']:.2f} ms   p95 {result['p95_ms']:.2f} ms   p99 {result['p99_ms']:.2f} ms")
+    print(f"  API calls   {result['api_calls']}, handler errors {result['handler_errors']}")
+    print(f"  memory      RSS {result['rss_mib']} MiB, max RSS {result['max_rss_mib']} MiB")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
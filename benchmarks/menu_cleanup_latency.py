@@ -0,0 +1,124 @@
+"""
+Measures click-to-response latency of menu handlers that clean up old messages.
+
+"inline" deletes the user's delete queue before running the handler, as
+`with_stack_and_cleanup` used to. "queued" is the current decorator, which
+hands the IDs to `smartbot.utils.deletion.DeletionQueue`. The fake API
+charges one round trip per request. Run from the repository root:
+
+    python -m benchmarks.menu_cleanup_latency
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from smartbot.utils.context import DELETE_KEY, UserDriver
+from smartbot.utils.deletion import DeletionQueue
+from smartbot.utils.menu import with_stack_and_cleanup
+
+
+class FakeSession:
+    """Session stand-in exposing what `UserDriver` needs."""
+
+    def __init__(self) -> None:
+        self.data = {}
+        self.menu_stack = []
+        self.delete_queue = []
+
+
+class FakeClient:
+    """Client stand-in whose API calls take one round trip."""
+
+    def __init__(self, rtt: float) -> None:
+        self.rtt = rtt
+        self.sessions: dict[int, FakeSession] = {}
+        self.deletion_queue = DeletionQueue(self.delete_messages)
+        self.delete_requests = 0
+
+    @property
+    def drivers(self):
+        return self
+
+    def __getitem__(self, user_id: int) -> UserDriver:
+        return UserDriver(self.sessions.setdefault(user_id, FakeSession()))
+
+    async def resolve_sender(self, event):
+        return event
+
+    async def delete_messages(self, chat_id, message_ids):
+        self.delete_requests += 1
+        await asyncio.sleep(self.rtt)
+
+    async def send_message(self, chat_id, message):
+        await asyncio.sleep(self.rtt)
+
+
+class FakeEvent:
+    """Message event stand-in, `id` doubles as the sender ID."""
+
+    message = None
+
+    def __init__(self, client: FakeClient, user_id: int) -> None:
+        self.client = client
+        self.id = self.sender_id = user_id
+
+
+def inline_cleanup(handler):
+    """The former decorator body: delete first, then run the handler."""
+
+    async def wrapper(event):
+        delete_queue = event.client.drivers[event.sender_id][DELETE_KEY]
+        if delete_queue:
+            await event.client.delete_messages(event.sender_id, delete_queue)
+            delete_queue.clear()
+        await handler(event)
+
+    return wrapper
+
+
+async def respond(event):
+    await event.client.send_message(event.sender_id, "menu")
+    event.client.drivers[event.sender_id][DELETE_KEY].extend(range(3))
+
+
+async def measure(decorate, users: int, clicks: int, rtt: float) -> tuple[list[float], int]:
+    client = FakeClient(rtt)
+    handler = decorate(respond)
+    latencies = []
+
+    async def user(user_id: int) -> None:
+        for _ in range(clicks):
+            started = time.monotonic()
+            await handler(FakeEvent(client, user_id))
+            latencies.append(time.monotonic() - started)
+
+    await asyncio.gather(*(user(user_id) for user_id in range(users)))
+    await client.deletion_queue.flush()
+    return latencies, client.delete_requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--clicks", type=int, default=10)
+    parser.add_argument("--rtt", type=float, default=0.05)
+    args = parser.parse_args()
+
+    variants = {
+        "inline": inline_cleanup,
+        "queued": with_stack_and_cleanup(push=False, cleanup=True),
+    }
+    print(f"{args.users} users x {args.clicks} clicks, {args.rtt * 1000:.0f} ms round trip")
+    for name, decorate in variants.items():
+        latencies, requests = asyncio.run(measure(decorate, args.users, args.clicks, args.rtt))
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(
+            f"  {name:<7} p50 {statistics.median(latencies) * 1000:7.1f} ms   "
+            f"p99 {p99 * 1000:7.1f} ms   delete requests {requests}"
+        )
+
+
+if __name__ == "__main__":
+    main()
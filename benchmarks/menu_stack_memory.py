@@ -0,0 +1,151 @@
+"""
+Measures the memory held by menu navigation stacks of active users.
+
+Every user clicks through menus drawn from a small set, and every click
+pushes a freshly decoded markup, as Telethon hands out a new object per
+message. "list" is the former unbounded list of (text, markup) tuples;
+"stack" and "compact" use `smartbot.utils.menu_stack.MenuStack`. The list
+layout is measured on a sample of users and extrapolated.
+
+Shared menus are interned once, so compact entries only pay off when most
+stacked menus are distinct, e.g. built per user (orders, search results).
+The second table pushes such menus, counting the interned entries too.
+Run from the repository root:
+
+    python -m benchmarks.menu_stack_memory --users 100000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from telethon.extensions import BinaryReader
+from telethon.tl.types import KeyboardButtonCallback, KeyboardButtonRow, ReplyInlineMarkup
+
+from smartbot.utils.menu_stack import MenuStack, intern_menu
+
+
+def build_menus(count: int) -> list[tuple[str, bytes]]:
+    """
+    Builds `count` menus of six buttons, returned with their serialized markup.
+    """
+    menus = []
+    for i in range(count):
+        rows = [
+            KeyboardButtonRow([
+                KeyboardButtonCallback(f"Opção {i}.{row}.{col}", f"menu:{i}:{row}:{col}".encode())
+                for col in range(2)
+            ])
+            for row in range(3)
+        ]
+        menus.append((f"📋 Menu {i}\nEscolha uma opção abaixo.", bytes(ReplyInlineMarkup(rows))))
+    return menus
+
+
+def measure(make_stack, users: int, clicks: int, menus: list[tuple[str, bytes]]) -> float:
+    """
+    Fills one stack per user and returns the traced bytes per user.
+
+    Plain lists get a newly decoded markup on every push. A `MenuStack`
+    keeps only the interned entry, which is looked up once per menu here
+    to save time, as serializing the pushed markup dominates the run.
+    """
+    rng = random.Random(0)
+    probe = make_stack()
+    interned = probe.compact if isinstance(probe, MenuStack) else None
+    if interned is not None:
+        entries = [intern_menu(text, BinaryReader(data).tgread_object(), interned) for text, data in menus]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    stacks = []
+    for _ in range(users):
+        stack = make_stack()
+        for _ in range(clicks):
+            i = rng.randrange(len(menus))
+            if interned is None:
+                text, data = menus[i]
+                stack.append((text, BinaryReader(data).tgread_object()))
+            else:
+                stack.append(entries[i])
+        stacks.append(stack)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del stacks
+    return used / users
+
+
+def build_user_menu(user: int, index: int) -> tuple[str, object]:
+    """
+    Builds a menu of six buttons that only one user sees.
+    """
+    rows = [
+        KeyboardButtonRow([
+            KeyboardButtonCallback(f"Pedido {user}.{index}.{row}.{col}", f"order:{user}:{index}:{row}:{col}".encode())
+            for col in range(2)
+        ])
+        for row in range(3)
+    ]
+    return f"📦 Pedido {user}.{index}\nEscolha uma opção abaixo.", ReplyInlineMarkup(rows)
+
+
+def measure_distinct(compact: bool, users: int, clicks: int, depth: int) -> float:
+    """
+    Fills one stack per user with menus no other user sees and returns the
+    traced bytes per user, interned entries included.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    stacks = []
+    for user in range(users):
+        stack = MenuStack(max_depth=depth, compact=compact)
+        for index in range(clicks):
+            stack.append(build_user_menu(user, index))
+        stacks.append(stack)
+
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del stacks
+    return used / users
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--clicks", type=int, default=50)
+    parser.add_argument("--menus", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=20)
+    parser.add_argument("--sample", type=int, default=2_000)
+    parser.add_argument("--distinct-users", type=int, default=5_000, help="users of the per-user menus run")
+    args = parser.parse_args()
+
+    menus = build_menus(args.menus)
+    variants = {
+        "list": (list, min(args.sample, args.users)),
+        "stack": (lambda: MenuStack(max_depth=args.depth), args.users),
+        "compact": (lambda: MenuStack(max_depth=args.depth, compact=True), args.users),
+    }
+    print(f"{args.users} users, {args.clicks} clicks over {args.menus} menus, depth {args.depth}")
+    for name, (make_stack, users) in variants.items():
+        per_user = measure(make_stack, users, args.clicks, menus)
+        total = per_user * args.users / 2 ** 20
+        note = f" (extrapolated from {users} users)" if users != args.users else ""
+        print(f"  {name:<8} {per_user:10.0f} B/user {total:10.1f} MiB total{note}")
+
+    print(f"{args.distinct_users} users, {args.clicks} clicks over menus built per user, depth {args.depth}")
+    results = {}
+    for name, compact in (("stack", False), ("compact", True)):
+        per_user = results[name] = measure_distinct(compact, args.distinct_users, args.clicks, args.depth)
+        total = per_user * args.distinct_users / 2 ** 20
+        print(f"  {name:<8} {per_user:10.0f} B/user {total:10.1f} MiB total")
+    print(f"  compact saves {1 - results['compact'] / results['stack']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
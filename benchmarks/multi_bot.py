@@ -0,0 +1,89 @@
+"""
+Measures the memory of many bots hosted by one `Supervisor` process.
+
+Each bot is a `FakeTransportClient` of the load harness with the bundled
+plugins, sharing the plugin modules, entity cache and outbound limiter,
+and handles a few updates from its users. The resident memory after the
+first bot is what every process costs when each bot runs alone; the
+growth for the following bots is what they cost in the shared process.
+Run from the repository root:
+
+    python -m benchmarks.multi_bot --bots 50
+"""
+import asyncio
+import argparse
+import functools
+import logging
+
+from telethon.sessions import MemorySession
+from telethon.tl import types
+
+from benchmarks.load_harness import PLUGINS, FakeTransportClient, make_update, _rss_mib
+from smartbot.outbound import OutboundLimiter
+from smartbot.plugin_loader import PluginLoader
+from smartbot.supervisor import Supervisor
+
+ACTIONS = ["/start", "/help", "/button", b"discipline:matematica", b"back_menu"]
+
+
+async def drive(args: argparse.Namespace) -> None:
+    users = {
+        user_id: types.User(id=user_id, access_hash=user_id * 7, first_name=f"User {user_id}")
+        for user_id in range(1, args.users + 1)
+    }
+    supervisor = Supervisor(
+        plugins=PLUGINS,
+        outbound_limiter=OutboundLimiter(
+            global_rate=1e9, chat_rate=1e9, chat_burst=1e9, group_rate=1e9, group_burst=1e9
+        ),
+        client_class=functools.partial(FakeTransportClient, 0, users),
+        api_id=1,
+        api_hash="0" * 32,
+    )
+    baseline = _rss_mib()
+    first = 0.0
+    update_id = 0
+    for index in range(args.bots):
+        client = supervisor.add(f"{1000 + index}:TOKEN", session=MemorySession())
+        client._mb_entity_cache.extend(list(users.values()), [])
+        client.plugin_loader = PluginLoader(client, PLUGINS)
+        client.plugin_loader.load_plugins()
+        for user in users.values():
+            for action in ACTIONS:
+                update_id += 1
+                client.message_chats[update_id] = user.id
+                await client._dispatch_update(make_update(user, action, update_id))
+        await asyncio.sleep(0.05)
+        if index == 0:
+            first = _rss_mib()
+
+    while any(bot.client.update_scheduler.pending or bot.client.update_scheduler.running
+              for bot in supervisor.bots.values()):
+        await asyncio.sleep(0.005)
+    total = _rss_mib()
+    per_bot = (total - first) / max(1, args.bots - 1)
+    errors = sum(
+        stats.errors for bot in supervisor.bots.values() for stats in bot.client.plugin_loader.metrics
+    )
+
+    print(f"{args.bots} bots, {args.users} users each, {update_id} updates, {errors} handler errors")
+    print(f"  imports              {baseline:8.1f} MiB")
+    print(f"  first bot            {first:8.1f} MiB  (one process per bot: {first * args.bots:.1f} MiB)")
+    print(f"  each additional bot  {per_bot:8.1f} MiB  (shared process: {total:.1f} MiB)")
+    for bot in supervisor.bots.values():
+        await bot.client.update_scheduler.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bots", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20, help="users of each bot")
+    args = parser.parse_args()
+
+    # The bundled plugins log every call at INFO
+    logging.basicConfig(level=logging.WARNING, force=True)
+    asyncio.run(drive(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Simulates outbound traffic through `smartbot.outbound.OutboundLimiter`.
+
+A fake API answers with a FloodWait the first time a "hot" chat is hit.
+The report shows the hot chat waiting on its own while the other chats
+keep their pace, and interactive replies overtaking a bulk backlog.
+Run from the repository root:
+
+    python -m benchmarks.outbound_floodwait
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from telethon.errors import FloodWaitError
+
+from smartbot.outbound import OutboundLimiter, Priority
+
+
+class FakeApi:
+    """API stand-in raising one FloodWait for the hot chat."""
+
+    def __init__(self, hot_chat: int, flood_wait: int) -> None:
+        self.hot_chat = hot_chat
+        self.flood_wait = flood_wait
+        self.flooded = False
+
+    async def send_message(self, chat_id: int, text: str) -> float:
+        await asyncio.sleep(0.005)
+        if chat_id == self.hot_chat and not self.flooded:
+            self.flooded = True
+            raise FloodWaitError(None, capture=self.flood_wait)
+        return time.monotonic()
+
+
+async def flood_isolation(chats: int, per_chat: int, flood_wait: int) -> None:
+    limiter = OutboundLimiter(global_rate=1000, chat_rate=20, chat_burst=5)
+    api = FakeApi(hot_chat=0, flood_wait=flood_wait)
+    started = time.monotonic()
+    finished: dict[int, float] = {}
+
+    async def chat_traffic(chat_id: int) -> None:
+        for i in range(per_chat):
+            await limiter.run(chat_id, api.send_message, chat_id, f"message {i}")
+        finished[chat_id] = time.monotonic() - started
+
+    await asyncio.gather(*(chat_traffic(chat_id) for chat_id in range(chats)))
+    others = [finished[chat_id] for chat_id in range(1, chats)]
+    print(f"flood isolation ({chats} chats x {per_chat} messages, {flood_wait}s FloodWait on chat 0)")
+    print(f"  hot chat done after     {finished[0]:6.2f} s")
+    print(f"  other chats done after  {statistics.median(others):6.2f} s median, {max(others):6.2f} s max")
+    print(f"  {limiter.stats()}")
+
+
+async def priority_lanes(bulk: int, interactive: int) -> None:
+    limiter = OutboundLimiter(global_rate=100, chat_rate=1000, chat_burst=1000)
+    api = FakeApi(hot_chat=-1, flood_wait=0)
+    latencies: dict[str, list[float]] = {"bulk": [], "interactive": []}
+
+    async def send(chat_id: int, lane: str, priority: Priority) -> None:
+        queued_at = time.monotonic()
+        await limiter.run(chat_id, api.send_message, chat_id, lane, priority=priority)
+        latencies[lane].append(time.monotonic() - queued_at)
+
+    tasks = [
+        asyncio.create_task(send(1_000_000 + i, "bulk", Priority.BULK))
+        for i in range(bulk)
+    ]
+    await asyncio.sleep(0.1)
+    for i in range(interactive):
+        tasks.append(asyncio.create_task(send(i, "interactive", Priority.INTERACTIVE)))
+        await asyncio.sleep(0.05)
+    await asyncio.gather(*tasks)
+
+    print(f"priority lanes ({bulk} bulk messages queued, {interactive} interactive replies, 100 msg/s)")
+    for lane, values in latencies.items():
+        print(f"  {lane:<12} p50 {statistics.median(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--per-chat", type=int, default=20)
+    parser.add_argument("--flood-wait", type=int, default=3)
+    args = parser.parse_args()
+
+    asyncio.run(flood_isolation(args.chats, args.per_chat, args.flood_wait))
+    asyncio.run(priority_lanes(bulk=300, interactive=20))
+
+
+if __name__ == "__main__":
+    main()
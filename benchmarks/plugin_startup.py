@@ -0,0 +1,138 @@
+"""
+Compares plugin loading time with eager, threaded and lazy imports.
+
+Generates synthetic plugins, each declaring two handlers and doing some
+import-time work that stands in for heavy dependencies: compiling
+regexes, which holds the GIL, and sleeping, which stands in for file
+reads and native code that release it. Then times
+`PluginLoader.load_plugins` in a fresh interpreter for each mode (the
+framework itself is imported beforehand and not counted), along
+with the first dispatch of a lazily loaded handler. Each mode is run
+without a plugin manifest, then twice with one: cold, then warm. The
+bytecode cache is cleared before every run, so the threaded runs only
+save the reading and compiling of the plugins, done in the pool; their
+import-time work still runs one module at a time. Run from the
+repository root:
+
+    python -m benchmarks.plugin_startup --plugins 500 --workers 8
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+PLUGIN_TEMPLATE = '''\
+import re
+import time
+from telethon import events
+from smartbot.router import CallbackRoute
+from smartbot.utils.handler import ClientHandler
+
+client = ClientHandler()
+
+# Stand-in for the import cost of a plugin's own dependencies
+TABLE = {{i: re.compile(rf"plugin{index}-item{{i}}-\\\\d+") for i in range({work})}}
+time.sleep({sleep})
+
+
+@client.on(events.NewMessage(pattern="/command{index}"))
+async def handle_command{index}(event):
+    return {index}
+
+
+@client.on(CallbackRoute("plugin{index}:<id:int>"))
+async def handle_callback{index}(event):
+    return event.route_params["id"]
+'''
+
+RUNNER = '''\
+import sys, json, time, asyncio
+sys.path.insert(0, {repo!r})
+from smartbot.plugin_loader import PluginLoader
+
+class NullClient:
+    session = "benchmark"
+    def add_event_handler(self, callback, event=None):
+        pass
+
+loader = PluginLoader(NullClient(), dict(
+    root="synthetic", lazy={lazy}, manifest={manifest!r}, import_workers={workers}
+))
+started = time.perf_counter()
+loader.load_plugins()
+loaded = time.perf_counter()
+
+route = loader.router.commands["command0"][0]
+dispatch_started = time.perf_counter()
+asyncio.run(route.callback(None))
+dispatched = time.perf_counter()
+print(json.dumps({{
+    "startup": loaded - started,
+    "first_dispatch": dispatched - dispatch_started,
+    "modules": sum(name.startswith("synthetic.") for name in sys.modules),
+}}))
+'''
+
+
+def generate(root: Path, count: int, work: int, sleep: float) -> None:
+    package = root / "synthetic"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    for index in range(count):
+        (package / f"plugin{index:04d}.py").write_text(PLUGIN_TEMPLATE.format(index=index, work=work, sleep=sleep))
+
+
+def run(root: Path, lazy: bool, manifest: str | None, workers: int) -> dict:
+    code = RUNNER.format(repo=os.getcwd(), lazy=lazy, manifest=manifest, workers=workers)
+    shutil.rmtree(root / "synthetic" / "__pycache__", ignore_errors=True)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=root,
+        env={k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plugins", type=int, default=500)
+    parser.add_argument("--work", type=int, default=50, help="regexes compiled by each plugin on import")
+    parser.add_argument("--sleep", type=float, default=2.0, help="milliseconds each plugin sleeps on import")
+    parser.add_argument("--workers", type=int, default=8, help="import threads of the threaded runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        generate(root, args.plugins, args.work, args.sleep / 1000)
+        print(
+            f"{args.plugins} plugins, {args.work} regexes compiled and "
+            f"{args.sleep} ms slept per plugin import"
+        )
+        threaded = f"{args.workers} threads"
+        runs = (
+            ("eager", False, None, 0),
+            (f"eager, {threaded}", False, None, args.workers),
+            ("eager, manifest cold", False, "eager.json", 0),
+            ("eager, manifest warm", False, "eager.json", 0),
+            (f"eager, warm, {threaded}", False, "eager.json", args.workers),
+            ("lazy, manifest cold", True, "lazy.json", 0),
+            ("lazy, manifest warm", True, "lazy.json", 0),
+        )
+        for name, lazy, manifest, workers in runs:
+            result = run(root, lazy, manifest and str(root / manifest), workers)
+            print(
+                f"  {name:<24} startup {result['startup'] * 1000:8.1f} ms   "
+                f"first dispatch {result['first_dispatch'] * 1000:6.2f} ms   "
+                f"plugin modules imported {result['modules']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Measures the memory cost of user sessions, in bytes per session.
+
+Compares the original dict-based session layout with the current
+`smartbot.bot.UserSession`. Run from the repository root:
+
+    python -m benchmarks.session_memory --sessions 100000
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+from enum import Enum
+
+from smartbot.bot import UserSession
+
+
+class State(Enum):
+    IDLE = "idle"
+    WAITING_INPUT = "waiting_input"
+
+
+class LegacyUserSession:
+    """The session layout used before sessions were slotted."""
+
+    def __init__(self, user_id, state_class):
+        self.user_id = user_id
+        self.state_class = state_class
+        self.state = state_class.IDLE
+        self.context = {}
+        self.data = {}
+        self.last_activity = datetime.now()
+        self.timeout_duration = timedelta(minutes=30)
+
+
+def measure(session_class, count: int, with_data: bool) -> float:
+    """
+    Allocates `count` sessions and returns the traced bytes per session.
+
+    :param session_class: The session class to instantiate.
+    :param count: Number of sessions to allocate.
+    :param with_data: Whether to store one data value in every session.
+    :return: Average bytes allocated per session.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    sessions = {}
+    for user_id in range(count):
+        session = session_class(user_id, State)
+        if with_data:
+            session.data["name"] = "user"
+        sessions[user_id] = session
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Exclude the container itself, it is the same for both layouts
+    container = sessions.__sizeof__()
+    del sessions
+    return (after - before - container) / count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for with_data in (False, True):
+        label = "with data" if with_data else "idle"
+        legacy = measure(LegacyUserSession, args.sessions, with_data)
+        compact = measure(UserSession, args.sessions, with_data)
+        print(
+            f"{label:>9}: before {legacy:8.1f} B/session | "
+            f"after {compact:8.1f} B/session | "
+            f"saved {100 * (1 - compact / legacy):5.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures session store throughput under concurrent handler load.
+
+Each simulated handler repeatedly loads a random user's session, updates
+its data and marks it for persistence, as `Client.set_user_data` does.
+Run from the repository root:
+
+    python -m benchmarks.session_store --users 50000 --handlers 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from enum import Enum
+
+from smartbot.bot import UserSession
+from smartbot.session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class State(Enum):
+    IDLE = "idle"
+
+
+async def handler(store, users: int, operations: int, seed: int) -> None:
+    """
+    Simulates one handler touching random sessions.
+
+    :param store: The session store under test.
+    :param users: Number of distinct user IDs.
+    :param operations: Number of operations this handler performs.
+    :param seed: Seed for the user ID sequence.
+    """
+    rng = random.Random(seed)
+    for _ in range(operations):
+        user_id = rng.randrange(users)
+        session = store.get(user_id)
+        if session is None:
+            session = UserSession(user_id, State)
+            store[user_id] = session
+        session.set_data("counter", session.get_data("counter", 0) + 1)
+        store.save(session)
+        await asyncio.sleep(0)
+
+
+async def run(store, users: int, handlers: int, operations: int) -> float:
+    """
+    Runs the concurrent handlers and returns the achieved ops/sec.
+    """
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        handler(store, users, operations, seed)
+        for seed in range(handlers)
+    ))
+    store.flush()
+    return handlers * operations / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--handlers", type=int, default=200)
+    parser.add_argument("--operations", type=int, default=500)
+    parser.add_argument("--cache-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stores = {
+            "memory": MemorySessionStore(),
+            "sqlite": SQLiteSessionStore(
+                os.path.join(directory, "sessions.db"),
+                cache_size=args.cache_size
+            ),
+        }
+        for name, store in stores.items():
+            rate = asyncio.run(run(store, args.users, args.handlers, args.operations))
+            print(f"{name:>6}: {rate:12,.0f} ops/sec ({len(store):,} sessions stored)")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,10 @@ ADMIN_COMMANDS = [
         command="broadcast",
         description="Enviar uma mensagem para todos os usuários."
     ),
+    BotCommand(
+        command="metrics",
+        description="Exibir a latência e os erros dos handlers."
+    ),
 ]
 
 # Comandos disponíveis para todos os usuários
@@ -0,0 +1,124 @@
+"""
+Example conversation flow asking for a username and a password.
+
+Not loaded by default: copy it into the plugins folder (e.g.
+`plugins/commands/login.py`) and add it to the plugin includes to try it.
+The password is never stored; replace `check_password` with a real check.
+"""
+
+import logging
+from typing import Any
+from smartbot.fsm import conversation_flow, ANY_STATE
+
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def ask_username(client: Any, user_id: int, event: Any):
+    """
+    Asks for the username when the user enters the WAITING_USERNAME state.
+
+    :param client: The client running the flow.
+    :param user_id: Telegram user ID.
+    :param event: The `/login` message.
+    """
+    await client.send_message(user_id, "👤 Informe seu usuário (ou /cancel para desistir):")
+
+
+async def ask_password(client: Any, user_id: int, event: Any):
+    """
+    Asks for the password when the user enters the WAITING_PASSWORD state.
+
+    :param client: The client running the flow.
+    :param user_id: Telegram user ID.
+    :param event: The message with the username.
+    """
+    await client.send_message(user_id, "🔑 Agora informe sua senha:")
+
+
+def check_password(username: str, password: str) -> bool:
+    """
+    Checks the credentials. Stand-in for the application's own authentication.
+
+    :param username: The username received.
+    :param password: The password received.
+    :return: True if the credentials are valid.
+    """
+    return bool(password.strip())
+
+
+async def finish_login(client: Any, user_id: int, event: Any):
+    """
+    Completes the login flow once the password is received.
+
+    The password is only read from the message, which is then deleted
+    from the chat; it is not saved in the user context or data.
+
+    :param client: The client running the flow.
+    :param user_id: Telegram user ID.
+    :param event: The message with the password.
+    """
+    username = client.get_user_context(user_id, "username")
+    accepted = check_password(username, event.raw_text or "")
+    await client.remove_messages(chat_id=user_id, message_ids=event.id)
+    client.clear_user_context(user_id)
+
+    if not accepted:
+        await client.send_message(user_id, "⚠️ Usuário ou senha inválidos, envie /login para tentar novamente.")
+        return
+
+    logging.info(f"Login flow completed by User ID: {user_id}")
+    client.set_user_data(user_id, "username", username)
+    await client.send_message(user_id, f"✅ Login recebido, {username}!")
+
+
+async def cancel(client: Any, user_id: int, event: Any):
+    """
+    Leaves the flow on `/cancel`, discarding what was received.
+
+    :param client: The client running the flow.
+    :param user_id: Telegram user ID.
+    :param event: The `/cancel` message.
+    """
+    client.clear_user_context(user_id)
+    await event.reply("❌ Operação cancelada.")
+
+
+async def timed_out(client: Any, user_id: int, event: Any):
+    """
+    Warns the user when a step of the flow times out.
+
+    :param client: The client running the flow.
+    :param user_id: Telegram user ID.
+    :param event: None, timeouts have no triggering event.
+    """
+    client.clear_user_context(user_id)
+    await client.send_message(user_id, "⌛ Tempo esgotado, envie /login para recomeçar.")
+
+
+def validate_username(text: str) -> str:
+    """
+    Validates the username message.
+
+    :param text: The message text.
+    :return: The username, without surrounding spaces.
+    :raises ValueError: If the username is empty, a command or too long.
+    """
+    username = text.strip()
+    if not username or username.startswith("/") or len(username) > 32:
+        raise ValueError("⚠️ Usuário inválido, use até 32 caracteres.")
+    return username
+
+
+conversation_flow.state("WAITING_USERNAME", timeout=120, on_enter=ask_username, on_timeout=timed_out)
+conversation_flow.state("WAITING_PASSWORD", timeout=120, on_enter=ask_password, on_timeout=timed_out)
+
+conversation_flow.transition("IDLE", "WAITING_USERNAME", on="/login")
+conversation_flow.transition(
+    "WAITING_USERNAME", "WAITING_PASSWORD", validate=validate_username, store="username"
+)
+# No `store`: the password never reaches the user context
+conversation_flow.transition("WAITING_PASSWORD", "IDLE", action=finish_login)
+conversation_flow.transition(ANY_STATE, "IDLE", on="/cancel", guard=lambda client, user_id, event: (
+    client.is_user_in_conversation(user_id)
+), action=cancel)
@@ -1,10 +1,12 @@
 import os
 from smartbot.bot import Client
+from smartbot.supervisor import Supervisor
 from smartbot.paths import SESSIONS_DIR
 from telethon.network import ConnectionTcpFull
 from enum import Enum
 from smartbot.config import (
     BOT_TOKEN,
+    BOT_TOKENS,
     APP_NAME,
     DEVICE_MODEL,
     SYSTEM_VERSION,
@@ -45,6 +47,8 @@ plugins: dict[str, str | list[str]] = dict(
         "commands.help",
         "commands.exit",
         "commands.button",
+        "commands.broadcast",
+        "commands.metrics",
         "callbacks.go_back",
         "message"
     ],
@@ -69,9 +73,7 @@ profile: dict[str, str] = dict(
     # force_update=True, # Force update the bot profile on startup
 )
 
-client: Client = Client(
-    bot_token=BOT_TOKEN,
-    session=SESSION_PATH,
+client_options: dict = dict(
     api_id=API_ID,
     api_hash=API_HASH,
     connection=ConnectionTcpFull,
@@ -85,5 +87,25 @@ client: Client = Client(
     conversation_state=ConversationState,
 )
 
+client: Client = Client(
+    bot_token=BOT_TOKEN,
+    session=SESSION_PATH,
+    **client_options
+)
+
+
+def build_supervisor() -> Supervisor:
+    """
+    Hosts every bot listed in `BOT_TOKENS` in this process, sharing the plugins.
+    """
+    supervisor = Supervisor(**client_options)
+    for token in BOT_TOKENS:
+        supervisor.add(token)
+    return supervisor
+
+
 if __name__ == "__main__":
-    client.start_service()
+    if BOT_TOKENS:
+        build_supervisor().start_service()
+    else:
+        client.start_service()
@@ -1,8 +1,10 @@
 import logging
 from telethon import events
 from typing import Any
+from smartbot.router import CallbackRoute
 from smartbot.utils.handler import ClientHandler
 from smartbot.utils.menu import go_back
+from smartbot.utils.menu_registry import menu_registry, show_menu
 
 logging.basicConfig(level=logging.INFO)
 
@@ -11,4 +13,19 @@ client = ClientHandler()
 
 @client.on(events.CallbackQuery(pattern=b"^back_menu$"))
 async def handle_back_menu(event: Any):
-    await go_back(event)
\ No newline at end of file
+    await go_back(event)
+
+
+@client.on(CallbackRoute("menu:<menu_id>:<source>"))
+async def handle_open_menu(event: Any):
+    """
+    Opens a registered menu from a button of another one, stacking
+    the menu being left for back navigation.
+
+    :param event: The callback query triggered by a menu link.
+    """
+    menu_id = event.route_params["menu_id"]
+    if menu_id not in menu_registry:
+        await event.answer("⚠️ Menu indisponível.", alert=True)
+        return
+    await show_menu(event, menu_id, source=event.route_params["source"])
@@ -0,0 +1,59 @@
+import logging
+from typing import Any
+from telethon import events
+from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
+
+
+logging.basicConfig(level=logging.INFO)
+
+client = ClientHandler()
+
+
+@client.on(events.NewMessage(pattern=r'/broadcast(?:@\w+)?(?:\s+(?P<message>[\s\S]+))?$'))
+async def handle_broadcast(event: Any):
+    """
+    Handles the admin `/broadcast` command.
+
+    `/broadcast <message>` sends the message to every user, `/broadcast`
+    replying to a message sends that message's text, `/broadcast status`
+    shows the progress and `/broadcast cancel` stops the running broadcast.
+
+    :param event: The event triggered by the `/broadcast` command.
+    """
+    sender = await get_sender(event)
+    if sender.id not in (event.client.admin_ids or []):
+        await event.reply("⛔ Comando disponível apenas para administradores.")
+        return
+
+    broadcaster = event.client.broadcaster
+    message = (event.pattern_match["message"] or "").strip()
+    logging.info(f"Broadcast Handler Triggered by User ID: {sender.id}")
+
+    if message == "status":
+        if broadcaster.job is None:
+            await event.reply("Nenhuma transmissão foi iniciada.")
+        else:
+            await event.reply(broadcaster.format_report(broadcaster.job))
+        return
+
+    if message == "cancel":
+        if not await broadcaster.cancel():
+            await event.reply("Nenhuma transmissão em andamento.")
+        return
+
+    if not message and event.is_reply:
+        reply = await event.get_reply_message()
+        message = reply.text if reply else ""
+
+    if not message:
+        await event.reply(
+            "Uso: /broadcast <mensagem>, ou responda a uma mensagem com /broadcast.\n"
+            "/broadcast status mostra o progresso e /broadcast cancel interrompe o envio."
+        )
+        return
+
+    try:
+        await event.client.broadcast(message, admin_chat=event.chat_id)
+    except RuntimeError:
+        await event.reply("Já existe uma transmissão em andamento, use /broadcast status.")
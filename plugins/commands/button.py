@@ -2,7 +2,9 @@ import logging
 from telethon import events
 from typing import Any
 from smartbot.utils.handler import ClientHandler
-from smartbot.utils.buttons import build_inline_buttons
+from smartbot.utils.entities import get_sender
+from smartbot.router import CallbackRoute
+from smartbot.utils.menu_registry import menu_registry, show_menu
 from smartbot.utils.menu import (
     with_stack_and_cleanup
 )
@@ -11,6 +13,17 @@ logging.basicConfig(level=logging.INFO)
 
 client = ClientHandler()
 
+menu_registry.menu(
+    "disciplines",
+    "📚 **Selecione uma disciplina**",
+    [
+        ("Matemática", b"discipline:matematica"),
+        ("Português", b"discipline:portugues"),
+        ("História", b"discipline:historia")
+    ],
+    cols=2
+)
+
 
 @client.on(events.NewMessage(pattern='/button'))
 @with_stack_and_cleanup()
@@ -20,26 +33,23 @@ async def handle_grades(event: Any):
 
     :param event: The event is triggered by an inline button interaction.
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Callback Triggered by User ID: {sender_id}")
     logging.debug(f"Event Client Instance: {event.client}")
 
-    disciplines = [
-        ("Matemática", b"matematica"),
-        ("Português", b"portugues"),
-        ("História", b"historia")
-    ]
-    utility_section = [
-        ("🔙 Voltar", b"back_menu"),
-    ]
-
-    disciplines_buttons = (
-            build_inline_buttons(disciplines, cols=2)
-            + [[]]
-            + build_inline_buttons(utility_section, cols=1)
-    )
-
     await event.delete()
-    menu_title = "📚 **Selecione uma disciplina**"
-    await event.respond(menu_title, buttons=disciplines_buttons)
\ No newline at end of file
+    await show_menu(event, "disciplines")
+
+
+@client.on(CallbackRoute("discipline:<name>"))
+async def handle_discipline(event: Any):
+    """
+    Handles the selection of a discipline from the `/button` menu.
+
+    :param event: The callback query triggered by a discipline button.
+    """
+    discipline = event.route_params["name"]
+    logging.info(f"Discipline selected by User ID {event.sender_id}: {discipline}")
+
+    await event.answer(f"📘 Disciplina selecionada: {discipline}")
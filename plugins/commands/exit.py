@@ -2,6 +2,7 @@ import logging
 from typing import Any
 from telethon import events
 from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
 from smartbot.utils.menu import with_stack_and_cleanup
 
 
@@ -18,7 +19,7 @@ async def handle_exit(event: Any):
 
     :param event: The event triggered by the `/exit` command.
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Exit Handler Triggered by User ID: {sender_id}")
     logging.info(f"Event Client Instance: {event.client}")
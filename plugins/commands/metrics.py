@@ -0,0 +1,39 @@
+import logging
+from typing import Any
+from telethon import events
+from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
+
+
+logging.basicConfig(level=logging.INFO)
+
+client = ClientHandler()
+
+
+@client.on(events.NewMessage(pattern=r'/metrics(?:@\w+)?(?:\s+(?P<limit>\d+))?$'))
+async def handle_metrics(event: Any):
+    """
+    Handles the admin `/metrics` command.
+
+    Shows the call rate, errors and latency percentiles by event type and
+    of the slowest handlers, and the number of users in each conversation
+    state. `/metrics <n>` lists up to n handlers.
+
+    :param event: The event triggered by the `/metrics` command.
+    """
+    sender = await get_sender(event)
+    if sender.id not in (event.client.admin_ids or []):
+        await event.reply("⛔ Comando disponível apenas para administradores.")
+        return
+
+    logging.info(f"Metrics Handler Triggered by User ID: {sender.id}")
+    loader = event.client.plugin_loader
+    if loader is None or loader.metrics is None:
+        await event.reply("As métricas dos handlers estão desativadas.")
+        return
+
+    limit = int(event.pattern_match["limit"] or 10)
+    states = "\n".join(
+        f"• {state.name}: {count}" for state, count in event.client.state_counts().items()
+    )
+    await event.reply(f"{loader.metrics.format_report(limit=limit)}\n\nUsuários por estado:\n{states}")
@@ -2,6 +2,7 @@ import logging
 from typing import Any
 from telethon import events
 from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
 from smartbot.utils.menu import with_stack_and_cleanup
 
 
@@ -19,7 +20,7 @@ async def handle_start(event: Any):
     :param event: The event is triggered by the `/start` command.
     """
 
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Start Handler Triggered by User ID: {sender_id}")
     logging.info(f"Event Client Instance: {event.client}")
@@ -2,6 +2,7 @@ import logging
 from typing import Any
 from telethon import events
 from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,15 +18,13 @@ async def handle_text(event: Any) -> None:
     :param event: The event triggered by the `/text` command.
     """
 
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Start Handler Triggered by User ID: {sender_id}")
     logging.info(f"Event Client Instance: {event.client}")
-    logging.info(f"User Data Client: {event.client.drivers}")
-    event.client.drivers["user_data"] = {}
-    event.client.drivers["user_data"]["id"] = sender_id
-    event.client.drivers["user_data"]["name"] = sender.first_name
-    logging.info(f"User Data Client: {event.client.drivers}")
+    event.client.set_user_data(sender_id, "id", sender_id)
+    event.client.set_user_data(sender_id, "name", sender.first_name)
+    logging.info(f"User Data Client: {event.client.drivers[sender_id]}")
 
     response = await event.client.send_message(
         sender_id,
@@ -1,15 +1,24 @@
 import os
+import time
 import asyncio
 import logging
+from contextvars import ContextVar
 from telethon import (
     TelegramClient,
-    Button
+    Button,
+    events,
+    utils
 )
 from telethon.errors import (
     MessageDeleteForbiddenError,
-    # FloodWaitError
 )
 from telethon.tl.types import (
+    PeerUser,
+    Message,
+    UpdateNewMessage,
+    UpdateNewChannelMessage,
+    UpdateShortMessage,
+    UpdateShortChatMessage,
     BotCommandScopePeer,
     BotCommandScopeDefault,
     InputPhoto,
@@ -29,19 +38,32 @@ from telethon.tl.functions.photos import (
 )
 from typing import TypeVar, Generic, Type, Dict, Any
 from smartbot.plugin_loader import PluginLoader
-from smartbot.utils.context import (
-    # DELETE_KEY,
-    MENU_KEY
-)
+from smartbot.metrics import start_metrics_server
+from smartbot.tracing import Tracer
+from smartbot.fsm import FlowEngine, conversation_flow, dispatch_flow
+from smartbot.session_store import SessionStore, MemorySessionStore
+from smartbot.scheduler import UpdateScheduler
+from smartbot.outbound import OutboundLimiter, ScopedLimiter, Priority
+from smartbot.broadcast import Broadcaster
+from smartbot.paths import SESSIONS_DIR
+from smartbot.utils.expiry import ExpiryIndex
+from smartbot.utils.state_index import StateIndex
+from smartbot.utils.context import SessionDrivers, TrackedList
+from smartbot.utils.entities import EntityCache, EntityBatcher
+from smartbot.utils.deletion import DeletionQueue
+from smartbot.utils.menu_stack import MenuStack
 from enum import Enum
 from importlib import resources
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 logging.basicConfig(
     level=logging.INFO
 )
 
 StateT = TypeVar('StateT', bound=Enum)
+
+# Set while a call holds its outbound slot, the calls it makes are part of it
+_in_outbound: ContextVar[bool] = ContextVar("smartbot_in_outbound", default=False)
 SessionT = TypeVar('SessionT')
 
 
@@ -55,9 +77,32 @@ class UserSession(Generic[StateT]):
     Class for managing individual user session data and conversation state.
 
     This class handles user-specific data including conversation state,
-    temporary context, persistent data, and session timeout management.
+    temporary context, persistent data, menu navigation stack, pending
+    message deletions and session timeout management.
+
+    Sessions are kept compact since one exists per user: attributes live in
+    slots, timestamps are monotonic-clock floats, the containers are only
+    allocated on first write and the timeout is shared at class level until
+    a session overrides it. The menu stack keeps at most `menu_stack_depth`
+    menus, and identical menus are shared between sessions.
     """
 
+    __slots__ = (
+        "user_id",
+        "state_class",
+        "state",
+        "last_activity",
+        "_context",
+        "_data",
+        "_menu_stack",
+        "_delete_queue",
+        "_timeout",
+    )
+
+    default_timeout: float = 30 * 60  # Default timeout, in seconds
+    menu_stack_depth: int = 20  # Menus kept for back navigation
+    compact_menus: bool = False  # Keep stacked menu markups serialized, for menus built per user
+
     def __init__(self, user_id: int, state_class: Type[StateT]):
         """
         Initialize a new user session.
@@ -69,10 +114,78 @@ class UserSession(Generic[StateT]):
         self.user_id = user_id
         self.state_class = state_class
         self.state = state_class.IDLE
-        self.context = {}  # Temporary conversation data
-        self.data = {}  # Persistent user data
-        self.last_activity = datetime.now()
-        self.timeout_duration = timedelta(minutes=30)  # Default timeout
+        self.last_activity = time.monotonic()
+        self._context = None  # Temporary conversation data
+        self._data = None  # Persistent user data
+        self._menu_stack = None  # Previous menus, for back navigation
+        self._delete_queue = None  # Temporary message IDs to delete
+        self._timeout = None
+
+    @property
+    def context(self) -> dict:
+        """Temporary conversation data, created on first access."""
+        if self._context is None:
+            self._context = {}
+        return self._context
+
+    @context.setter
+    def context(self, value: dict):
+        self._context = value
+
+    @property
+    def data(self) -> dict:
+        """Persistent user data, created on first access."""
+        if self._data is None:
+            self._data = {}
+        return self._data
+
+    @data.setter
+    def data(self, value: dict):
+        self._data = value
+
+    @property
+    def menu_stack(self) -> MenuStack:
+        """Menu navigation stack, created on first access."""
+        if self._menu_stack is None:
+            self._menu_stack = MenuStack(max_depth=self.menu_stack_depth, compact=self.compact_menus)
+        return self._menu_stack
+
+    @menu_stack.setter
+    def menu_stack(self, value: list):
+        if value is not None and not isinstance(value, MenuStack):
+            value = MenuStack(value, max_depth=self.menu_stack_depth, compact=self.compact_menus)
+        self._menu_stack = value
+
+    @property
+    def delete_queue(self) -> TrackedList:
+        """IDs of temporary messages to delete, created on first access."""
+        if self._delete_queue is None:
+            self._delete_queue = TrackedList()
+        return self._delete_queue
+
+    @delete_queue.setter
+    def delete_queue(self, value: list):
+        if value is not None and not isinstance(value, TrackedList):
+            value = TrackedList(value)
+        self._delete_queue = value
+
+    @property
+    def timeout(self) -> float:
+        """Inactivity timeout of this session, in seconds."""
+        return self.default_timeout if self._timeout is None else self._timeout
+
+    @timeout.setter
+    def timeout(self, value: float | None):
+        self._timeout = value
+
+    @property
+    def timeout_duration(self) -> timedelta:
+        """Inactivity timeout of this session, as a timedelta."""
+        return timedelta(seconds=self.timeout)
+
+    @timeout_duration.setter
+    def timeout_duration(self, value: timedelta | float | None):
+        self._timeout = value.total_seconds() if isinstance(value, timedelta) else value
 
     def set_state(self, state: StateT, context: Dict = None):
         """
@@ -84,7 +197,7 @@ class UserSession(Generic[StateT]):
         self.state = state
         if context:
             self.context.update(context)
-        self.last_activity = datetime.now()
+        self.last_activity = time.monotonic()
 
     def get_state(self):
         """
@@ -102,7 +215,7 @@ class UserSession(Generic[StateT]):
             value (Any): Value to store
         """
         self.context[key] = value
-        self.last_activity = datetime.now()
+        self.last_activity = time.monotonic()
 
     def get_context(self, key: str, default: Any = None) -> Any:
         """
@@ -113,15 +226,19 @@ class UserSession(Generic[StateT]):
         Returns:
             Any: The context value or default
         """
-        return self.context.get(key, default)
+        if self._context is None:
+            return default
+        return self._context.get(key, default)
 
     def clear_context(self):
         """Clear all temporary context data."""
-        self.context.clear()
+        if self._context is not None:
+            self._context.clear()
 
     def clear_user_data(self):
         """Clear all persisten user data."""
-        self.data.clear()
+        if self._data is not None:
+            self._data.clear()
 
     def set_data(self, key: str, value: Any):
         """
@@ -141,7 +258,9 @@ class UserSession(Generic[StateT]):
         Returns:
             Any: The data value or default
         """
-        return self.data.get(key, default)
+        if self._data is None:
+            return default
+        return self._data.get(key, default)
 
     def is_expired(self) -> bool:
         """
@@ -149,14 +268,61 @@ class UserSession(Generic[StateT]):
         Returns:
             bool: True if session has expired, False otherwise
         """
-        return datetime.now() - self.last_activity > self.timeout_duration
+        return time.monotonic() - self.last_activity > self.timeout
+
+    def expires_at(self) -> float:
+        """
+        Get the monotonic-clock moment this session expires if it stays inactive.
+        Returns:
+            float: Last activity plus the timeout, in seconds
+        """
+        return self.last_activity + self.timeout
 
     def reset_to_idle(self):
         """Reset the session to idle state and clear temporary context."""
         self.state = self.state_class.IDLE
         self.clear_user_data()
         self.clear_context()
-        self.last_activity = datetime.now()
+        self._menu_stack = None
+        self._delete_queue = None
+        self.last_activity = time.monotonic()
+
+    def __getstate__(self) -> dict:
+        """
+        Get a picklable snapshot of the session.
+        The monotonic clock does not survive a restart, so the last activity
+        is stored as a wall-clock timestamp.
+        Returns:
+            dict: The session state
+        """
+        return {
+            "user_id": self.user_id,
+            "state_class": self.state_class,
+            "state": self.state,
+            "last_seen": time.time() - (time.monotonic() - self.last_activity),
+            "context": self._context or None,
+            "data": self._data or None,
+            "menu_stack": self._menu_stack or None,
+            "delete_queue": self._delete_queue or None,
+            "timeout": self._timeout,
+        }
+
+    def __setstate__(self, state: dict):
+        """
+        Restore the session from a snapshot made by `__getstate__`.
+        Args:
+            state (dict): The session state
+        """
+        self.user_id = state["user_id"]
+        self.state_class = state["state_class"]
+        self.state = state["state"]
+        idle = max(0.0, time.time() - state["last_seen"])
+        self.last_activity = time.monotonic() - idle
+        self._context = state["context"]
+        self._data = state["data"]
+        self.menu_stack = state.get("menu_stack")
+        self.delete_queue = state.get("delete_queue")
+        self._timeout = state["timeout"]
 
 
 class Client(TelegramClient, Generic[StateT, SessionT]):
@@ -166,6 +332,11 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
     user conversations, session states, and persistent data storage.
     """
 
+    # Seconds `ask_user(wait=True)` waits for an answer when no timeout is given
+    answer_timeout: float = 300
+    # Whether conversation flows only take messages and buttons from private chats
+    flow_private_only: bool = True
+
     def __init__(
             self,
             bot_token: str = "",
@@ -175,6 +346,20 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             commands: dict[str, Any] = None,
             conversation_state: Type[StateT] = ConversationState,
             user_session: Type[SessionT] = UserSession,
+            session_cleanup_interval: float = 5,
+            session_store: SessionStore | None = None,
+            session_flush_interval: float = 1,
+            session_flush_threshold: int = 500,
+            entity_cache: EntityCache | None = None,
+            update_workers: int = 64,
+            update_queue_size: int = 100,
+            outbound_limiter: OutboundLimiter | None = None,
+            broadcast_checkpoint: str | None = None,
+            metrics_port: int | None = None,
+            trace_sample_rate: float = 0.0,
+            trace_capacity: int = 1000,
+            trace_path: str | None = None,
+            scope: str | None = None,
             **kwargs
     ) -> None:
         """
@@ -187,21 +372,117 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             commands (dict[str, Any]): Bot commands configuration
             conversation_state (Type[StateT]): Class to use for conversation states
             user_session (Type[SessionT]): Class to use for user sessions
+            session_cleanup_interval (float): Seconds between expired session sweeps
+            session_store (SessionStore | None): Backend for user sessions, in memory by default
+            session_flush_interval (float): Seconds between write-behind flushes of modified sessions
+            session_flush_threshold (int): Number of modified sessions that triggers an early flush
+            entity_cache (EntityCache | None): Cache of sender entities, a new one by default
+            update_workers (int): Updates processed concurrently, 0 lets Telethon dispatch them directly
+            update_queue_size (int): Maximum number of updates waiting per user
+            outbound_limiter (OutboundLimiter | None): Rate limiter for outbound calls, a new one by default
+            broadcast_checkpoint (str | None): Path of the broadcast progress file, inside SESSIONS_DIR by default
+            metrics_port (int | None): Local port serving the handler metrics to Prometheus, None to disable
+            trace_sample_rate (float): Fraction of the updates traced, 0 disables tracing
+            trace_capacity (int): Number of update traces kept in memory
+            trace_path (str | None): File the traces are written to on shutdown, in Chrome trace format
+            scope (str | None): Name of the bot in a process hosting several, namespacing its
+                entries in a shared entity cache and outbound limiter
             **kwargs: Additional keyword arguments for TelegramClient
         """
         super().__init__(**kwargs)
         self.bot_token = bot_token
         self.plugins = plugins
+        self.plugin_loader: PluginLoader | None = None
+        self.metrics_port = metrics_port
+        self.metrics_server: asyncio.Server | None = None
+        self.tracer = Tracer(trace_sample_rate, trace_capacity)
+        self.trace_path = trace_path
         self.config = config
         self.admin_ids = admin_ids
         self.commands = commands
         self.conversation_state = conversation_state
         self.user_session = user_session
-        self.drivers = {}
+        self.drivers = SessionDrivers(self)
         self.users = {}
         self.chats = []
-        self.user_sessions: Dict[int, Any] = {}
+        self.user_sessions: SessionStore = (
+            session_store if session_store is not None else MemorySessionStore()
+        )
         self.conversation_handlers = {}
+        self.conversation_flow: FlowEngine | None = None
+        self._pending_answers: dict[int, asyncio.Future] = {}
+        self.session_cleanup_interval = session_cleanup_interval
+        self.session_flush_interval = session_flush_interval
+        self.session_flush_threshold = session_flush_threshold
+        self._session_expiry = ExpiryIndex()
+        self._state_index: StateIndex | None = None
+        self._dirty_sessions: Dict[int, Any] = {}
+        self._flushing_sessions: Dict[int, Any] = {}
+        self._session_flush_lock = asyncio.Lock()
+        self._session_flush_task: asyncio.Task | None = None
+        if self.user_sessions.persistent:
+            # Sessions the store buffers are written by the write-behind task too
+            self.user_sessions.flush_requested = self._schedule_session_flush
+        self.scope = scope
+        self.entity_cache = entity_cache if entity_cache is not None else EntityCache()
+        self._entity_batcher = EntityBatcher(self)
+        self.update_scheduler: UpdateScheduler | None = (
+            UpdateScheduler(update_workers, update_queue_size) if update_workers > 0 else None
+        )
+        outbound = outbound_limiter if outbound_limiter is not None else OutboundLimiter()
+        self.outbound: OutboundLimiter | ScopedLimiter = (
+            outbound.scoped(scope) if scope is not None else outbound
+        )
+        self.deletion_queue = DeletionQueue(self._delete_batch)
+        self.broadcaster = Broadcaster(
+            self,
+            broadcast_checkpoint or os.path.join(SESSIONS_DIR, "broadcast.json")
+        )
+
+    @staticmethod
+    def _update_user_id(update) -> int | None:
+        """
+        Get the ID of the user an update originates from.
+        Args:
+            update: Raw Telegram update
+        Returns:
+            int | None: The user ID, or None for updates not tied to a user
+        """
+        if isinstance(update, (UpdateNewMessage, UpdateNewChannelMessage)):
+            message = update.message
+            peer = getattr(message, "from_id", None) or getattr(message, "peer_id", None)
+            if isinstance(peer, PeerUser):
+                return peer.user_id
+            return None
+        if isinstance(update, UpdateShortMessage):
+            return update.user_id
+        if isinstance(update, UpdateShortChatMessage):
+            return update.from_id
+        return getattr(update, "user_id", None)
+
+    async def _dispatch_update(self, update):
+        """
+        Queue an incoming update in the lane of its user.
+        Updates from one user are processed strictly in order, updates from
+        different users concurrently, within the scheduler worker limit.
+        Sampled updates are traced from this point. A private message from a
+        user awaited by `ask_user` answers it directly and is not dispatched.
+        Args:
+            update: Raw Telegram update
+        """
+        user_id = self._update_user_id(update)
+        if user_id in self._pending_answers and self._resolve_answer(user_id, update):
+            return
+        job, args = super()._dispatch_update, (update,)
+        trace = self.tracer.begin(type(update).__name__, user=user_id)
+        if trace is not None:
+            job, args = self.tracer.run, (trace, job, update)
+
+        if self.update_scheduler is None:
+            return await job(*args)
+
+        key = user_id if user_id is not None else object()
+        self.update_scheduler.submit(key, job, *args)
 
     async def ensure_ready(self, timeout: int = 15) -> None:
         """
@@ -237,6 +518,21 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
 
             await asyncio.sleep(1)
 
+    def _find_user_session(self, sender_id: int):
+        """
+        Get the existing session of a user, including sessions waiting to be flushed.
+        Args:
+            sender_id (int): Telegram user ID
+        Returns:
+            The user session object, or None if the user has no session
+        """
+        session = self._dirty_sessions.get(sender_id)
+        if session is None:
+            session = self._flushing_sessions.get(sender_id)
+        if session is None:
+            session = self.user_sessions.get(sender_id)
+        return session
+
     def get_user_session(self, sender_id: int):
         """
         Get or create a user session for the given sender ID.
@@ -245,12 +541,19 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         Returns:
             The user session object
         """
-        if sender_id not in self.user_sessions:
-            self.user_sessions[sender_id] = self.user_session(
+        session = self._find_user_session(sender_id)
+        if session is None:
+            session = self.user_session(
                 sender_id,
                 self.conversation_state
             )
-        return self.user_sessions[sender_id]
+            self.user_sessions[sender_id] = session
+            if self._state_index is not None:
+                self._state_index.add(sender_id, session.state)
+
+        if sender_id not in self._session_expiry:
+            self._session_expiry.schedule(sender_id, session.expires_at())
+        return session
 
     def set_user_state(self, sender_id: int, state: StateT, context: Dict = None):
         """
@@ -261,7 +564,11 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             context (Dict, optional): Additional context data
         """
         session = self.get_user_session(sender_id)
+        previous = session.state
         session.set_state(state, context)
+        if self._state_index is not None:
+            self._state_index.move(sender_id, previous, state)
+        self._mark_session_dirty(session)
         logging.info(f"User {sender_id} state changed to {state.value if hasattr(state, 'value') else state}")
 
     def get_user_state(self, sender_id: int):
@@ -285,6 +592,7 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         """
         session = self.get_user_session(sender_id)
         session.set_context(key, value)
+        self._mark_session_dirty(session)
 
     def get_user_context(self, sender_id: int, key: str, default: Any = None) -> Any:
         """
@@ -307,6 +615,7 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         """
         session = self.get_user_session(sender_id)
         session.clear_context()
+        self._mark_session_dirty(session)
 
     def set_user_data(self, sender_id: int, key: str, value: Any):
         """
@@ -318,10 +627,7 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         """
         session = self.get_user_session(sender_id)
         session.set_data(key, value)
-
-        if sender_id not in self.drivers:
-            self.drivers[sender_id] = {}
-        self.drivers[sender_id][key] = value
+        self._mark_session_dirty(session)
 
     def get_user_data(self, sender_id: int, key: str, default: Any = None) -> Any:
         """
@@ -342,9 +648,13 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         Args:
             sender_id (int): Telegram user ID
         """
-        if sender_id in self.user_sessions:
-            self.drivers.get(sender_id, {}).clear()
-            self.user_sessions[sender_id].reset_to_idle()
+        session = self._find_user_session(sender_id)
+        if session is not None:
+            previous = session.state
+            session.reset_to_idle()
+            if self._state_index is not None:
+                self._state_index.move(sender_id, previous, session.state)
+            self._mark_session_dirty(session)
             logging.info(f"User {sender_id} session reset to idle")
 
     def is_user_in_conversation(self, sender_id: int) -> bool:
@@ -359,18 +669,150 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         idle_state = self.conversation_state.IDLE
         return state != idle_state
 
+    @property
+    def state_index(self) -> StateIndex:
+        """
+        Index of the users in each conversation state.
+        Built from the session store on first access, a single scan that
+        also covers sessions persisted by earlier runs, then kept up to date
+        by `set_user_state`, `reset_user_session` and session expiry.
+        """
+        if self._state_index is None:
+            self._state_index = StateIndex.build(
+                (user_id, session.state)
+                for user_id in list(self.user_sessions)
+                if (session := self._find_user_session(user_id)) is not None
+            )
+        return self._state_index
+
     def get_users_in_state(self, state) -> list[int]:
         """
         Get a list of user IDs currently in a specific conversation state.
+        Costs O(k) in the number of matching users.
         Args:
             state: The conversation state to filter by
         Returns:
             list[int]: List of user IDs in the specified state
         """
-        return [
-            user_id for user_id, session in self.user_sessions.items()
-            if session.get_state() == state
+        return list(self.state_index.users(state))
+
+    def state_counts(self) -> Dict[Any, int]:
+        """
+        Get the number of users in each conversation state.
+        Returns:
+            Dict[Any, int]: Users per state, for every state of the conversation state enum
+        """
+        counts = self.state_index.counts()
+        return {state: counts.get(state, 0) for state in self.conversation_state}
+
+    def export_state_counts(self) -> str:
+        """
+        Get the users per conversation state as a Prometheus gauge.
+        Returns:
+            str: The gauge in the Prometheus text format
+        """
+        lines = [
+            "# HELP smartbot_users_in_state Users in each conversation state.",
+            "# TYPE smartbot_users_in_state gauge",
         ]
+        for state, count in self.state_counts().items():
+            lines.append(f'smartbot_users_in_state{{state="{state.name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def _mark_session_dirty(self, session) -> None:
+        """
+        Queue a modified session for the next write-behind flush.
+        Repeated changes to the same user are coalesced, the last one wins.
+        Args:
+            session: The modified user session
+        """
+        if not self.user_sessions.persistent:
+            return
+
+        self._dirty_sessions[session.user_id] = session
+        if len(self._dirty_sessions) >= self.session_flush_threshold:
+            self._schedule_session_flush()
+
+    def _schedule_session_flush(self) -> None:
+        """
+        Start a write-behind flush in the background, unless one is running.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside the event loop, the next flush writes the sessions
+            return
+        if self._session_flush_task is None or self._session_flush_task.done():
+            self._session_flush_task = asyncio.create_task(self.flush_sessions())
+
+    async def flush_sessions(self) -> int:
+        """
+        Write every queued session to the session store in one batch,
+        along with the sessions the store buffered itself.
+        Sessions are serialized on the event loop and written from a worker
+        thread, so handlers never wait for the storage.
+        Returns:
+            int: Number of sessions written
+        """
+        async with self._session_flush_lock:
+            if not self._dirty_sessions and not self.user_sessions.pending:
+                return 0
+
+            batch = self._flushing_sessions = self._dirty_sessions
+            self._dirty_sessions = {}
+            try:
+                snapshot = self.user_sessions.snapshot(batch.values())
+                await asyncio.to_thread(self.user_sessions.write_snapshot, snapshot)
+            except Exception as e:
+                logging.error(f"Error while flushing user sessions: {e}")
+                # Keep the batch for the next attempt, newer changes take precedence
+                self._dirty_sessions = {**batch, **self._dirty_sessions}
+                return 0
+            finally:
+                self._flushing_sessions = {}
+
+            return len(snapshot)
+
+    async def _flush_sessions_periodically(self):
+        """
+        Background task flushing modified sessions to the session store.
+        """
+        if not self.user_sessions.persistent:
+            return
+
+        while True:
+            await asyncio.sleep(self.session_flush_interval)
+            await self.flush_sessions()
+
+    def _session_deadline(self, sender_id: int):
+        """
+        Get the current expiry deadline of a user session.
+        Args:
+            sender_id (int): Telegram user ID
+        Returns:
+            The session deadline, or None if the session no longer exists
+        """
+        session = self._find_user_session(sender_id)
+        return session.expires_at() if session is not None else None
+
+    def cleanup_expired_sessions(self) -> list[int]:
+        """
+        Reset every session whose timeout has elapsed.
+        Only sessions whose indexed deadline has passed are inspected,
+        so the cost depends on the number of expiring sessions.
+        Returns:
+            list[int]: IDs of the users whose sessions were reset
+        """
+        expired_users = self._session_expiry.pop_expired(
+            time.monotonic(),
+            self._session_deadline
+        )
+
+        for user_id in expired_users:
+            logging.info(f"Cleaning up expired session for user {user_id}")
+            self.reset_user_session(user_id)
+
+        return expired_users
 
     async def _cleanup_expired_sessions(self):
         """
@@ -378,36 +820,146 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         This method runs continuously and removes sessions that have
         exceeded their timeout duration.
         """
+        logging.info("Starting session cleanup task...")
         while True:
-            logging.info("Starting session cleanup task...")
             try:
-                expired_users = []
-                for user_id, session in self.user_sessions.items():
-                    if session.is_expired():
-                        expired_users.append(user_id)
+                self.cleanup_expired_sessions()
+            except Exception as e:
+                logging.error(f"Error in session cleanup: {e}")
+            await asyncio.sleep(self.session_cleanup_interval)
 
-                for user_id in expired_users:
-                    logging.info(f"Cleaning up expired session for user {user_id}")
-                    self.reset_user_session(user_id)
+    def compile_flow(self) -> None:
+        """
+        Compile the declared conversation flow for the conversation state enum.
+        Called again after a plugin reload, keeping the running state timeouts.
+        Raises:
+            ValueError: If a declaration names an unknown state on the first compilation,
+                later ones keep the previous flow
+        """
+        try:
+            engine = conversation_flow.compile(self.conversation_state)
+        except ValueError as e:
+            if self.conversation_flow is None:
+                raise
+            logging.warning(f"Keeping the previous conversation flow: {e}")
+            return
+        if self.conversation_flow is not None:
+            engine.adopt(self.conversation_flow)
+        self.conversation_flow = engine
 
-                await asyncio.sleep(300)  # Check every 5 minutes
+    async def _expire_conversation_states(self, interval: float = 1):
+        """
+        Background task moving the users whose conversation state timed out.
+        Args:
+            interval (float): Seconds between checks
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.conversation_flow.expire(self)
             except Exception as e:
-                logging.error(f"Error in session cleanup: {e}")
-                await asyncio.sleep(300)
+                logging.error(f"Error in conversation state timeouts: {e}")
+
+    def _resolve_answer(self, user_id: int, update) -> bool:
+        """
+        Hand a new private message to the `ask_user` call awaiting its sender.
+        Args:
+            user_id (int): Telegram user ID the update originates from
+            update: Raw Telegram update
+        Returns:
+            bool: True if the message was taken as an answer
+        """
+        if not isinstance(update, UpdateNewMessage):
+            return False
+        message = update.message
+        if getattr(message, "out", False) or not isinstance(message.peer_id, PeerUser):
+            return False
+
+        future = self._pending_answers.pop(user_id)
+        if future.done():
+            return False
+        message._finish_init(self, getattr(update, "_entities", {}), None)
+        future.set_result(message)
+        return True
+
+    def expect_answer(self, sender_id: int) -> asyncio.Future:
+        """
+        Register a future resolved with the next private message of a user.
+        The message is not dispatched to the handlers. A future already
+        waiting for the same user is cancelled.
+        Args:
+            sender_id (int): Telegram user ID
+        Returns:
+            asyncio.Future: Resolves with the `Message` sent by the user
+        """
+        previous = self._pending_answers.pop(sender_id, None)
+        if previous is not None:
+            previous.cancel()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending_answers[sender_id] = future
+        future.add_done_callback(lambda done: self._discard_answer(sender_id, done))
+        return future
+
+    def _discard_answer(self, sender_id: int, future: asyncio.Future) -> None:
+        if self._pending_answers.get(sender_id) is future:
+            del self._pending_answers[sender_id]
+
+    def cancel_answer(self, sender_id: int) -> bool:
+        """
+        Cancel the `ask_user` call awaiting a user, if any.
+        Args:
+            sender_id (int): Telegram user ID
+        Returns:
+            bool: True if a call was waiting
+        """
+        future = self._pending_answers.pop(sender_id, None)
+        return future is not None and future.cancel()
 
     async def ask_user(self, sender_id: int, question: str, state,
-                       context: Dict = None, **kwargs) -> Any:
+                       context: Dict = None, wait: bool = False,
+                       timeout: float | None = None, **kwargs) -> Any:
         """
         Ask a question a user and set their conversation state to wait for a response.
+        With `wait=True`, the call returns the user's answer instead, so a
+        multi-step conversation can be written as a single coroutine:
+
+            name = await client.ask_user(user_id, "Qual é o seu nome?", state, wait=True)
+            age = await client.ask_user(user_id, "Qual é a sua idade?", state, wait=True)
+
+        The answer is picked before the update is queued or dispatched, so it
+        does not wait behind the handler asking the question. While waiting,
+        the handler is released from its update worker and from the lane of
+        the user, whose other updates (e.g. a "cancel" button) are processed
+        meanwhile, so waiting users never hold up the bot.
         Args:
             sender_id (int): Telegram user ID
             question (str): Question text to send
             state: State to set while waiting for response
             context (Dict, optional): Additional context data
+            wait (bool): Whether to wait for and return the answer
+            timeout (float | None): Seconds to wait for the answer, `answer_timeout` by default
             **kwargs: Additional arguments for send_message
+        Returns:
+            The sent question, or the answer `Message` with `wait=True`
+        Raises:
+            asyncio.TimeoutError: If the user did not answer within `timeout`
+            asyncio.CancelledError: If the wait was cancelled with `cancel_answer`
         """
         self.set_user_state(sender_id, state, context)
-        return await self.send_message(sender_id, question, **kwargs)
+        if not wait:
+            return await self.send_message(sender_id, question, **kwargs)
+
+        if timeout is None:
+            timeout = self.answer_timeout
+        future = self.expect_answer(sender_id)
+        try:
+            await self.send_message(sender_id, question, **kwargs)
+            if self.update_scheduler is not None:
+                self.update_scheduler.release()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            future.cancel()
 
     async def handle_user_response(self, event, expected_state) -> bool:
         """
@@ -443,6 +995,52 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             handler = self.conversation_handlers[current_state]
             await handler(self, event)
 
+    def _entity_key(self, entity_id: int):
+        """
+        Get the entity cache key of an entity.
+        Access hashes are only valid for the bot that received them, so the
+        bots sharing a cache keep their entries apart.
+        Args:
+            entity_id (int): Telegram entity ID
+        Returns:
+            The entity ID, namespaced by the bot scope when there is one
+        """
+        return entity_id if self.scope is None else (self.scope, entity_id)
+
+    async def resolve_sender(self, event) -> Any:
+        """
+        Get the sender of an event with at most one entity lookup per update.
+        The sender carried by the update is used when complete, then the entity
+        cache is checked, and cold lookups are batched with concurrent ones.
+        The result is memoized on the event.
+        Args:
+            event: Telegram event object
+        Returns:
+            The sender entity
+        """
+        sender = getattr(event, "_sender", None)
+        if sender is not None and not getattr(sender, "min", False):
+            self.entity_cache.put(self._entity_key(sender.id), sender)
+            return sender
+
+        sender_id = event.sender_id
+        if sender_id is None:
+            return await event.get_sender()
+
+        sender = self.entity_cache.get(self._entity_key(sender_id))
+        if sender is None:
+            try:
+                sender = await self._entity_batcher.fetch(sender_id)
+            except Exception as e:
+                logging.debug(f"Falling back to event sender lookup for {sender_id}: {e}")
+                sender = await event.get_sender()
+            if sender is None:
+                return None
+            self.entity_cache.put(self._entity_key(sender_id), sender)
+
+        event._sender = sender
+        return sender
+
     async def get_admin_entity(self):
         """
         Retrieve the input entity for the first valid admin ID.
@@ -459,17 +1057,138 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
                 if peer:
                     return peer
 
+    async def __call__(self, request, ordered=False, flood_sleep_threshold=None):
+        """
+        Invoke a raw request.
+        Requests made through the outbound limiter never sleep on a FloodWait
+        inside the call, whatever `flood_sleep_threshold` is: the error reaches
+        the limiter, which blocks only the flooded chat and frees its slot.
+        Args:
+            request: The request or list of requests to invoke
+            ordered (bool): Whether a list of requests must run in order
+            flood_sleep_threshold (int | None): Longest FloodWait slept for
+                requests outside the limiter, the client setting by default
+        Returns:
+            The result of the request
+        """
+        if not _in_outbound.get():
+            return await self._call(
+                self._sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold
+            )
+
+        # Telethon remembers FloodWaits per request type, not per chat,
+        # the limiter keeps track of the flooded chats instead
+        for item in (request if utils.is_list_like(request) else (request,)):
+            self._flood_waited_requests.pop(item.CONSTRUCTOR_ID, None)
+        return await self._call(self._sender, request, ordered=ordered, flood_sleep_threshold=0)
+
+    async def _outbound(self, chat_id: Any, call, *args: Any, **kwargs: Any):
+        """
+        Perform an API call through the outbound limiter.
+        Calls made while another one holds its slot (e.g. `send_message` with a
+        file going through `send_file`) are part of it and run directly.
+        Args:
+            chat_id (Any): The chat the call is addressed to
+            call: Coroutine function performing the request
+            *args (Any): Positional arguments for `call`
+            **kwargs (Any): Keyword arguments for `call`, plus `priority`
+        Returns:
+            The result of `call`
+        """
+        if _in_outbound.get():
+            kwargs.pop("priority", None)
+            return await call(*args, **kwargs)
+
+        token = _in_outbound.set(True)
+        try:
+            return await self.outbound.run(chat_id, call, *args, **kwargs)
+        finally:
+            _in_outbound.reset(token)
+
     async def send_message(self, chat_id: Any, message: str = '', **kwargs: Any):
         """
         Send a message to a specified chat.
         Args:
             chat_id (Any): The ID of the chat where the message should be sent
             message (str): The message content to send
-            **kwargs (Any): Additional arguments to customize the message (e.g., buttons, parse_mode)
+            **kwargs (Any): Additional arguments to customize the message (e.g., buttons, parse_mode),
+                plus `priority` to choose the outbound lane (Priority.INTERACTIVE by default)
         Returns:
             The result of the send_message operation
         """
-        return await super().send_message(chat_id, message, **kwargs)
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        return await self._outbound(
+            chat_id,
+            super().send_message,
+            chat_id,
+            message,
+            priority=priority,
+            **kwargs
+        )
+
+    async def send_file(self, chat_id: Any, file: Any, **kwargs: Any):
+        """
+        Send a file to a specified chat, also used by `event.respond(file=...)`.
+        Args:
+            chat_id (Any): The ID of the chat where the file should be sent
+            file (Any): The file, media or list of files to send
+            **kwargs (Any): Additional arguments for Telethon's send_file (e.g., caption, buttons),
+                plus `priority` to choose the outbound lane (Priority.INTERACTIVE by default)
+        Returns:
+            The result of the send_file operation
+        """
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        return await self._outbound(
+            chat_id,
+            super().send_file,
+            chat_id,
+            file,
+            priority=priority,
+            **kwargs
+        )
+
+    async def edit_message(self, chat_id: Any, *args: Any, **kwargs: Any):
+        """
+        Edit a message through the outbound limiter, also used by `event.edit`.
+        Args:
+            chat_id (Any): The chat of the message, or the message itself
+            *args (Any): The message ID and new text, as in Telethon's edit_message
+            **kwargs (Any): Additional arguments for Telethon's edit_message (e.g., buttons),
+                plus `priority` to choose the outbound lane (Priority.INTERACTIVE by default)
+        Returns:
+            The edited message
+        """
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        chat = chat_id.peer_id if isinstance(chat_id, Message) else chat_id
+        return await self._outbound(
+            chat,
+            super().edit_message,
+            chat_id,
+            *args,
+            priority=priority,
+            **kwargs
+        )
+
+    async def delete_messages(self, chat_id: Any, message_ids: Any, **kwargs: Any):
+        """
+        Delete messages through the outbound limiter, also used by `event.delete`.
+        Args:
+            chat_id (Any): The ID of the chat where the messages are located
+            message_ids (Any): The ID or list of IDs of the messages to delete
+            **kwargs (Any): Additional arguments for Telethon's delete_messages (e.g., revoke),
+                plus `priority` to choose the outbound lane (Priority.INTERACTIVE by default)
+        Returns:
+            The affected messages
+        """
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        return await self._outbound(
+            chat_id,
+            super().delete_messages,
+            chat_id,
+            message_ids,
+            priority=priority,
+            **kwargs
+        )
 
     async def send_location(
             self,
@@ -510,10 +1229,14 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
                 long=long
             )
         )
-        return await super().send_file(
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        return await self._outbound(
+            chat_id,
+            super().send_file,
             chat_id,
             file=geo_live,
             caption=caption,
+            priority=priority,
             **kwargs
         )
 
@@ -556,10 +1279,14 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             period=60 * 30,
             proximity_notification_radius=proximity_notification_radius
         )
-        return await super().send_file(
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
+        return await self._outbound(
+            chat_id,
+            super().send_file,
             chat_id,
             file=geo_live,
             caption="📍 localização ao vivo...",
+            priority=priority,
             **kwargs
         )
 
@@ -588,7 +1315,9 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             file=geo_live
         )"""
 
-        await super().edit_message(
+        await self._outbound(
+            chat_id,
+            super().edit_message,
             chat_id,
             message_id,
             file=geo_live
@@ -604,10 +1333,10 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         Returns:
             The result of the answer operation
         """
-        sender_id = event.sender_id
-        current_drivers = self.drivers.get(sender_id, {}).get(MENU_KEY, [])
-        if current_drivers:
-            current_drivers.pop(-1)
+        session = self.get_user_session(event.sender_id)
+        if session.menu_stack:
+            session.menu_stack.pop(-1)
+            self._mark_session_dirty(session)
 
         return await event.answer(message, **kwargs)
 
@@ -623,10 +1352,20 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             return
 
         try:
-            await super().delete_messages(chat_id, message_ids)
+            await self._outbound(chat_id, super().delete_messages, chat_id, message_ids)
         except MessageDeleteForbiddenError as e:
             logging.info(f"An error occurred while trying to delete the message: {e}")
 
+    async def _delete_batch(self, chat_id, message_ids: list[int]):
+        """
+        Delete a batch of messages through the outbound limiter.
+        Errors are raised so the deletion queue can decide whether to retry.
+        Args:
+            chat_id: The ID of the chat where the messages are located
+            message_ids (list[int]): IDs of the messages to delete
+        """
+        await self._outbound(chat_id, super().delete_messages, chat_id, message_ids)
+
     async def update_message(self, chat_id, message_id, message, **kwargs):
         """
         Edit an existing message in a specified chat.
@@ -642,11 +1381,32 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
             logging.warning("Message ID is required to edit a message.")
             return
 
+        priority = kwargs.pop("priority", Priority.INTERACTIVE)
         try:
-            return await super().edit_message(chat_id, message_id, message, **kwargs)
+            return await self._outbound(
+                chat_id,
+                super().edit_message,
+                chat_id,
+                message_id,
+                message,
+                priority=priority,
+                **kwargs
+            )
         except Exception as e:
             logging.info(f"Error while editing message: {e}")
 
+    async def broadcast(self, message: str, admin_chat: int | None = None):
+        """
+        Send a message to every user in the session store, in the background.
+        Progress is checkpointed and reported to the admin chat, see `Broadcaster`.
+        Args:
+            message (str): The text to send
+            admin_chat (int | None): Chat receiving the progress reports, the first admin by default
+        Returns:
+            BroadcastJob: The started broadcast
+        """
+        return await self.broadcaster.start(message, admin_chat)
+
     async def inline_button(self, chat_id, line_buttons):
         """
         Create an inline button and send a message with it.
@@ -798,31 +1558,78 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
                 logging.error(f'Error in keep_alive: {e}', exc_info=True)
                 await asyncio.sleep(60)
 
+    async def _run_loops(self, loops: list) -> None:
+        """
+        Run the background loops of the bot until it disconnects.
+        Every loop is cancelled and awaited as soon as the bot disconnects or
+        a loop fails, so a restarted bot never keeps the loops of a previous run.
+        Args:
+            loops (list): Coroutines of the background loops
+        Raises:
+            Exception: The error of the first loop that failed
+        """
+        connection = asyncio.create_task(self.run_until_disconnected())
+        pending = {connection, *(asyncio.create_task(loop) for loop in loops)}
+        try:
+            while connection in pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Loops with nothing to do return, failures are raised
+                    task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
     async def run(self) -> None:
         """
         Start the bot, load event handlers, and manage its lifecycle.
+        Returns when the bot disconnects, with its background loops stopped.
         Handles connection errors by attempting to reconnect automatically.
         """
         try:
             await self.start(bot_token=self.bot_token)
             await self.ensure_ready()
 
-            plugin_loader: PluginLoader = PluginLoader(
-                self,
-                self.plugins
-            )
-            plugin_loader.load_plugins()
+            if self.plugin_loader is None:
+                # Registered first, so messages taking a flow transition skip the plugins
+                flow_chats = (lambda event: event.is_private) if self.flow_private_only else None
+                self.add_event_handler(dispatch_flow, events.NewMessage(incoming=True, func=flow_chats))
+                self.add_event_handler(dispatch_flow, events.CallbackQuery(func=flow_chats))
+                self.plugin_loader = PluginLoader(
+                    self,
+                    self.plugins
+                )
+                self.plugin_loader.on_reload.append(self.compile_flow)
+                self.plugin_loader.load_plugins()
+                self.compile_flow()
+            if (self.metrics_port is not None and self.metrics_server is None
+                    and self.plugin_loader.metrics is not None):
+                self.metrics_server = await start_metrics_server(
+                    self.plugin_loader.metrics,
+                    port=self.metrics_port,
+                    extra=self.export_state_counts
+                )
             await self.register_commands()
 
             if self.config is not None:
                 await self.set_bot_info()
 
-            logging.info('Starting Telegram bot!')
-            await asyncio.gather(
-                self.run_until_disconnected(),
+            await self.broadcaster.resume()
+
+            loops = [
                 self.keep_alive(),
-                self._cleanup_expired_sessions()
-            )
+                self._cleanup_expired_sessions(),
+                self._flush_sessions_periodically()
+            ]
+            if self.plugin_loader.hot_reload:
+                loops.append(self.plugin_loader.watch())
+            if self.conversation_flow.has_timeouts or self.plugin_loader.hot_reload:
+                loops.append(self._expire_conversation_states())
+
+            logging.info('Starting Telegram bot!')
+            await self._run_loops(loops)
+            logging.warning('Bot disconnected from Telegram.')
 
         except ConnectionError:
             logging.error('Failed to connect to Telegram.')
@@ -834,17 +1641,32 @@ class Client(TelegramClient, Generic[StateT, SessionT]):
         Gracefully disconnect the bot from the Telegram API.
         Ensures proper cleanup of resources before exiting.
         """
+        await self.broadcaster.stop()
+        for future in list(self._pending_answers.values()):
+            future.cancel()
+        await self.deletion_queue.flush()
         await self.disconnect()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        if self.trace_path is not None and self.tracer.traces:
+            self.tracer.export(self.trace_path)
+        if self.update_scheduler is not None:
+            await self.update_scheduler.close()
+        await self.flush_sessions()
+        self.user_sessions.close()
         logging.info('Bot successfully disconnected.')
 
     def start_service(self) -> None:
         """
-        Start the bot service and run it until interrupted.
+        Start the bot service and run it until interrupted, restarting it when it disconnects.
         Handles cleanup upon keyboard interruption to ensure a graceful shutdown.
         """
         loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
         try:
-            loop.run_until_complete(self.run())
+            while True:
+                loop.run_until_complete(self.run())
+                logging.info('Restarting the bot in 5 seconds...')
+                loop.run_until_complete(asyncio.sleep(5))
         except KeyboardInterrupt:
             logging.info(
                 'Bot interrupted by user.\n'
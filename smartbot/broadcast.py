@@ -0,0 +1,347 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any
+
+from smartbot.outbound import Priority
+
+
+class BroadcastJob:
+    """
+    Progress of a broadcast, as stored in the checkpoint file.
+
+    Attributes:
+        job_id (str): Identifier of the broadcast.
+        message (str): Text sent to every user.
+        admin_chat (int | None): Chat receiving the progress reports.
+        total (int): Number of users when the broadcast started.
+        cursor (int | None): Every user ID up to this one has been handled.
+        sent (int): Messages delivered to the users up to `cursor`.
+        failed (int): Users up to `cursor` the message could not be delivered to.
+        elapsed (float): Seconds spent sending, across restarts.
+        status (str): "running", "done" or "cancelled".
+        report_message_id (int | None): Message edited with the progress report.
+    """
+
+    def __init__(
+            self,
+            job_id: str,
+            message: str,
+            admin_chat: int | None = None,
+            total: int = 0,
+            cursor: int | None = None,
+            sent: int = 0,
+            failed: int = 0,
+            elapsed: float = 0.0,
+            status: str = "running",
+            report_message_id: int | None = None,
+    ) -> None:
+        self.job_id = job_id
+        self.message = message
+        self.admin_chat = admin_chat
+        self.total = total
+        self.cursor = cursor
+        self.sent = sent
+        self.failed = failed
+        self.elapsed = elapsed
+        self.status = status
+        self.report_message_id = report_message_id
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Messages handled per second."""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> float | None:
+        """Estimated seconds left, or None before the rate is known."""
+        if not self.rate:
+            return None
+        return max(self.total - self.processed, 0) / self.rate
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "message": self.message,
+            "admin_chat": self.admin_chat,
+            "total": self.total,
+            "cursor": self.cursor,
+            "sent": self.sent,
+            "failed": self.failed,
+            "elapsed": self.elapsed,
+            "status": self.status,
+            "report_message_id": self.report_message_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "BroadcastJob":
+        return cls(**data)
+
+
+class Broadcaster:
+    """
+    Sends a message to every user of the session store.
+
+    Recipients are read from the store in pages of ascending user IDs and
+    sent through the client outbound limiter in the bulk lane, so replies
+    to users keep their priority. Progress is checkpointed to a JSON file
+    after every page; a broadcast interrupted by a crash or a restart is
+    resumed from the last user ID known to be handled, so at most one page
+    of users may receive the message twice. The sent and failed counters
+    are checkpointed with that user ID, so they count every user once.
+    """
+
+    def __init__(
+            self,
+            client: Any,
+            checkpoint_path: str,
+            concurrency: int = 20,
+            page_size: int = 500,
+            report_interval: float = 15,
+    ) -> None:
+        """
+        Initializes the broadcaster.
+
+        :param client: The Telegram client sending the messages.
+        :param checkpoint_path: Path of the JSON checkpoint file.
+        :param concurrency: Maximum number of sends in flight.
+        :param page_size: Number of user IDs read from the store at a time.
+        :param report_interval: Seconds between progress reports to the admin chat.
+        """
+        self.client = client
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.report_interval = report_interval
+        self.job: BroadcastJob | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _load(self) -> BroadcastJob | None:
+        """
+        Reads the checkpoint file.
+        """
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return BroadcastJob.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            logging.error(f"Ignoring unreadable broadcast checkpoint {self.checkpoint_path}: {e}")
+            return None
+
+    def _save(self, job: BroadcastJob) -> None:
+        """
+        Writes the checkpoint file atomically.
+        """
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+        os.replace(temp_path, self.checkpoint_path)
+
+    async def start(self, message: str, admin_chat: int | None = None) -> BroadcastJob:
+        """
+        Starts broadcasting a message to every user.
+
+        :param message: The text to send.
+        :param admin_chat: Chat receiving the progress reports, the first admin by default.
+        :return: The new broadcast job.
+        :raises RuntimeError: If a broadcast is already running.
+        """
+        if self.running:
+            raise RuntimeError(f"Broadcast {self.job.job_id} is already running")
+
+        if admin_chat is None and self.client.admin_ids:
+            admin_chat = self.client.admin_ids[0]
+
+        await self._flush_sessions()
+        job = BroadcastJob(
+            uuid.uuid4().hex[:8],
+            message,
+            admin_chat=admin_chat,
+            total=len(self.client.user_sessions),
+        )
+        await asyncio.to_thread(self._save, job)
+        self._launch(job)
+        return job
+
+    async def resume(self) -> BroadcastJob | None:
+        """
+        Resumes the broadcast left running by a previous process, if any.
+
+        :return: The resumed job, or None if there was nothing to resume.
+        """
+        if self.running:
+            return self.job
+
+        job = await asyncio.to_thread(self._load)
+        if job is None or job.status != "running":
+            return None
+
+        logging.info(f"Resuming broadcast {job.job_id} after user {job.cursor}")
+        await self._flush_sessions()
+        self._launch(job)
+        return job
+
+    async def cancel(self) -> bool:
+        """
+        Cancels the running broadcast. It will not be resumed.
+
+        :return: True if a broadcast was running.
+        """
+        if not self.running:
+            return False
+        self.job.status = "cancelled"
+        await self.stop()
+        await self._report(self.job)
+        return True
+
+    async def stop(self) -> None:
+        """
+        Stops the running broadcast, keeping its checkpoint for `resume`.
+        """
+        if not self.running:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _flush_sessions(self) -> None:
+        """
+        Writes every pending session before a job pages through the store,
+        from a worker thread, so the pages list every known user.
+        """
+        await self.client.flush_sessions()
+
+    def _launch(self, job: BroadcastJob) -> None:
+        self.job = job
+        self._task = asyncio.create_task(self._run(job))
+
+    async def _send(self, job: BroadcastJob, user_id: int) -> bool:
+        """
+        Sends the broadcast message to one user.
+
+        :return: True if the message was delivered.
+        """
+        try:
+            await self.client.send_message(user_id, job.message, priority=Priority.BULK)
+        except Exception as e:
+            logging.debug(f"Broadcast {job.job_id} failed for user {user_id}: {e}")
+            return False
+        return True
+
+    async def _run(self, job: BroadcastJob) -> None:
+        """
+        Sends the message page by page, checkpointing and reporting the progress.
+        """
+        resumed_elapsed = job.elapsed
+        started = time.monotonic()
+        last_report = started
+        slots = asyncio.Semaphore(self.concurrency)
+        in_flight: deque[tuple[int, asyncio.Task]] = deque()
+
+        def release(_: asyncio.Task) -> None:
+            slots.release()
+
+        def advance() -> None:
+            # The cursor and the counters only move past users whose send has
+            # completed, so a resumed job neither skips nor counts anyone twice
+            while in_flight and in_flight[0][1].done() and not in_flight[0][1].cancelled():
+                user_id, task = in_flight.popleft()
+                job.cursor = user_id
+                if task.result():
+                    job.sent += 1
+                else:
+                    job.failed += 1
+
+        await self._report(job)
+        try:
+            after = job.cursor
+            while True:
+                user_ids = self.client.user_sessions.page_user_ids(after, self.page_size)
+                if not user_ids:
+                    break
+
+                for user_id in user_ids:
+                    await slots.acquire()
+                    task = asyncio.create_task(self._send(job, user_id))
+                    task.add_done_callback(release)
+                    in_flight.append((user_id, task))
+                    advance()
+
+                after = user_ids[-1]
+                job.elapsed = resumed_elapsed + time.monotonic() - started
+                await asyncio.to_thread(self._save, job)
+
+                if time.monotonic() - last_report >= self.report_interval:
+                    last_report = time.monotonic()
+                    await self._report(job)
+
+            await asyncio.gather(*(task for _, task in in_flight))
+            advance()
+            job.status = "done"
+        except asyncio.CancelledError:
+            for _, task in in_flight:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in in_flight), return_exceptions=True)
+            advance()
+            raise
+        finally:
+            job.elapsed = resumed_elapsed + time.monotonic() - started
+            await asyncio.to_thread(self._save, job)
+
+        logging.info(f"Broadcast {job.job_id} finished: {job.sent} sent, {job.failed} failed")
+        await self._report(job)
+
+    @staticmethod
+    def format_report(job: BroadcastJob) -> str:
+        """
+        Formats the progress report of a broadcast.
+
+        :param job: The broadcast job.
+        :return: The report text.
+        """
+        titles = {
+            "running": "📣 Transmissão em andamento",
+            "done": "✅ Transmissão concluída",
+            "cancelled": "🛑 Transmissão cancelada",
+        }
+        eta = job.eta
+        lines = [
+            f"{titles.get(job.status, job.status)} ({job.job_id})",
+            f"Enviadas: {job.sent}/{job.total}",
+            f"Falhas: {job.failed}",
+            f"Velocidade: {job.rate:.1f} msg/s",
+        ]
+        if job.status == "running":
+            lines.append(f"Tempo restante: {'calculando...' if eta is None else f'{eta / 60:.1f} min'}")
+        else:
+            lines.append(f"Duração: {job.elapsed / 60:.1f} min")
+        return "\n".join(lines)
+
+    async def _report(self, job: BroadcastJob) -> None:
+        """
+        Sends or updates the progress report in the admin chat.
+        """
+        if job.admin_chat is None:
+            return
+
+        text = self.format_report(job)
+        try:
+            if job.report_message_id is None:
+                message = await self.client.send_message(job.admin_chat, text)
+                job.report_message_id = message.id
+            else:
+                await self.client.update_message(job.admin_chat, job.report_message_id, text)
+        except Exception as e:
+            logging.warning(f"Could not report broadcast {job.job_id} progress: {e}")
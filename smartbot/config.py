@@ -20,6 +20,7 @@ config = load_config('config.toml')
 API_ID: Final[str] = config['API']['ID']
 API_HASH: Final[str] = config['API']['HASH']
 BOT_TOKEN: Final[str] = config['API']['BOT_TOKEN']
+BOT_TOKENS: Final[list] = config['API'].get('BOT_TOKENS', [])
 ADMIN_IDS: Final[list] = config['ADMIN']['IDS']
 APP_NAME: Final[str] = config['APPLICATION']['APP_NAME']
 APP_AUTHOR: Final[str] = config['APPLICATION']['APP_AUTHOR']
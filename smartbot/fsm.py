@@ -0,0 +1,428 @@
+import sys
+import time
+import inspect
+import logging
+from enum import Enum
+from typing import Any, Awaitable, Callable, Hashable
+
+from telethon import events
+from telethon.events import CallbackQuery
+
+from smartbot.utils.expiry import ExpiryIndex
+
+# Source of the transitions available from every state
+ANY_STATE = "*"
+# Trigger of the transitions taken by any text message, other than a command,
+# without a more specific trigger
+ANY_INPUT = None
+
+# Actions receive the client, the user ID and the triggering event, None on timeouts
+Action = Callable[[Any, int, Any], Awaitable[Any] | Any]
+
+
+def _state_name(state: Enum | str) -> str:
+    return state.name if isinstance(state, Enum) else state
+
+
+async def _call(function: Callable | None, *args: Any) -> Any:
+    if function is None:
+        return None
+    result = function(*args)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def message_trigger(event: Any) -> Hashable:
+    """
+    Returns the key an event is looked up with in the transition table:
+    the callback data of a button, the command of a message without its
+    arguments and bot username, or the whole text of other messages.
+
+    :param event: A `NewMessage` or `CallbackQuery` event.
+    """
+    if isinstance(event, CallbackQuery.Event):
+        return event.data or b""
+    text = (event.raw_text or "").strip()
+    if text.startswith("/"):
+        return text.split(maxsplit=1)[0].split("@", 1)[0]
+    return text
+
+
+class StateSpec:
+    """
+    Behaviour attached to a conversation state.
+
+    Attributes:
+        name (str): Name of the state in the conversation state enum.
+        timeout (float | None): Seconds a user may stay in the state.
+        timeout_to (str): State entered when the timeout elapses.
+        on_enter (Action | None): Called after the state is entered.
+        on_exit (Action | None): Called before the state is left.
+        on_timeout (Action | None): Called when the timeout elapses, before leaving.
+    """
+
+    __slots__ = ("name", "timeout", "timeout_to", "on_enter", "on_exit", "on_timeout")
+
+    def __init__(self, name: str, timeout: float | None = None, timeout_to: str = "IDLE",
+                 on_enter: Action | None = None, on_exit: Action | None = None,
+                 on_timeout: Action | None = None) -> None:
+        self.name = name
+        self.timeout = timeout
+        self.timeout_to = timeout_to
+        self.on_enter = on_enter
+        self.on_exit = on_exit
+        self.on_timeout = on_timeout
+
+
+class Transition:
+    """
+    A move between conversation states.
+
+    Attributes:
+        source (Any): The state the transition starts from.
+        trigger (str | bytes | None): Text, command or callback data taking
+            the transition, `ANY_INPUT` for any text message other than a command.
+        target (Any): The state entered.
+        guard (Callable | None): Called with (client, user_id, event), the
+            transition is only taken if it returns True.
+        validate (Callable | None): Converts the message text, raising
+            `ValueError` to reject it. The user then stays in the state.
+        store (str | None): Context key the validated input is saved under.
+        action (Action | None): Called between leaving the source and entering the target.
+        error (str | None): Reply to rejected input, the `ValueError` message by default.
+    """
+
+    __slots__ = ("source", "trigger", "target", "guard", "validate", "store", "action", "error")
+
+    def __init__(self, source: Any, trigger: str | bytes | None, target: Any,
+                 guard: Callable | None = None, validate: Callable[[str], Any] | None = None,
+                 store: str | None = None, action: Action | None = None,
+                 error: str | None = None) -> None:
+        self.source = source
+        self.trigger = trigger
+        self.target = target
+        self.guard = guard
+        self.validate = validate
+        self.store = store
+        self.action = action
+        self.error = error
+
+    def bind(self, source: Any, target: Any) -> "Transition":
+        """
+        Returns a copy of the transition between resolved states.
+        """
+        return Transition(source, self.trigger, target, self.guard, self.validate,
+                          self.store, self.action, self.error)
+
+
+class ConversationFlow:
+    """
+    Declarative conversation state machine.
+
+    Plugins declare states and transitions by state name (or enum member)
+    when they are imported. When the plugins are loaded, the declarations
+    are compiled against the client conversation state enum into a
+    transition table, so each message is resolved with two dictionary
+    lookups, whatever the number of states and transitions.
+
+    Declarations remember the module making them, so a plugin reloaded
+    by the plugin loader replaces its own declarations.
+    """
+
+    def __init__(self) -> None:
+        self._states: dict[str, StateSpec] = {}
+        self._transitions: dict[tuple[str, Hashable], Transition] = {}
+        # Module that made each declaration, by state name or transition key
+        self._owners: dict[Hashable, str | None] = {}
+
+    @staticmethod
+    def _caller() -> str | None:
+        return sys._getframe(2).f_globals.get("__name__")
+
+    def forget(self, module: str) -> tuple[dict, dict]:
+        """
+        Removes the declarations made by a module, before it is reloaded.
+
+        :param module: The module path.
+        :return: The removed states and transitions, for `restore`.
+        """
+        states = {name: spec for name, spec in self._states.items() if self._owners.get(name) == module}
+        transitions = {
+            key: transition for key, transition in self._transitions.items()
+            if self._owners.get(key) == module
+        }
+        for name in states:
+            del self._states[name], self._owners[name]
+        for key in transitions:
+            del self._transitions[key], self._owners[key]
+        return states, transitions
+
+    def restore(self, module: str, declarations: tuple[dict, dict]) -> None:
+        """
+        Puts back the declarations removed by `forget`, when the module failed to reload.
+
+        :param module: The module path.
+        :param declarations: The value returned by `forget`.
+        """
+        states, transitions = declarations
+        for name, spec in states.items():
+            self._states.setdefault(name, spec)
+            self._owners.setdefault(name, module)
+        for key, transition in transitions.items():
+            self._transitions.setdefault(key, transition)
+            self._owners.setdefault(key, module)
+
+    def __len__(self) -> int:
+        return len(self._transitions)
+
+    def state(self, state: Enum | str, timeout: float | None = None, timeout_to: Enum | str = "IDLE",
+              on_enter: Action | None = None, on_exit: Action | None = None,
+              on_timeout: Action | None = None) -> StateSpec:
+        """
+        Declares the behaviour of a state. Declaring it again replaces it.
+
+        :param state: The state, or its name in the conversation state enum.
+        :param timeout: Seconds a user may stay in the state, None for no limit.
+        :param timeout_to: State entered when the timeout elapses.
+        :param on_enter: Called with (client, user_id, event) after the state is entered.
+        :param on_exit: Called with (client, user_id, event) before the state is left.
+        :param on_timeout: Called with (client, user_id, None) when the timeout elapses.
+        :return: The declared state.
+        """
+        spec = self._states[_state_name(state)] = StateSpec(
+            _state_name(state), timeout, _state_name(timeout_to), on_enter, on_exit, on_timeout
+        )
+        self._owners[spec.name] = self._caller()
+        return spec
+
+    def transition(self, source: Enum | str, target: Enum | str, on: str | bytes | None = ANY_INPUT,
+                   guard: Callable | None = None, validate: Callable[[str], Any] | None = None,
+                   store: str | None = None, action: Action | None = None,
+                   error: str | None = None) -> Transition:
+        """
+        Declares a transition. Declaring the same source and trigger again replaces it.
+
+        :param source: The state the transition starts from, `ANY_STATE` for every state.
+        :param target: The state entered.
+        :param on: Text or command (e.g. "/cancel") of a message, callback data
+            of a button, or `ANY_INPUT` for any other text message that is not a command.
+        :param guard: Called with (client, user_id, event), the transition is
+            only taken if it returns True.
+        :param validate: Converts the message text, raising `ValueError` to reject it.
+        :param store: Context key the validated input is saved under.
+        :param action: Called with (client, user_id, event) during the transition.
+        :param error: Reply to rejected input, the `ValueError` message by default.
+        :return: The declared transition.
+        """
+        key = (_state_name(source), on)
+        module = self._caller()
+        if key in self._transitions and self._owners.get(key) != module:
+            logging.warning(f"Transition from {key[0]} on {on!r} declared twice, replacing it")
+        transition = self._transitions[key] = Transition(
+            _state_name(source), on, _state_name(target), guard, validate, store, action, error
+        )
+        self._owners[key] = module
+        return transition
+
+    def compile(self, state_class: type[Enum]) -> "FlowEngine":
+        """
+        Builds the transition table for a conversation state enum.
+
+        :param state_class: The conversation state enum of the client.
+        :return: The engine running the flow.
+        :raises ValueError: If a declaration names a state missing from the enum.
+        """
+
+        def resolve(name: str) -> Enum:
+            try:
+                return state_class[name]
+            except KeyError:
+                raise ValueError(f"Unknown conversation state {name!r} in {state_class.__name__}") from None
+
+        states = {}
+        for name, spec in self._states.items():
+            resolve(spec.timeout_to)
+            states[resolve(name)] = spec
+
+        table: dict[Enum, dict[Hashable, Transition]] = {}
+        wildcards = []
+        for (source, trigger), transition in self._transitions.items():
+            if source == ANY_STATE:
+                wildcards.append(transition)
+                continue
+            state = resolve(source)
+            table.setdefault(state, {})[trigger] = transition.bind(state, resolve(transition.target))
+
+        # Transitions from any state are copied into every row, specific ones win
+        for transition in wildcards:
+            target = resolve(transition.target)
+            for state in state_class:
+                table.setdefault(state, {}).setdefault(transition.trigger, transition.bind(state, target))
+
+        return FlowEngine(state_class, table, states)
+
+
+class FlowEngine:
+    """
+    Runs a compiled conversation flow for the users of a client.
+
+    Deadlines of the states with a timeout are kept in memory, so they do
+    not survive a restart; the session timeout still applies.
+    """
+
+    def __init__(self, state_class: type[Enum], table: dict[Enum, dict[Hashable, Transition]],
+                 states: dict[Enum, StateSpec]) -> None:
+        self.state_class = state_class
+        self.idle = state_class.IDLE
+        self.table = table
+        self.states = states
+        self.has_timeouts = any(spec.timeout for spec in states.values())
+        self._deadlines: dict[int, tuple[Enum, float]] = {}
+        self._expiry = ExpiryIndex()
+
+    def __bool__(self) -> bool:
+        return bool(self.table)
+
+    def resolve(self, state: Enum, trigger: Hashable) -> Transition | None:
+        """
+        Finds the transition a trigger takes from a state.
+
+        :param state: The current state of the user.
+        :param trigger: The key returned by `message_trigger`.
+        :return: The transition, or None if the trigger does nothing in this state.
+        """
+        row = self.table.get(state)
+        if row is None:
+            return None
+        transition = row.get(trigger)
+        if transition is None and isinstance(trigger, str) and not trigger.startswith("/"):
+            transition = row.get(ANY_INPUT)
+        return transition
+
+    async def handle(self, client: Any, event: Any) -> bool:
+        """
+        Takes the transition triggered by an incoming message or button, if any.
+
+        :param client: The client the event was received by.
+        :param event: A `NewMessage` or `CallbackQuery` event.
+        :return: True if the event was consumed by the flow.
+        """
+        user_id = event.sender_id
+        session = client._find_user_session(user_id)
+        state = session.state if session is not None else self.idle
+
+        trigger = message_trigger(event)
+        transition = self.resolve(state, trigger)
+        if transition is None:
+            return False
+        if transition.guard is not None and not await _call(transition.guard, client, user_id, event):
+            return False
+
+        if transition.validate is not None or transition.store is not None:
+            value = event.raw_text if not isinstance(trigger, bytes) else trigger
+            if transition.validate is not None:
+                try:
+                    value = transition.validate(value)
+                except ValueError as e:
+                    await event.reply(transition.error or str(e) or "Entrada inválida.")
+                    return True
+            if transition.store is not None:
+                client.set_user_context(user_id, transition.store, value)
+
+        await self.move(client, user_id, state, transition.target, event, transition.action)
+        return True
+
+    async def move(self, client: Any, user_id: int, source: Enum, target: Enum,
+                   event: Any = None, action: Action | None = None) -> None:
+        """
+        Moves a user to a state, running the exit, transition and entry actions.
+
+        Exit and entry actions only run when the state changes. The timeout
+        of the target state starts over.
+
+        :param client: The client.
+        :param user_id: Telegram user ID.
+        :param source: The current state of the user.
+        :param target: The state to enter.
+        :param event: The triggering event, None on timeouts.
+        :param action: The transition action.
+        """
+        changed = target != source
+        source_spec = self.states.get(source)
+        if changed and source_spec is not None:
+            await _call(source_spec.on_exit, client, user_id, event)
+        await _call(action, client, user_id, event)
+
+        if changed:
+            client.set_user_state(user_id, target)
+        self._arm(user_id, target)
+
+        target_spec = self.states.get(target)
+        if changed and target_spec is not None:
+            await _call(target_spec.on_enter, client, user_id, event)
+
+    def adopt(self, previous: "FlowEngine") -> None:
+        """
+        Takes over the running state timeouts of the engine it replaces,
+        when the flow is compiled again after a plugin reload.
+
+        :param previous: The engine replaced.
+        """
+        self._deadlines = previous._deadlines
+        self._expiry = previous._expiry
+
+    def _arm(self, user_id: int, state: Enum) -> None:
+        spec = self.states.get(state)
+        if spec is None or not spec.timeout:
+            self._deadlines.pop(user_id, None)
+            return
+        deadline = time.monotonic() + spec.timeout
+        self._deadlines[user_id] = (state, deadline)
+        # The index only pushes deadlines back, a shorter timeout needs a new entry
+        self._expiry.discard(user_id)
+        self._expiry.schedule(user_id, deadline)
+
+    def _deadline(self, user_id: int) -> float | None:
+        entry = self._deadlines.get(user_id)
+        return entry[1] if entry is not None else None
+
+    async def expire(self, client: Any) -> int:
+        """
+        Moves the users whose state timed out to the timeout state.
+
+        :param client: The client.
+        :return: Number of users moved.
+        """
+        expired = self._expiry.pop_expired(time.monotonic(), self._deadline)
+        moved = 0
+        for user_id in expired:
+            state, _ = self._deadlines.pop(user_id)
+            session = client._find_user_session(user_id)
+            spec = self.states.get(state)
+            if session is None or session.state != state or spec is None or not spec.timeout:
+                continue
+
+            logging.info(f"User {user_id} timed out in state {state.name}")
+            try:
+                await _call(spec.on_timeout, client, user_id, None)
+                await self.move(client, user_id, state, self.state_class[spec.timeout_to])
+            except Exception:
+                logging.exception(f"Error while timing out user {user_id} in state {state.name}")
+            moved += 1
+        return moved
+
+
+conversation_flow = ConversationFlow()
+
+
+async def dispatch_flow(event: Any) -> None:
+    """
+    Telethon handler feeding messages and button presses to the client flow.
+    Events taking a transition are not seen by the handlers registered after it.
+
+    :param event: A `NewMessage` or `CallbackQuery` event.
+    """
+    engine = getattr(event.client, "conversation_flow", None)
+    if engine and await engine.handle(event.client, event):
+        raise events.StopPropagation
@@ -2,6 +2,7 @@ import logging
 from telethon import events
 from typing import Any
 from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
 
 
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +17,7 @@ async def handle_callback(event: Any):
 
     :param event: The event is triggered by an inline button interaction.
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Callback Triggered by User ID: {sender_id}")
     logging.debug(f"Event Client Instance: {event.client}")
@@ -2,6 +2,7 @@ import logging
 from typing import Any
 from telethon import events, Button
 from smartbot.utils.handler import ClientHandler
+from smartbot.utils.entities import get_sender
 
 logging.basicConfig(level=logging.INFO)
 
@@ -15,7 +16,7 @@ async def handle_start(event: Any):
 
     :param event: The event triggered by the `/start` command.
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Start Handler Triggered by User ID: {sender_id}")
     logging.debug(f"Event Client Instance: {event.client}")
@@ -40,7 +41,7 @@ async def handle_send_button(event: Any):
 
     :param event: The event triggered by the `/button` command.
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     logging.info(f"Handler Triggered by User ID: {sender_id}")
     logging.debug(f"Event Client Instance: {event.client}")
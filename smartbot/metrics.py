@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import functools
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Callable, Iterator
+
+from telethon import events
+
+# Histogram bucket upper bounds in seconds, 2^(1/4) apart from 10 µs to about 90 s,
+# so quantiles are reported at most ~19% above the observed latency
+BUCKET_FACTOR = 2 ** 0.25
+BUCKET_BOUNDS: tuple[float, ...] = tuple(1e-5 * BUCKET_FACTOR ** i for i in range(93))
+# Every fourth bound (10 µs times a power of 2) is exported, enough for a Prometheus histogram
+EXPORT_STEP = 4
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets.
+
+    Recording is a binary search and an increment. Quantiles are the upper
+    bound of the bucket holding the requested rank.
+    """
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Records one duration.
+
+        :param seconds: The observed duration.
+        """
+        self.counts[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Adds the observations of another histogram to this one.
+        """
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile of the recorded durations.
+
+        :param q: The quantile, between 0 and 1.
+        :return: The estimate in seconds, 0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else float("inf")
+        return float("inf")
+
+    def cumulative(self) -> Iterator[tuple[float, int]]:
+        """
+        Yields the exported bucket bounds with the number of durations up to each.
+        """
+        seen = 0
+        for index, count in enumerate(self.counts[:-1]):
+            seen += count
+            if index % EXPORT_STEP == 0:
+                yield BUCKET_BOUNDS[index], seen
+        yield float("inf"), self.count
+
+
+class HandlerStats:
+    """
+    Call and error counts and latency histogram of one handler.
+
+    Attributes:
+        handler (str): Module and name of the handler.
+        event (str): Name of the event builder the handler was registered with.
+        errors (int): Calls that raised an exception.
+        latency (Histogram): Duration of every call.
+    """
+
+    __slots__ = ("handler", "event", "errors", "latency")
+
+    def __init__(self, handler: str, event: str) -> None:
+        self.handler = handler
+        self.event = event
+        self.errors = 0
+        self.latency = Histogram()
+
+    @property
+    def calls(self) -> int:
+        return self.latency.count
+
+
+class HandlerMetrics:
+    """
+    Latency and throughput of the handlers registered by the plugin loader,
+    by handler and by event type.
+    """
+
+    def __init__(self) -> None:
+        self._stats: dict[tuple[str, str], HandlerStats] = {}
+        self.started = perf_counter()
+
+    def __iter__(self) -> Iterator[HandlerStats]:
+        return iter(self._stats.values())
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def stats(self, handler: str, event: str) -> HandlerStats:
+        """
+        Returns the stats of a handler, creating them on first use.
+
+        :param handler: Module and name of the handler.
+        :param event: Name of the event builder.
+        """
+        key = (handler, event)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = HandlerStats(handler, event)
+        return stats
+
+    def instrument(self, callback: Callable, handler: str, event: Any) -> Callable:
+        """
+        Wraps a handler to record its calls, errors and latency.
+
+        `StopPropagation` is not counted as an error. The wrapper keeps the
+        name and attributes of the handler.
+
+        :param callback: The handler function.
+        :param handler: Module and name the handler is reported under.
+        :param event: The event builder the handler is registered with.
+        :return: The wrapped handler.
+        """
+        stats = self.stats(handler, type(event).__name__ if event is not None else "Raw")
+        observe = stats.latency.observe
+
+        @functools.wraps(callback)
+        async def instrumented(event):
+            started = perf_counter()
+            try:
+                return await callback(event)
+            except events.StopPropagation:
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                observe(perf_counter() - started)
+
+        return instrumented
+
+    def by_event(self) -> dict[str, HandlerStats]:
+        """
+        Returns the stats of every handler merged by event type.
+        """
+        merged: dict[str, HandlerStats] = {}
+        for stats in self._stats.values():
+            total = merged.get(stats.event)
+            if total is None:
+                total = merged[stats.event] = HandlerStats("*", stats.event)
+            total.errors += stats.errors
+            total.latency.merge(stats.latency)
+        return merged
+
+    def format_report(self, limit: int = 10) -> str:
+        """
+        Summarizes the slowest handlers and the totals by event type.
+
+        :param limit: Maximum number of handlers listed.
+        :return: The report text.
+        """
+        uptime = perf_counter() - self.started
+        lines = ["📊 Métricas dos handlers"]
+
+        def describe(stats: HandlerStats) -> str:
+            latency = stats.latency
+            return (
+                f"{stats.calls} chamadas ({stats.calls / uptime:.2f}/s), {stats.errors} erros, "
+                f"p50 {latency.quantile(0.5) * 1000:.2f} ms, "
+                f"p95 {latency.quantile(0.95) * 1000:.2f} ms, "
+                f"p99 {latency.quantile(0.99) * 1000:.2f} ms"
+            )
+
+        called = [stats for stats in self._stats.values() if stats.calls]
+        if not called:
+            lines.append("Nenhum handler foi chamado ainda.")
+            return "\n".join(lines)
+
+        lines.append("\nPor tipo de evento:")
+        for event, stats in sorted(self.by_event().items()):
+            lines.append(f"• {event}: {describe(stats)}")
+
+        lines.append("\nHandlers mais lentos (p99):")
+        called.sort(key=lambda stats: stats.latency.quantile(0.99), reverse=True)
+        for stats in called[:limit]:
+            lines.append(f"• {stats.handler} ({stats.event}): {describe(stats)}")
+        return "\n".join(lines)
+
+    def export(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        return export_metrics({None: self})
+
+
+def export_metrics(sources: dict[str | None, HandlerMetrics]) -> str:
+    """
+    Renders the metrics of several clients in one Prometheus text exposition,
+    each labelled with the name of its bot.
+
+    :param sources: Metrics by bot name, None for no label.
+    :return: The metrics in the Prometheus text format.
+    """
+
+    def labelled(bot: str | None, stats: HandlerStats) -> str:
+        labels = f'handler="{_escape(stats.handler)}",event="{stats.event}"'
+        return labels if bot is None else f'bot="{_escape(bot)}",{labels}'
+
+    lines = [
+        "# HELP smartbot_handler_latency_seconds Handler call duration.",
+        "# TYPE smartbot_handler_latency_seconds histogram",
+    ]
+    for bot, metrics in sources.items():
+        for stats in metrics:
+            labels = labelled(bot, stats)
+            for bound, count in stats.latency.cumulative():
+                le = "+Inf" if bound == float("inf") else f"{bound:.6g}"
+                lines.append(f'smartbot_handler_latency_seconds_bucket{{{labels},le="{le}"}} {count}')
+            lines.append(f"smartbot_handler_latency_seconds_sum{{{labels}}} {stats.latency.total!r}")
+            lines.append(f"smartbot_handler_latency_seconds_count{{{labels}}} {stats.calls}")
+
+    lines += [
+        "# HELP smartbot_handler_errors_total Handler calls that raised an exception.",
+        "# TYPE smartbot_handler_errors_total counter",
+    ]
+    for bot, metrics in sources.items():
+        for stats in metrics:
+            lines.append(f"smartbot_handler_errors_total{{{labelled(bot, stats)}}} {stats.errors}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def start_metrics_server(metrics: HandlerMetrics | Callable[[], str], host: str = "127.0.0.1",
+                               port: int = 9464, extra: Callable[[], str] | None = None) -> asyncio.Server:
+    """
+    Serves the metrics over HTTP for Prometheus to scrape, on any path.
+
+    :param metrics: The metrics to serve, or a function rendering them in the Prometheus text format.
+    :param host: Interface to listen on, local only by default.
+    :param port: Port to listen on.
+    :param extra: Returns more metrics in the Prometheus text format, appended to the handler ones.
+    :return: The running server.
+    """
+
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Only the request line matters, headers are read and ignored
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            text = metrics.export() if isinstance(metrics, HandlerMetrics) else metrics()
+            body = (text + (extra() if extra is not None else "")).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(respond, host, port)
+    logging.info(f"Serving handler metrics on http://{host}:{port}/metrics")
+    return server
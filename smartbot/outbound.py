@@ -0,0 +1,362 @@
+import time
+import heapq
+import asyncio
+import logging
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Hashable
+
+from telethon import utils
+from telethon.errors import FloodWaitError
+
+from smartbot.tracing import span
+
+
+class Priority(IntEnum):
+    """Outbound request lanes, lower values are served first."""
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` tokens per second.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """
+        Initializes a full bucket.
+
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens (burst size).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Returns how long to wait before a token is available.
+
+        :param now: The current monotonic time.
+        :return: Seconds to wait, 0 if a token is available.
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        """
+        Takes one token. Call only after `delay` returned 0.
+        """
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        """
+        Checks whether the bucket is back to its full capacity.
+        """
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _ChatState:
+    """
+    Rate limiting state of a single chat.
+    """
+
+    __slots__ = ("bucket", "lock", "blocked_until", "users")
+
+    def __init__(self, bucket: TokenBucket) -> None:
+        self.bucket = bucket
+        self.lock = asyncio.Lock()
+        self.blocked_until = 0.0
+        self.users = 0
+
+
+class _BotLane:
+    """
+    Global bucket, waiting requests and counters of one bot.
+    """
+
+    __slots__ = ("bucket", "waiters", "seq", "pump", "sent", "flood_waits", "failed")
+
+    def __init__(self, rate: float) -> None:
+        self.bucket = TokenBucket(rate, rate)
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.seq = 0
+        self.pump: asyncio.Task | None = None
+        self.sent = 0
+        self.flood_waits = 0
+        self.failed = 0
+
+
+class OutboundLimiter:
+    """
+    Schedules outbound API calls within Telegram's rate limits.
+
+    Each chat has its own token bucket (one message per second in private
+    chats, twenty per minute in groups) and requests to a chat are sent in
+    order. A global bucket caps the whole bot (thirty messages per second)
+    and hands its tokens to interactive requests before bulk ones. When
+    Telegram answers with a FloodWait, only the affected chat sleeps before
+    retrying, other chats keep sending.
+
+    A limiter can be shared by the bots of a process: calls made with a
+    `scope` (see `scoped`) get their own global bucket and chat buckets,
+    as Telegram applies its limits to each bot separately.
+
+    Attributes:
+        sent (int): Requests completed.
+        flood_waits (int): FloodWait errors received.
+        failed (int): Requests that gave up after a FloodWait.
+    """
+
+    def __init__(
+            self,
+            global_rate: float = 30,
+            chat_rate: float = 1,
+            chat_burst: float = 3,
+            group_rate: float = 20 / 60,
+            group_burst: float = 5,
+            max_retries: int = 3,
+            max_flood_wait: float = 300,
+    ) -> None:
+        """
+        Initializes the limiter.
+
+        :param global_rate: Requests per second for the whole bot.
+        :param chat_rate: Requests per second for a private chat.
+        :param chat_burst: Requests a private chat may send back to back.
+        :param group_rate: Requests per second for a group or channel.
+        :param group_burst: Requests a group may send back to back.
+        :param max_retries: Retries after a FloodWait before giving up.
+        :param max_flood_wait: Longest FloodWait, in seconds, worth waiting for.
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        self.sent = 0
+        self.flood_waits = 0
+        self.failed = 0
+        self._chats: dict[Hashable, _ChatState] = {}
+        self._lanes: dict[Hashable, _BotLane] = {None: _BotLane(global_rate)}
+        self.global_bucket = self._lanes[None].bucket
+        self._sweep_threshold = 1024
+
+    @staticmethod
+    def chat_key(chat: Any) -> Hashable:
+        """
+        Returns the key identifying a chat in the limiter.
+
+        :param chat: A chat ID, peer or entity.
+        :return: The marked peer ID, or the object itself if it has none.
+        """
+        if isinstance(chat, int):
+            return chat
+        try:
+            return utils.get_peer_id(chat)
+        except (TypeError, ValueError):
+            return chat if isinstance(chat, Hashable) else id(chat)
+
+    def _lane(self, scope: Hashable) -> _BotLane:
+        lane = self._lanes.get(scope)
+        if lane is None:
+            lane = self._lanes[scope] = _BotLane(self.global_rate)
+        return lane
+
+    def _chat_state(self, key: Hashable, scope: Hashable = None) -> _ChatState:
+        entry = key if scope is None else (scope, key)
+        state = self._chats.get(entry)
+        if state is None:
+            is_group = isinstance(key, int) and key < 0
+            state = self._chats[entry] = _ChatState(
+                TokenBucket(self.group_rate, self.group_burst) if is_group
+                else TokenBucket(self.chat_rate, self.chat_burst)
+            )
+            if len(self._chats) >= self._sweep_threshold:
+                self._sweep()
+        return state
+
+    def _sweep(self) -> None:
+        """
+        Forgets idle chats whose bucket is full again.
+        """
+        now = time.monotonic()
+        idle = [
+            key for key, state in self._chats.items()
+            if not state.users and now >= state.blocked_until and state.bucket.full(now)
+        ]
+        for key in idle:
+            del self._chats[key]
+        self._sweep_threshold = max(1024, 2 * len(self._chats))
+
+    async def _global_slot(self, priority: int, lane: _BotLane) -> None:
+        """
+        Waits for a global token of a bot, served by priority then arrival order.
+        """
+        if not lane.waiters and lane.bucket.delay(time.monotonic()) == 0:
+            lane.bucket.consume()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (priority, lane.seq, future))
+        lane.seq += 1
+        if lane.pump is None or lane.pump.done():
+            lane.pump = asyncio.create_task(self._serve_waiters(lane))
+        await future
+
+    async def _serve_waiters(self, lane: _BotLane) -> None:
+        """
+        Hands global tokens to the waiting requests as they become available.
+        """
+        while lane.waiters:
+            delay = lane.bucket.delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(lane.waiters)
+            if not future.done():
+                lane.bucket.consume()
+                future.set_result(None)
+
+    async def run(
+            self,
+            chat: Any,
+            call: Callable[..., Awaitable],
+            *args: Any,
+            priority: int = Priority.INTERACTIVE,
+            scope: Hashable = None,
+            **kwargs: Any
+    ) -> Any:
+        """
+        Performs an API call addressed to a chat within the rate limits.
+
+        :param chat: The chat the call is addressed to.
+        :param call: Coroutine function performing the request.
+        :param args: Positional arguments for `call`.
+        :param priority: The request lane, see `Priority`.
+        :param scope: The bot making the call, when the limiter is shared.
+        :param kwargs: Keyword arguments for `call`.
+        :return: The result of `call`.
+        :raises FloodWaitError: If Telegram keeps asking to wait after the retries,
+            or asks for more than `max_flood_wait` seconds.
+        """
+        key = self.chat_key(chat)
+        state = self._chat_state(key, scope)
+        lane = self._lane(scope)
+        state.users += 1
+        try:
+            with span(getattr(call, "__name__", "call"), "outbound", chat=key):
+                async with state.lock:
+                    attempt = 0
+                    while True:
+                        now = time.monotonic()
+                        wait = max(state.blocked_until - now, state.bucket.delay(now))
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                            continue
+
+                        await self._global_slot(priority, lane)
+                        state.bucket.consume()
+                        try:
+                            with span("api", "api", attempt=attempt):
+                                result = await call(*args, **kwargs)
+                        except FloodWaitError as e:
+                            self.flood_waits += 1
+                            lane.flood_waits += 1
+                            attempt += 1
+                            if attempt > self.max_retries or e.seconds > self.max_flood_wait:
+                                self.failed += 1
+                                lane.failed += 1
+                                raise
+                            logging.warning(f"FloodWait of {e.seconds}s for chat {key}, retrying")
+                            state.blocked_until = time.monotonic() + e.seconds
+                            continue
+
+                        self.sent += 1
+                        lane.sent += 1
+                        return result
+        finally:
+            state.users -= 1
+
+    def stats(self, scope: Hashable = ...) -> dict[str, Any]:
+        """
+        Returns the limiter counters.
+
+        :param scope: A bot sharing the limiter, None for unscoped calls, all of them by default.
+        :return: Sent, FloodWait and failure counters, waiting requests and tracked chats.
+        """
+        if scope is ...:
+            return {
+                "sent": self.sent,
+                "flood_waits": self.flood_waits,
+                "failed": self.failed,
+                "waiting": sum(len(lane.waiters) for lane in self._lanes.values()),
+                "chats": len(self._chats),
+            }
+        lane = self._lanes.get(scope) or _BotLane(self.global_rate)
+        if scope is None:
+            chats = sum(1 for entry in self._chats if not isinstance(entry, tuple))
+        else:
+            chats = sum(1 for entry in self._chats if isinstance(entry, tuple) and entry[0] == scope)
+        return {
+            "sent": lane.sent,
+            "flood_waits": lane.flood_waits,
+            "failed": lane.failed,
+            "waiting": len(lane.waiters),
+            "chats": chats,
+        }
+
+    def scoped(self, scope: Hashable) -> "ScopedLimiter":
+        """
+        Returns a view of the limiter for one of the bots sharing it.
+
+        :param scope: Name of the bot, unique in the process.
+        :return: A limiter with the same `run` and `stats` interface.
+        """
+        return ScopedLimiter(self, scope)
+
+
+class ScopedLimiter:
+    """
+    The share of an `OutboundLimiter` used by one bot of the process.
+
+    Attributes:
+        limiter (OutboundLimiter): The shared limiter.
+        scope (Hashable): Name of the bot.
+    """
+
+    __slots__ = ("limiter", "scope")
+
+    def __init__(self, limiter: OutboundLimiter, scope: Hashable) -> None:
+        self.limiter = limiter
+        self.scope = scope
+
+    async def run(
+            self,
+            chat: Any,
+            call: Callable[..., Awaitable],
+            *args: Any,
+            priority: int = Priority.INTERACTIVE,
+            **kwargs: Any
+    ) -> Any:
+        """
+        Performs an API call of the bot within its rate limits, see `OutboundLimiter.run`.
+        """
+        return await self.limiter.run(chat, call, *args, priority=priority, scope=self.scope, **kwargs)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the counters of the bot.
+        """
+        return self.limiter.stats(self.scope)
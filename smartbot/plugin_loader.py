@@ -1,11 +1,32 @@
+import os
+import sys
+import time
+import asyncio
 import logging
 from pathlib import Path
-from importlib import import_module
-from typing import Any, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module, reload
+from importlib.util import find_spec
+from typing import Any, Callable, Iterable
 
 from telethon import TelegramClient
 
-from smartbot.paths import get_handlers_path
+from smartbot.paths import get_handlers_path, SESSIONS_DIR
+from smartbot.metrics import HandlerMetrics
+from smartbot.tracing import traced
+from smartbot.fsm import conversation_flow
+from smartbot.utils.menu_registry import menu_registry
+from smartbot.router import CommandRouter, CallbackRouter
+from smartbot.plugin_manifest import HandlerSpec, PluginManifest
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+# Last reload of each module of the process: the file stamp reloaded and the
+# loaders that registered that version, so loaders sharing the plugins reload them once
+_reloads: dict[str, tuple[tuple[int, int], set[int]]] = {}
 
 
 class PluginLoader:
@@ -16,6 +37,13 @@ class PluginLoader:
     Attributes:
         client (TelegramClient): The Telethon client instance.
         plugins (dict): Configuration for the plugins to be loaded.
+        router (CommandRouter): Dispatcher shared by the command handlers.
+        callback_router (CallbackRouter): Dispatcher shared by the callback query handlers.
+        lazy (bool): Whether plugins are imported on their first matching update.
+        hot_reload (bool): Whether `watch` should run to reload changed plugins.
+        import_workers (int): Threads compiling plugin modules at startup, 0 to compile them on import.
+        metrics (HandlerMetrics | None): Latency and error counts of the registered handlers.
+        manifest (PluginManifest): Index of the plugin tree reused across starts.
     """
 
     def __init__(self, client: TelegramClient, plugins: dict | None=None) -> None:
@@ -29,6 +57,25 @@ class PluginLoader:
 
         self.client: TelegramClient = client
         self.plugins: dict = plugins or {}
+        self.router: CommandRouter = CommandRouter(client)
+        self.callback_router: CallbackRouter = CallbackRouter(client)
+        self.lazy: bool = False
+        self.hot_reload: bool = False
+        self.import_workers: int = 0
+        self.metrics: HandlerMetrics | None = HandlerMetrics()
+        self.manifest: PluginManifest = PluginManifest()
+        self.root: str | None = None
+        self.include: list = []
+        # Registered handler (or stub) by name, by module
+        self._registered: dict[str, dict[str, Any]] = {}
+        # Handler names requested for each loaded module, None for all of them
+        self._selection: dict[str, list[str] | None] = {}
+        # Excluded handler names by module, None when the whole module is excluded
+        self._excluded: dict[str, set[str] | None] = {}
+        # File modification time and size of each watched module
+        self._stamps: dict[str, tuple[int, int] | None] = {}
+        # Called after a module is reloaded
+        self.on_reload: list[Callable[[], Any]] = []
 
     def load_plugins(self) -> None:
         """
@@ -36,6 +83,27 @@ class PluginLoader:
 
         This method processes the plugin configuration, loads specified modules,
         and registers or removes handlers as needed.
+
+        With `lazy=True` in the configuration, plugin sources are scanned
+        instead of imported and each handler is registered as a stub that
+        imports its module on the first matching update. Modules whose
+        handlers cannot be described statically, or without any handler,
+        are imported as usual.
+
+        The plugin tree and the handlers of each module are recorded in a
+        manifest file (`manifest` in the configuration, None to disable),
+        so later starts only inspect the plugins that changed.
+
+        With `hot_reload=True`, `watch` reloads plugins as they change.
+
+        With `import_workers` set, plugin modules are read and compiled to
+        bytecode concurrently in that many threads before they are imported.
+        Module bodies still run on the calling thread, in the same order as a
+        sequential load, so menus and flows they declare register in order.
+
+        Every handler is wrapped to record its calls, errors and latency in
+        `metrics`, unless `metrics=False` is given, and as a span of the traced
+        updates when the client tracer is enabled.
         """
 
         plugins: dict = self.plugins.copy()
@@ -44,15 +112,26 @@ class PluginLoader:
         if not plugins.get("enabled", True):
             return
 
+        self.lazy = plugins.get("lazy", False)
+        self.hot_reload = plugins.get("hot_reload", False)
+        self.import_workers = plugins.get("import_workers", 0)
+        if not plugins.get("metrics", True):
+            self.metrics = None
+        self.manifest = PluginManifest(
+            plugins.get("manifest", os.path.join(SESSIONS_DIR, "plugin_manifest.json"))
+        )
+
         root: str = get_handlers_path(
             plugins_dir=plugins.get("root")
         )
         include: list[str] = plugins.get("include", [])
         exclude: list[str] = plugins.get("exclude", [])
         count: int = 0
+        self.root, self.include = root, include
 
         count = self._load_modules_from_path(root, include, count)
         count = self._unload_modules_from_path(root, exclude, count)
+        self.manifest.save()
 
         if count > 0:
             logging.info(
@@ -62,6 +141,133 @@ class PluginLoader:
         else:
             logging.warning(f'[{self.client.session}] No plugins loaded from "{root}"')
 
+    def reload_module(self, module_path: str) -> int:
+        """
+        Reload a plugin module and swap its registered handlers for the new ones.
+
+        The old handlers are removed and the new ones added in one step, with
+        nothing awaited in between, so updates keep being processed and every
+        update is seen by either the old or the new version of the plugin.
+        If the module fails to import, its previous handlers are kept. A
+        deleted module has its handlers removed. When several clients share
+        the plugins, a module already reloaded by another loader for the same
+        version of the file is not imported again. The conversation flow
+        declarations and menus of the module are replaced by those of the new
+        version, and the `on_reload` callbacks are called after the swap.
+
+        Args:
+            module_path (str): The module path to reload.
+
+        Returns:
+            int: Number of handlers registered for the module after the reload.
+        """
+
+        stamp = self._stamps[module_path] = self._stamp(module_path)
+        handlers = self._selection.setdefault(module_path, None)
+        collected = []
+
+        if stamp is not None:
+            entry = self.manifest.entry(module_path, self._module_file(module_path))
+            specs = None
+            if self.lazy and entry is not None and module_path not in sys.modules:
+                specs = self.manifest.specs(entry)
+
+            try:
+                if specs:
+                    collected = self._collect_stubs(module_path, specs, handlers)
+                else:
+                    module = sys.modules.get(module_path)
+                    previous = _reloads.get(module_path)
+                    if module is None:
+                        module = import_module(module_path)
+                        _reloads[module_path] = (stamp, {id(self)})
+                    elif previous is not None and previous[0] == stamp and id(self) not in previous[1]:
+                        previous[1].add(id(self))
+                    else:
+                        declarations = conversation_flow.forget(module_path)
+                        menus = menu_registry.forget(module_path)
+                        try:
+                            module = reload(module)
+                        except Exception:
+                            conversation_flow.restore(module_path, declarations)
+                            menu_registry.restore(module_path, menus)
+                            raise
+                        _reloads[module_path] = (stamp, {id(self)})
+                    collected = self._collect_handlers(module, self._handler_names(module, entry, handlers))
+            except Exception as e:
+                logging.warning(
+                    f'[{self.client.session}] [RELOAD] Keeping the previous handlers '
+                    f'of "{module_path}": {e!r}'
+                )
+                return len(self._registered.get(module_path, ()))
+        else:
+            conversation_flow.forget(module_path)
+            menu_registry.forget(module_path)
+
+        excluded = self._excluded.get(module_path) or ()
+        collected = [item for item in collected if item[0] not in excluded]
+
+        self._deregister(module_path, None, 0)
+        count = self._register(module_path, collected, "RELOAD")
+        self.manifest.save()
+        for callback in self.on_reload:
+            callback()
+        return count
+
+    def reload_changed(self) -> int:
+        """
+        Reload the plugin modules changed, added or deleted since they were loaded.
+
+        Returns:
+            int: Number of reloaded modules.
+        """
+
+        if self.root is None:
+            return 0
+
+        modules = list(self._stamps)
+        if not self.include:
+            modules += [
+                module_path for module_path in self.manifest.module_paths(self.root)
+                if module_path not in self._stamps
+            ]
+
+        reloaded = 0
+        for module_path in modules:
+            if self._excluded.get(module_path, ()) is None:
+                continue
+            if self._stamp(module_path) != self._stamps.get(module_path):
+                self.reload_module(module_path)
+                reloaded += 1
+
+        return reloaded
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """
+        Reload plugins as their sources change, until cancelled.
+
+        Uses file system notifications when `watchfiles` is installed,
+        and polls the plugin files every `interval` seconds otherwise.
+
+        Args:
+            interval (float): Seconds between polls.
+        """
+
+        if self.root is None:
+            return
+
+        logging.info(
+            f'[{self.client.session}] [RELOAD] Watching "{self.root}" for changes '
+            f'({"notifications" if awatch is not None else "polling"})'
+        )
+        if awatch is not None:
+            async for _ in awatch(Path(*self.root.split(".")), step=int(interval * 100)):
+                self.reload_changed()
+        else:
+            while True:
+                await asyncio.sleep(interval)
+                self.reload_changed()
+
     def _process_plugin_config(self, plugins: dict) -> None:
         """
         Process and adjust the 'include' and 'exclude' configuration options.
@@ -90,17 +296,109 @@ class PluginLoader:
         """
 
         if not include:
-            for path in sorted(Path(root.replace(".", "/")).rglob("*.py")):
-                module_path = '.'.join(path.parent.parts + (path.stem,))
-                count += self._load_module(module_path)
-
+            targets = [(module_path, None) for module_path in self.manifest.module_paths(root)]
         else:
-            for path, handlers in include:
-                module_path = root + "." + path
-                count += self._load_module(module_path, handlers)
+            targets = [(root + "." + path, handlers) for path, handlers in include]
+
+        if self.import_workers > 1:
+            self._preimport(
+                [module_path for module_path, _ in targets if self._needs_import(module_path)],
+                self.import_workers
+            )
+
+        for module_path, handlers in targets:
+            count += self._load_module(module_path, handlers)
 
         return count
 
+    def _needs_import(self, module_path: str) -> bool:
+        """
+        Check whether loading a module imports it, rather than registering stubs.
+
+        Args:
+            module_path (str): The module path to check.
+
+        Returns:
+            bool: True if the module is imported on load.
+        """
+
+        entry = self.manifest.entry(module_path, self._module_file(module_path))
+        return entry is not None and (not self.lazy or not self.manifest.specs(entry))
+
+    def _preimport(self, module_paths: list[str], workers: int) -> None:
+        """
+        Compile plugin modules concurrently in a thread pool.
+
+        Only finding the modules and compiling them to bytecode, which is
+        cached in `__pycache__`, runs in the pool: no module code does. The
+        modules are imported afterwards by `_load_module`, one at a time and
+        in load order, so what their bodies declare (menus, flows) registers
+        in the same order as in a sequential load. Modules that fail here
+        report their error when imported.
+
+        Args:
+            module_paths (list[str]): The modules to compile.
+            workers (int): Number of threads.
+        """
+
+        pending = [module_path for module_path in module_paths if module_path not in sys.modules]
+        if not pending:
+            return
+
+        # Finding a module imports its package, done here so the pool runs no module code
+        for package in dict.fromkeys(module_path.rpartition(".")[0] for module_path in pending):
+            if package:
+                try:
+                    import_module(package)
+                except Exception:
+                    pass
+
+        def compile_module(module_path: str) -> None:
+            try:
+                spec = find_spec(module_path)
+                if spec is not None and hasattr(spec.loader, "get_code"):
+                    spec.loader.get_code(module_path)
+            except Exception:
+                pass
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plugin-import") as executor:
+            list(executor.map(compile_module, pending))
+
+        logging.info(
+            f'[{self.client.session}] [LOAD] Compiled {len(pending)} modules with {workers} threads '
+            f'in {(time.perf_counter() - started) * 1000:.1f} ms'
+        )
+
+    def _import_module(self, module_path: str) -> Any:
+        """
+        Import a plugin module, logging how long the import took.
+
+        Args:
+            module_path (str): The module path to import.
+
+        Returns:
+            module: The imported module.
+        """
+
+        module = sys.modules.get(module_path)
+        if module is not None:
+            return module
+
+        started = time.perf_counter()
+        module = import_module(module_path)
+        self._log_import(module_path, time.perf_counter() - started)
+        return module
+
+    def _log_import(self, module_path: str, elapsed: float) -> None:
+        """
+        Log the import time of a plugin module.
+        """
+
+        logging.info(
+            f'[{self.client.session}] [LOAD] Imported "{module_path}" in {elapsed * 1000:.1f} ms'
+        )
+
     def _unload_modules_from_path(self, root: str, exclude: list, count: int) -> int:
         """
         Unload modules and remove their handlers based on the configuration.
@@ -131,8 +429,17 @@ class PluginLoader:
         Returns:
             int: Number of successfully registered handlers.
         """
+        self._selection[module_path] = list(handlers) if handlers else None
+        self._stamps[module_path] = self._stamp(module_path)
+        entry = self.manifest.entry(module_path, self._module_file(module_path))
+        if self.lazy and entry is not None:
+            specs = self.manifest.specs(entry)
+            # Modules without handlers are imported for what they declare
+            if specs:
+                return self._register_stubs(module_path, specs, handlers)
+
         try:
-            module = import_module(module_path)
+            module = self._import_module(module_path)
         except ImportError:
             logging.warning(
                 f'[{self.client.session}] [LOAD] Ignoring non-existent module "{module_path}"'
@@ -145,9 +452,52 @@ class PluginLoader:
             )
             return 0
 
-        handlers = handlers or vars(module).keys()
+        return self._register_handlers(module, self._handler_names(module, entry, handlers))
 
-        return self._register_handlers(module, handlers)
+    @staticmethod
+    def _module_file(module_path: str) -> Path:
+        """
+        Get the source file of a plugin module, relative to the working directory.
+        """
+
+        return Path(*module_path.split(".")).with_suffix(".py")
+
+    def _stamp(self, module_path: str) -> tuple[int, int] | None:
+        """
+        Get the modification time and size of a plugin source, None if it does not exist.
+        """
+
+        try:
+            stat = self._module_file(module_path).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _handler_names(self, module, entry, handlers: Iterable | None) -> list[str]:
+        """
+        Get the names of the handlers to register from an imported module.
+
+        Args:
+            module (module): The imported module.
+            entry (ModuleEntry | None): The manifest entry of the module.
+            handlers (Iterable, optional): Specific handlers requested by the configuration.
+
+        Returns:
+            list[str]: The handler names.
+        """
+
+        if handlers:
+            return list(handlers)
+
+        names = getattr(entry, "handlers", None)
+        if names is None:
+            names = [
+                name for name, value in vars(module).items()
+                if callable(value) and getattr(value, 'is_handler', False)
+            ]
+            if entry is not None:
+                self.manifest.set_handlers(entry, names)
+        return names
 
     def _unload_module(self, module_path: str, handlers: Iterable, count: int) -> int:
         """
@@ -161,6 +511,14 @@ class PluginLoader:
         Returns:
             int: Updated count of loaded plugins.
         """
+        if not handlers:
+            self._excluded[module_path] = None
+        elif self._excluded.get(module_path, ()) is not None:
+            self._excluded.setdefault(module_path, set()).update(handlers)
+
+        if module_path in self._registered:
+            return self._deregister(module_path, handlers, count)
+
         try:
             module = import_module(module_path)
         except ImportError:
@@ -173,41 +531,213 @@ class PluginLoader:
 
         return self._deregister_handlers(module, handlers, count)
 
-    def _register_handlers(self, module, handlers: Iterable) -> int:
+    def _route(self, handler: Any, event: Any) -> bool:
         """
-        Register handlers from a given module.
+        Hand a handler to the router able to dispatch its event.
 
         Args:
-            module (module): The Python module containing handlers.
-            handlers (Iterable): List of handler names to register.
+            handler (callable): The handler function.
+            event: The event builder the handler was declared with.
+
+        Returns:
+            bool: True if a router took the handler.
+        """
+
+        return self.router.add(handler, event) or self.callback_router.add(handler, event)
+
+    def _unroute(self, handler: Any) -> bool:
+        """
+        Remove a handler from the routers.
+
+        Args:
+            handler (callable): The handler function.
+
+        Returns:
+            bool: True if the handler was routed.
+        """
+
+        removed = self.router.remove(handler)
+        return self.callback_router.remove(handler) or removed
+
+    def _make_stub(self, module_path: str, name: str) -> Any:
+        """
+        Create a handler that imports the real one on its first call.
+
+        Args:
+            module_path (str): The module declaring the handler.
+            name (str): The handler name in the module.
+
+        Returns:
+            callable: The stub handler.
+        """
+
+        handler = None
+
+        async def stub(event):
+            nonlocal handler
+            if handler is None:
+                module = import_module(module_path)
+                handler = getattr(module, name)
+                logging.info(
+                    f'[{self.client.session}] [LAZY] Imported "{module_path}" for handler "{name}"'
+                )
+            return await handler(event)
+
+        stub.__name__ = stub.__qualname__ = name
+        stub.__module__ = module_path
+        return stub
+
+    def _collect_stubs(self, module_path: str, specs: list[HandlerSpec],
+                       handlers: Iterable | None = None) -> list[tuple[str, Any, Any]]:
+        """
+        Create stubs for the handlers found in a module source.
+
+        Args:
+            module_path (str): The module declaring the handlers.
+            specs (list[HandlerSpec]): The handlers found by the scan.
+            handlers (Iterable, optional): Specific handlers to create, in order.
+                Defaults to every handler found.
+
+        Returns:
+            list[tuple[str, callable, Any]]: Name, stub and event builder of each handler.
+        """
+
+        by_name = {spec.name: spec for spec in specs}
+        if handlers:
+            specs = [by_name[name] for name in handlers if name in by_name]
+
+        return [
+            (spec.name, self._make_stub(module_path, spec.name), spec.build_event())
+            for spec in specs
+        ]
+
+    def _register_stubs(self, module_path: str, specs: list[HandlerSpec],
+                        handlers: Iterable | None = None) -> int:
+        """
+        Register stubs for the handlers found in a module source.
+
+        Args:
+            module_path (str): The module declaring the handlers.
+            specs (list[HandlerSpec]): The handlers found by the scan.
+            handlers (Iterable, optional): Specific handlers to register, in order.
+                Defaults to every handler found.
+
+        Returns:
+            int: Number of registered stubs.
+        """
+
+        return self._register(module_path, self._collect_stubs(module_path, specs, handlers), "LAZY")
+
+    def _register(self, module_path: str, collected: list[tuple[str, Any, Any]], tag: str = "LOAD") -> int:
+        """
+        Register collected handlers and remember them by module.
+
+        Args:
+            module_path (str): The module declaring the handlers.
+            collected (list): Name, handler and event builder of each handler.
+            tag (str): Log tag.
 
         Returns:
             int: Number of successfully registered handlers.
         """
 
+        tracer = getattr(self.client, "tracer", None)
+        registered = self._registered.setdefault(module_path, {})
         count = 0
+        for name, handler, event in collected:
+            try:
+                if self.metrics is not None:
+                    handler = self.metrics.instrument(handler, f"{module_path}.{name}", event)
+                if tracer is not None and tracer.enabled:
+                    handler = traced(handler, f"{module_path}.{name}")
+                if not self._route(handler, event):
+                    self.client.add_event_handler(handler, event)
+                registered[name] = handler
+                logging.info(
+                    f'[{self.client.session}] [{tag}] Registered handler "{name}" '
+                    f'from "{module_path}"'
+                )
+                count += 1
+            except Exception as e:
+                logging.warning(
+                    f'[{self.client.session}] [{tag}] Error while loading handler "{name}" '
+                    f'from "{module_path}": {str(e)}'
+                )
+
+        if not registered:
+            del self._registered[module_path]
+        return count
+
+    def _deregister(self, module_path: str, handlers: Iterable | None, count: int) -> int:
+        """
+        Deregister the handlers registered for a module.
+
+        Args:
+            module_path (str): The module declaring the handlers.
+            handlers (Iterable, optional): Specific handlers to deregister. Defaults to all.
+            count (int): Current count of loaded plugins.
+
+        Returns:
+            int: Updated count of loaded plugins.
+        """
+
+        registered = self._registered.get(module_path, {})
+        for name in list(handlers or registered):
+            handler = registered.pop(name, None)
+            if handler is None:
+                continue
+            if not self._unroute(handler):
+                self.client.remove_event_handler(handler)
+            logging.info(
+                f'[{self.client.session}] [UNLOAD] Deregistered handler "{name}" '
+                f'from "{module_path}"'
+            )
+            count -= 1
+
+        if not registered:
+            self._registered.pop(module_path, None)
+        return count
+
+    def _collect_handlers(self, module, handlers: Iterable) -> list[tuple[str, Any, Any]]:
+        """
+        Collect the handlers to register from a given module.
+
+        Args:
+            module (module): The Python module containing handlers.
+            handlers (Iterable): List of handler names to collect.
+
+        Returns:
+            list[tuple[str, callable, Any]]: Name, handler and event builder of each handler.
+        """
+
+        collected = []
         for name in handlers:
             try:
                 handler_group: Any = getattr(module, name)
                 if callable(handler_group) and getattr(handler_group, 'is_handler', False):
                     handler_info = getattr(handler_group, 'handler_info', {})
-                    event = handler_info.get("event")
-
-                    logging.info(f"Registering handler: {name}")
-                    self.client.add_event_handler(handler_group, event)
-
-                    logging.info(
-                        f'[{self.client.session}] [LOAD] Registered handler "{name}" '
-                        f'from "{module.__name__}"'
-                    )
-                    count += 1
+                    collected.append((name, handler_group, handler_info.get("event")))
             except Exception as e:
                 logging.warning(
                     f'[{self.client.session}] [LOAD] Error while loading handler "{name}" '
                     f'from "{module.__name__}": {str(e)}'
                 )
 
-        return count
+        return collected
+
+    def _register_handlers(self, module, handlers: Iterable) -> int:
+        """
+        Register handlers from a given module.
+
+        Args:
+            module (module): The Python module containing handlers.
+            handlers (Iterable): List of handler names to register.
+
+        Returns:
+            int: Number of successfully registered handlers.
+        """
+
+        return self._register(module.__name__, self._collect_handlers(module, handlers))
 
     def _deregister_handlers(self, module, handlers: Iterable, count: int) -> int:
         """
@@ -226,7 +756,8 @@ class PluginLoader:
             try:
                 handler_group: Any = getattr(module, name)
                 if callable(handler_group) and getattr(handler_group, 'is_handler', False):
-                    self.client.remove_event_handler(handler_group)
+                    if not self._unroute(handler_group):
+                        self.client.remove_event_handler(handler_group)
                     logging.info(
                         f'[{self.client.session}] [UNLOAD] Deregistered handler "{name}" '
                         f'from "{module.__name__}"'
@@ -0,0 +1,412 @@
+import os
+import re
+import ast
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Any
+
+from telethon import events
+
+from smartbot.router import CallbackRoute
+
+# Event builders a handler can be declared with to be loaded lazily
+MESSAGE = "message"
+CALLBACK = "callback"
+ROUTE = "route"
+BUILDERS = {"NewMessage": MESSAGE, "CallbackQuery": CALLBACK, "CallbackRoute": ROUTE}
+# Any call to a `.on(...)` method, including in comments and strings
+ON_CALL = re.compile(rb"\.\s*on\s*\(")
+# Module-level calls that configure logging rather than declare anything
+LOGGING_CALLS = {"basicConfig", "getLogger"}
+
+
+class HandlerSpec:
+    """
+    A handler found in a plugin source, described well enough to
+    rebuild its event builder without importing the plugin.
+
+    Attributes:
+        name (str): Name of the handler in its module.
+        kind (str): MESSAGE, CALLBACK or ROUTE.
+        pattern (str | bytes | None): The pattern or route the handler was declared with.
+    """
+
+    __slots__ = ("name", "kind", "pattern")
+
+    def __init__(self, name: str, kind: str, pattern: str | bytes | None = None) -> None:
+        self.name = name
+        self.kind = kind
+        self.pattern = pattern
+
+    def build_event(self) -> Any:
+        """
+        Builds the event builder the handler was declared with.
+
+        :return: A `NewMessage`, `CallbackQuery` or `CallbackRoute` instance.
+        """
+        if self.kind == ROUTE:
+            return CallbackRoute(self.pattern)
+        if self.kind == CALLBACK:
+            return events.CallbackQuery(pattern=self.pattern)
+        return events.NewMessage(pattern=self.pattern)
+
+    def to_dict(self) -> dict[str, Any]:
+        binary = isinstance(self.pattern, bytes)
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "pattern": self.pattern.decode("latin-1") if binary else self.pattern,
+            "binary": binary,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "HandlerSpec":
+        pattern = data["pattern"]
+        if data.get("binary"):
+            pattern = pattern.encode("latin-1")
+        return cls(data["name"], data["kind"], pattern)
+
+    def __repr__(self) -> str:
+        return f"HandlerSpec({self.name!r}, {self.kind!r}, {self.pattern!r})"
+
+
+def _builder_spec(node: ast.expr) -> tuple[str, str | bytes | None] | None:
+    """
+    Reads the event builder passed to a `.on(...)` decorator.
+
+    :return: The builder kind and pattern, or None if it cannot be rebuilt statically.
+    """
+    if isinstance(node, ast.Call):
+        func, args, keywords = node.func, node.args, node.keywords
+    else:
+        func, args, keywords = node, [], []
+
+    name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", None)
+    kind = BUILDERS.get(name)
+    if kind is None:
+        return None
+
+    values = {}
+    for keyword in keywords:
+        if not isinstance(keyword.value, ast.Constant):
+            return None
+        values[keyword.arg] = keyword.value.value
+
+    if kind == ROUTE:
+        if len(args) == 1 and not keywords and isinstance(args[0], ast.Constant):
+            route = args[0].value
+        elif not args and set(values) == {"route"}:
+            route = values["route"]
+        else:
+            return None
+        return (kind, route) if isinstance(route, str) else None
+
+    # Any filter besides the pattern needs the real builder
+    if args or set(values) - {"pattern"}:
+        return None
+
+    pattern = values.get("pattern")
+    allowed = (str,) if kind == MESSAGE else (str, bytes)
+    if pattern is not None and not isinstance(pattern, allowed):
+        return None
+    return kind, pattern
+
+
+def scan_module(path: str | Path) -> list[HandlerSpec] | None:
+    """
+    Finds the handlers declared in a plugin source without importing it.
+
+    :param path: Path of the plugin source file.
+    :return: The handlers in declaration order, or None, see `scan_source`.
+    """
+    try:
+        source = Path(path).read_bytes()
+    except OSError as e:
+        logging.debug(f"Cannot scan plugin {path}: {e}")
+        return None
+    return scan_source(source, str(path))
+
+
+def _is_constant(node: ast.expr) -> bool:
+    try:
+        ast.literal_eval(node)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return False
+    return True
+
+
+def _is_logging_call(node: ast.expr) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and isinstance(node.func.value, ast.Name)
+        and node.func.value.id == "logging"
+        and node.func.attr in LOGGING_CALLS
+    )
+
+
+def _is_described(node: ast.stmt, handler_objects: set[str]) -> bool:
+    """
+    Checks whether a module-level statement has no effect besides what
+    the scan records, so the module can be loaded without importing it.
+
+    Imports, definitions, docstrings, logging setup and assignments of
+    constants or handler objects qualify. Any other statement, such as
+    `menu_registry.menu(...)` or `conversation_flow.state(...)`, declares
+    something only an import provides.
+    """
+    if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef,
+                         ast.ClassDef, ast.Pass)):
+        return True
+    if isinstance(node, ast.Expr):
+        return _is_constant(node.value) or _is_logging_call(node.value)
+    if isinstance(node, (ast.Assign, ast.AnnAssign)):
+        value = node.value
+        if value is None or _is_constant(value) or _is_logging_call(value):
+            return True
+        targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+        return all(isinstance(target, ast.Name) and target.id in handler_objects for target in targets)
+    return False
+
+
+def scan_source(source: bytes, filename: str = "<plugin>") -> list[HandlerSpec] | None:
+    """
+    Finds the handlers declared in a plugin source.
+
+    Only handlers decorated with `@<handler>.on(...)` and a builder that
+    can be rebuilt statically are supported. If the module registers any
+    handler differently, or runs any other module-level statement (menus,
+    conversation flows, ...), None is returned and it must be imported.
+
+    :param source: The plugin source code.
+    :param filename: File name used in error messages.
+    :return: The handlers in declaration order, or None.
+    """
+    try:
+        tree = ast.parse(source, filename=filename)
+    except (SyntaxError, ValueError) as e:
+        logging.debug(f"Cannot scan plugin {filename}: {e}")
+        return None
+
+    handler_objects = {
+        target.id
+        for node in tree.body if isinstance(node, (ast.Assign, ast.AnnAssign))
+        and isinstance(node.value, ast.Call)
+        and getattr(node.value.func, "id", None) == "ClientHandler"
+        for target in (node.targets if isinstance(node, ast.Assign) else [node.target])
+        if isinstance(target, ast.Name)
+    }
+    if not all(_is_described(node, handler_objects) for node in tree.body):
+        return None
+
+    specs = []
+    decorators = 0
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        found = len(specs)
+        for decorator in node.decorator_list:
+            if isinstance(decorator, ast.Name) and decorator.id in handler_objects:
+                return None
+            if (isinstance(decorator, ast.Call)
+                    and isinstance(decorator.func, ast.Attribute)
+                    and decorator.func.attr == "on"):
+                spec = _builder_spec(decorator.args[0]) if len(decorator.args) == 1 else None
+                if spec is None:
+                    return None
+                specs.append(HandlerSpec(node.name, *spec))
+                decorators += 1
+        if len(specs) - found > 1:
+            # Only the outermost registration survives an import
+            return None
+
+    # `.on(...)` used anywhere else may register handlers the scan cannot see
+    if len(ON_CALL.findall(source)) != decorators:
+        return None
+
+    return specs
+
+
+class ModuleEntry:
+    """
+    What the manifest knows about one plugin file.
+
+    Attributes:
+        file (str): Path of the plugin source.
+        mtime_ns (int): Modification time when the entry was recorded.
+        size (int): File size when the entry was recorded.
+        digest (str): SHA-1 of the source when the entry was recorded.
+        specs (list[HandlerSpec] | None): Handlers found by the static scan,
+            None if the module must be imported. Missing until scanned.
+        handlers (list[str]): Handler names found by importing the module.
+            Missing until the module was imported once.
+    """
+
+    __slots__ = ("file", "mtime_ns", "size", "digest", "specs", "handlers")
+
+    def __init__(self, file: str, mtime_ns: int, size: int, digest: str) -> None:
+        self.file = file
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+    def to_dict(self) -> dict[str, Any]:
+        data = {"file": self.file, "mtime_ns": self.mtime_ns, "size": self.size, "digest": self.digest}
+        if hasattr(self, "specs"):
+            data["specs"] = None if self.specs is None else [spec.to_dict() for spec in self.specs]
+        if hasattr(self, "handlers"):
+            data["handlers"] = self.handlers
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ModuleEntry":
+        entry = cls(data["file"], data["mtime_ns"], data["size"], data["digest"])
+        if "specs" in data:
+            entry.specs = None if data["specs"] is None else [HandlerSpec.from_dict(spec) for spec in data["specs"]]
+        if "handlers" in data:
+            entry.handlers = data["handlers"]
+        return entry
+
+
+class PluginManifest:
+    """
+    Persisted index of the plugin tree.
+
+    Records the plugin modules found under each root with the modification
+    times of its directories, so the tree is only walked again after a file
+    is added, removed or renamed. For each module it records the handlers
+    found by the static scan or by importing it, keyed by the file
+    modification time and size, with a content hash to tell a touched file
+    from an edited one. Only changed plugins are inspected again.
+    """
+
+    version = 2
+
+    def __init__(self, path: str | None = None) -> None:
+        """
+        Loads the manifest.
+
+        :param path: Path of the JSON manifest file, None to keep it in memory only.
+        """
+        self.path = path
+        self.roots: dict[str, dict[str, Any]] = {}
+        self.modules: dict[str, ModuleEntry] = {}
+        self.dirty = False
+        if path is not None:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != self.version:
+                return
+            self.roots = data["roots"]
+            self.modules = {
+                module_path: ModuleEntry.from_dict(entry)
+                for module_path, entry in data["modules"].items()
+            }
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable plugin manifest {self.path}: {e}")
+            self.roots, self.modules = {}, {}
+
+    def save(self) -> None:
+        """
+        Writes the manifest if it changed.
+        """
+        if self.path is None or not self.dirty:
+            return
+
+        data = {
+            "version": self.version,
+            "roots": self.roots,
+            "modules": {module_path: entry.to_dict() for module_path, entry in self.modules.items()},
+        }
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save plugin manifest {self.path}: {e}")
+            return
+        self.dirty = False
+
+    def module_paths(self, root: str) -> list[str]:
+        """
+        Lists the plugin modules under a root, in file path order.
+
+        :param root: The plugins root, as a dotted module path.
+        :return: The dotted module paths.
+        """
+        recorded = self.roots.get(root)
+        if recorded is not None and all(
+                _mtime_ns(directory) == mtime_ns
+                for directory, mtime_ns in recorded["dirs"].items()
+        ):
+            return recorded["modules"]
+
+        root_dir = Path(root.replace(".", "/"))
+        dirs = {}
+        files = []
+        for directory, _, names in os.walk(root_dir):
+            dirs[directory] = _mtime_ns(directory)
+            files.extend(Path(directory, name) for name in names if name.endswith(".py"))
+
+        modules = ['.'.join(path.parent.parts + (path.stem,)) for path in sorted(files)]
+        self.roots[root] = {"dirs": dirs, "modules": modules}
+        self.dirty = True
+        return modules
+
+    def entry(self, module_path: str, file: Path) -> ModuleEntry | None:
+        """
+        Returns the entry of a module, recording it again if its file changed.
+
+        :param module_path: The dotted module path.
+        :param file: The module source file.
+        :return: The entry, or None if the file does not exist.
+        """
+        try:
+            stat = file.stat()
+        except OSError:
+            return None
+
+        entry = self.modules.get(module_path)
+        if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            return entry
+
+        digest = hashlib.sha1(file.read_bytes()).hexdigest()
+        if entry is None or entry.digest != digest or entry.file != str(file):
+            entry = self.modules[module_path] = ModuleEntry(str(file), stat.st_mtime_ns, stat.st_size, digest)
+        else:
+            entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+        self.dirty = True
+        return entry
+
+    def specs(self, entry: ModuleEntry) -> list[HandlerSpec] | None:
+        """
+        Returns the statically scanned handlers of a module, scanning it if needed.
+        """
+        if not hasattr(entry, "specs"):
+            entry.specs = scan_module(entry.file)
+            self.dirty = True
+        return entry.specs
+
+    def set_handlers(self, entry: ModuleEntry, handlers: list[str]) -> None:
+        """
+        Records the handler names found by importing a module.
+        """
+        if getattr(entry, "handlers", None) != handlers:
+            entry.handlers = handlers
+            self.dirty = True
+
+
+def _mtime_ns(path: str) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
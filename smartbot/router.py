@@ -0,0 +1,559 @@
+import re
+import logging
+from collections import Counter
+from typing import Any, Callable
+
+from telethon import events
+
+# Patterns made only of a literal command, optionally anchored, e.g. "/start" or "^/help$"
+COMMAND_PATTERN = re.compile(r"^\^?/(?P<command>\w+)(?:\$|\\b)?$")
+# Numeric backreferences would point at the wrong group once patterns are combined
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+# Named groups, which must be unique in the combined prefilter (an even number of
+# backslashes before the parenthesis keeps it unescaped)
+NAMED_GROUP = re.compile(r"(?<!\\)((?:\\\\)*)\(\?P<\w+>")
+# Callback patterns matching a single literal payload, e.g. b"^back_menu$"
+LITERAL_DATA_PATTERN = re.compile(rb"^\^(?P<data>[\w:\-]+)\$$")
+# Typed parameter segment of a callback route, e.g. "<id:int>"
+ROUTE_PARAMETER = re.compile(r"<(?P<name>\w+)(?::(?P<type>int|str|bytes))?>")
+
+SEPARATOR = ord(":")
+# What an int parameter may be, `int()` alone also takes b" 1", b"+1" and b"1_0"
+INT_PARAMETER = re.compile(rb"-?\d+")
+
+
+def _parse_int(value: bytes) -> int:
+    if INT_PARAMETER.fullmatch(value) is None:
+        raise ValueError(f"Invalid int parameter {value!r}")
+    return int(value)
+
+
+PARAMETER_TYPES: dict[str, tuple[Callable[[bytes], Any], str]] = {
+    "int": (_parse_int, INT_PARAMETER.pattern.decode("ascii")),
+    "str": (lambda value: value.decode("utf-8"), r"[^:]+"),
+    "bytes": (bytes, r"[^:]+"),
+}
+
+
+class _Route:
+    """
+    A handler registered in a router, with the pattern it was declared with.
+    """
+
+    __slots__ = ("seq", "callback", "match")
+
+    def __init__(self, seq: int, callback: Callable, match: Callable) -> None:
+        self.seq = seq
+        self.callback = callback
+        self.match = match
+
+
+class CommandRouter:
+    """
+    Dispatches `NewMessage` handlers from a single Telethon event handler.
+
+    Handlers whose pattern is a plain command (e.g. "/start") are indexed in
+    a dictionary by command name, so the leading "/command@botname" token of
+    a message is parsed once and resolved with a lookup. Other patterns are
+    also combined into one compiled regex used to reject messages that no
+    pattern can match before testing them one by one.
+
+    Only handlers filtered by nothing but their pattern are routed; anything
+    else keeps its own Telethon registration.
+    """
+
+    def __init__(self, client: Any) -> None:
+        """
+        Initializes an empty router.
+
+        :param client: The Telegram client receiving the updates.
+        """
+        self.client = client
+        self.commands: dict[str, list[_Route]] = {}
+        self.patterns: list[_Route] = []
+        self._prefilter: Callable | None = None
+        self._unfiltered: list[_Route] = []
+        self._seq = 0
+        self._attached = False
+        self._username: str | None = None
+
+    def __len__(self) -> int:
+        return sum(len(routes) for routes in self.commands.values()) + len(self.patterns)
+
+    @staticmethod
+    def routable(event: Any) -> bool:
+        """
+        Checks whether an event builder can be dispatched by the router.
+
+        :param event: The event builder a handler was declared with.
+        :return: True if the builder is a `NewMessage` filtered only by a regex pattern.
+        """
+        if type(event) is not events.NewMessage:
+            return False
+
+        pattern = getattr(event.pattern, "__self__", None)
+        if not isinstance(pattern, re.Pattern) or not isinstance(pattern.pattern, str):
+            return False
+
+        return all(
+            getattr(event, option) is None
+            for option in ("chats", "func", "incoming", "outgoing", "from_users", "forwards")
+        )
+
+    def add(self, callback: Callable, event: Any) -> bool:
+        """
+        Routes a handler, if its event builder allows it.
+
+        :param callback: The handler function.
+        :param event: The event builder the handler was declared with.
+        :return: True if the router took the handler, False if it must be
+            registered on the client directly.
+        """
+        if not self.routable(event):
+            return False
+
+        pattern: re.Pattern = event.pattern.__self__
+        route = _Route(self._seq, callback, pattern.match)
+        self._seq += 1
+
+        command = COMMAND_PATTERN.match(pattern.pattern)
+        if command and not pattern.flags & re.IGNORECASE:
+            self.commands.setdefault(command["command"], []).append(route)
+        else:
+            self._compile([*self.patterns, route])
+
+        if not self._attached:
+            self.client.add_event_handler(self.dispatch, events.NewMessage())
+            self._attached = True
+        return True
+
+    def remove(self, callback: Callable) -> bool:
+        """
+        Removes a routed handler.
+
+        :param callback: The handler function.
+        :return: True if the handler was routed by this router.
+        """
+        found = False
+        for command, routes in list(self.commands.items()):
+            kept = [route for route in routes if route.callback is not callback]
+            if len(kept) != len(routes):
+                found = True
+                if kept:
+                    self.commands[command] = kept
+                else:
+                    del self.commands[command]
+
+        kept = [route for route in self.patterns if route.callback is not callback]
+        if len(kept) != len(self.patterns):
+            found = True
+            self._compile(kept)
+
+        return found
+
+    @staticmethod
+    def _ungrouped(pattern: re.Pattern) -> str | None:
+        """
+        Returns a copy of a pattern whose named groups are plain groups,
+        so patterns reusing a group name can be combined.
+
+        :param pattern: The compiled handler pattern.
+        :return: The rewritten pattern, or None if it cannot be combined.
+        """
+        if pattern.flags & ~re.UNICODE or BACKREFERENCE.search(pattern.pattern):
+            return None
+        source, renamed = NAMED_GROUP.subn(r"\1(?:", pattern.pattern)
+        # A "(?P<" in a character class is not a group, rewriting it changes the pattern
+        if renamed != len(pattern.groupindex):
+            return None
+        try:
+            re.compile(f"(?:{source})")
+        except re.error:
+            return None
+        return f"(?:{source})"
+
+    def _compile(self, patterns: list[_Route]) -> None:
+        """
+        Rebuilds the combined prefilter regex for the non-command patterns.
+        Patterns that cannot be combined are tested one by one, as are all
+        of them if the combined regex does not compile.
+
+        :param patterns: The non-command routes, in registration order.
+        """
+        combinable = []
+        unfiltered = []
+        for route in patterns:
+            source = self._ungrouped(route.match.__self__)
+            if source is None:
+                unfiltered.append(route)
+            else:
+                combinable.append(source)
+
+        prefilter = None
+        if combinable:
+            try:
+                prefilter = re.compile("|".join(combinable)).match
+            except re.error as e:
+                logging.warning(f"Patterns could not be combined, testing them one by one: {e}")
+                unfiltered = list(patterns)
+
+        self.patterns = patterns
+        self._prefilter = prefilter
+        self._unfiltered = unfiltered
+
+    def match(self, text: str, username: str | None = None) -> list[tuple[Callable, Any]]:
+        """
+        Finds the handlers matching a message, in registration order.
+
+        :param text: The message text.
+        :param username: The bot username, to ignore commands addressed to other bots.
+        :return: A list of (handler, pattern match) pairs.
+        """
+        matched: list[tuple[_Route, Any]] = []
+
+        if text.startswith("/"):
+            token, _, rest = text.partition(" ")
+            command, _, mention = token[1:].partition("@")
+            routes = self.commands.get(command)
+            if routes and (not mention or username is None or mention.lower() == username):
+                command_text = f"/{command} {rest}" if rest else f"/{command}"
+                for route in routes:
+                    result = route.match(command_text)
+                    if result:
+                        matched.append((route, result))
+
+        if self.patterns:
+            if self._prefilter is not None and self._prefilter(text):
+                candidates = self.patterns
+            else:
+                candidates = self._unfiltered
+            for route in candidates:
+                result = route.match(text)
+                if result:
+                    matched.append((route, result))
+
+        if len(matched) > 1:
+            matched.sort(key=lambda item: item[0].seq)
+        return [(route.callback, result) for route, result in matched]
+
+    async def _get_username(self) -> str | None:
+        """
+        Returns the bot username in lowercase, fetched once.
+        """
+        if self._username is None:
+            me = await self.client.get_me()
+            self._username = (getattr(me, "username", None) or "").lower()
+        return self._username or None
+
+    async def dispatch(self, event: Any) -> None:
+        """
+        Telethon handler running every routed handler that matches the message.
+
+        :param event: The `NewMessage` event.
+        """
+        text = event.message.message or ""
+        username = None
+        if text.startswith("/") and "@" in text.partition(" ")[0]:
+            username = await self._get_username()
+
+        for callback, result in self.match(text, username):
+            event.pattern_match = result
+            try:
+                await callback(event)
+            except events.StopPropagation:
+                raise
+            except Exception:
+                name = getattr(callback, "__name__", repr(callback))
+                logging.exception(f"Unhandled exception on {name}")
+
+
+class CallbackRoute(events.CallbackQuery):
+    """
+    `CallbackQuery` event builder declared with a route instead of a regex.
+
+    Routes are literal callback data with typed parameter segments that end
+    at the next ":" (e.g. "grade:<id:int>", "menu:<name>") and an optional
+    trailing "*" matching any remaining data. Parameters are converted and
+    exposed as `event.route_params`. The route is also compiled to a regex,
+    so the builder keeps working when registered on a client directly.
+    """
+
+    def __init__(self, route: str, chats=None, *, blacklist_chats=False, func=None) -> None:
+        """
+        Initializes the builder.
+
+        :param route: The callback data route.
+        :param chats: Same as for `events.CallbackQuery`.
+        :param blacklist_chats: Same as for `events.CallbackQuery`.
+        :param func: Same as for `events.CallbackQuery`.
+        """
+        self.route = route
+        self.segments = self._parse(route)
+        super().__init__(
+            chats,
+            blacklist_chats=blacklist_chats,
+            func=func,
+            pattern=self._to_regex(self.segments)
+        )
+
+    @staticmethod
+    def _parse(route: str) -> list[tuple[str, Any]]:
+        """
+        Splits a route into ("literal", bytes), ("param", (name, type)) and ("wildcard", None) segments.
+        """
+        wildcard = route.endswith("*")
+        if wildcard:
+            route = route[:-1]
+
+        segments = []
+        position = 0
+        for parameter in ROUTE_PARAMETER.finditer(route):
+            if parameter.start() > position:
+                segments.append(("literal", route[position:parameter.start()].encode("utf-8")))
+            segments.append(("param", (parameter["name"], parameter["type"] or "str")))
+            position = parameter.end()
+        if position < len(route):
+            segments.append(("literal", route[position:].encode("utf-8")))
+        if wildcard:
+            segments.append(("wildcard", None))
+        return segments
+
+    @staticmethod
+    def _to_regex(segments: list[tuple[str, Any]]) -> bytes:
+        """
+        Compiles parsed segments into an anchored bytes regex.
+        """
+        parts = []
+        for kind, value in segments:
+            if kind == "literal":
+                parts.append(re.escape(value.decode("utf-8")))
+            elif kind == "param":
+                name, type_name = value
+                parts.append(f"(?P<{name}>{PARAMETER_TYPES[type_name][1]})")
+            else:
+                parts.append("(?s:.*)")
+        # \Z rather than $, which would also match before a trailing newline
+        return f"^{''.join(parts)}\\Z".encode("utf-8")
+
+
+class _TrieNode:
+    """
+    Node of the callback data trie.
+    """
+
+    __slots__ = ("children", "params", "routes", "wildcards")
+
+    def __init__(self) -> None:
+        self.children: dict[int, _TrieNode] = {}
+        self.params: list[tuple[str, Callable, _TrieNode]] = []
+        self.routes: list[_Route] = []
+        self.wildcards: list[_Route] = []
+
+
+class CallbackRouter:
+    """
+    Dispatches `CallbackQuery` handlers from a single Telethon event handler.
+
+    Routed callback data are indexed in a byte trie, so a button press is
+    resolved in O(len(data)) whatever the number of registered buttons.
+    Handlers declared with `CallbackRoute` are routed, as are plain
+    `CallbackQuery` handlers whose data is a literal (data=b"x" or
+    pattern=b"^x$"). Callback data no route matches is counted in
+    `unmatched` and logged.
+    """
+
+    max_unmatched: int = 1000
+
+    def __init__(self, client: Any) -> None:
+        """
+        Initializes an empty router.
+
+        :param client: The Telegram client receiving the updates.
+        """
+        self.client = client
+        self.root = _TrieNode()
+        self.unmatched: Counter = Counter()
+        self.unmatched_total = 0
+        self._routes: list[tuple[_Route, list[tuple[str, Any]]]] = []
+        self._seq = 0
+        self._attached = False
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @staticmethod
+    def _segments(event: Any) -> list[tuple[str, Any]] | None:
+        """
+        Returns the route segments of an event builder, or None if it cannot be routed.
+        """
+        if isinstance(event, CallbackRoute):
+            segments = event.segments
+        elif type(event) is events.CallbackQuery:
+            if isinstance(event.match, bytes):
+                segments = [("literal", event.match)]
+            else:
+                pattern = getattr(event.match, "__self__", None)
+                literal = LITERAL_DATA_PATTERN.match(pattern.pattern) if (
+                    isinstance(pattern, re.Pattern)
+                    and isinstance(pattern.pattern, bytes)
+                    and not pattern.flags & re.IGNORECASE
+                ) else None
+                if literal is None:
+                    return None
+                segments = [("literal", literal["data"])]
+        else:
+            return None
+
+        if event.chats is not None or event.func is not None:
+            return None
+        return segments
+
+    def add(self, callback: Callable, event: Any) -> bool:
+        """
+        Routes a handler, if its event builder allows it.
+
+        :param callback: The handler function.
+        :param event: The event builder the handler was declared with.
+        :return: True if the router took the handler, False if it must be
+            registered on the client directly.
+        """
+        segments = self._segments(event)
+        if segments is None:
+            return False
+
+        match = event.match if callable(event.match) else None
+        route = _Route(self._seq, callback, match)
+        self._seq += 1
+        self._routes.append((route, segments))
+        self._insert(route, segments)
+
+        if not self._attached:
+            self.client.add_event_handler(self.dispatch, events.CallbackQuery())
+            self._attached = True
+        return True
+
+    def remove(self, callback: Callable) -> bool:
+        """
+        Removes a routed handler.
+
+        :param callback: The handler function.
+        :return: True if the handler was routed by this router.
+        """
+        kept = [(route, segments) for route, segments in self._routes if route.callback is not callback]
+        if len(kept) == len(self._routes):
+            return False
+
+        self._routes = kept
+        self.root = _TrieNode()
+        for route, segments in kept:
+            self._insert(route, segments)
+        return True
+
+    def _insert(self, route: _Route, segments: list[tuple[str, Any]]) -> None:
+        """
+        Adds a route to the trie.
+        """
+        node = self.root
+        for kind, value in segments:
+            if kind == "literal":
+                for byte in value:
+                    node = node.children.setdefault(byte, _TrieNode())
+            elif kind == "param":
+                name, type_name = value
+                converter = PARAMETER_TYPES[type_name][0]
+                for param_name, param_converter, child in node.params:
+                    if param_name == name and param_converter is converter:
+                        node = child
+                        break
+                else:
+                    child = _TrieNode()
+                    node.params.append((name, converter, child))
+                    node = child
+            else:
+                node.wildcards.append(route)
+                return
+        node.routes.append(route)
+
+    def _walk(self, node: _TrieNode, data: bytes, position: int, params: dict,
+              found: list[tuple[_Route, dict]]) -> None:
+        """
+        Collects the routes matching `data[position:]` from `node`.
+        """
+        for route in node.wildcards:
+            found.append((route, params))
+
+        length = len(data)
+        while position < length:
+            if node.params:
+                end = data.find(SEPARATOR, position)
+                if end == -1:
+                    end = length
+                if end > position:
+                    for name, converter, child in node.params:
+                        try:
+                            value = converter(data[position:end])
+                        except ValueError:
+                            continue
+                        self._walk(child, data, end, {**params, name: value}, found)
+
+            node = node.children.get(data[position])
+            if node is None:
+                return
+            position += 1
+            for route in node.wildcards:
+                found.append((route, params))
+
+        for route in node.routes:
+            found.append((route, params))
+
+    def _find(self, data: bytes) -> list[tuple[_Route, dict]]:
+        """
+        Finds the routes matching callback data, in registration order.
+        """
+        found: list[tuple[_Route, dict]] = []
+        self._walk(self.root, data, 0, {}, found)
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0].seq)
+        return found
+
+    def match(self, data: bytes) -> list[tuple[Callable, dict]]:
+        """
+        Finds the handlers matching callback data, in registration order.
+
+        :param data: The callback data.
+        :return: A list of (handler, route parameters) pairs.
+        """
+        return [(route.callback, params) for route, params in self._find(data)]
+
+    def _report_unmatched(self, data: bytes) -> None:
+        """
+        Counts callback data that no route matched.
+        """
+        self.unmatched_total += 1
+        if data in self.unmatched or len(self.unmatched) < self.max_unmatched:
+            self.unmatched[data] += 1
+        logging.debug(f"No callback route matched data {data!r}")
+
+    async def dispatch(self, event: Any) -> None:
+        """
+        Telethon handler running every routed handler that matches the callback data.
+
+        :param event: The `CallbackQuery` event.
+        """
+        data = event.data or b""
+        found = self._find(data)
+        if not found:
+            self._report_unmatched(data)
+            return
+
+        for route, params in found:
+            if route.match is not None:
+                event.data_match = event.pattern_match = route.match(data)
+            event.route_params = params
+            try:
+                await route.callback(event)
+            except events.StopPropagation:
+                raise
+            except Exception:
+                name = getattr(route.callback, "__name__", repr(route.callback))
+                logging.exception(f"Unhandled exception on {name}")
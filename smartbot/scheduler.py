@@ -0,0 +1,214 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Slot:
+    """
+    The worker and lane held by a running job.
+    """
+
+    __slots__ = ("scheduler", "key", "released")
+
+    def __init__(self, scheduler: "UpdateScheduler", key: Hashable) -> None:
+        self.scheduler = scheduler
+        self.key = key
+        self.released = False
+
+
+# Slot of the job running in the current task, if it runs in a scheduler worker
+_current: ContextVar[_Slot | None] = ContextVar("smartbot_scheduler_slot", default=None)
+
+
+class UpdateScheduler:
+    """
+    Runs jobs in per-key lanes with a bounded pool of workers.
+
+    Jobs sharing a key (usually a user ID) run one at a time, in submission
+    order, while jobs of different keys run concurrently. A lane is handed to
+    a worker one job at a time and requeued behind the other ready lanes, so
+    a busy user cannot starve the others. A job about to wait on something
+    other than its own processing (e.g. the user's answer) calls `release`,
+    so it holds neither a worker nor its lane meanwhile.
+
+    Attributes:
+        max_workers (int): Number of jobs running at the same time.
+        max_queue_size (int): Maximum number of jobs waiting in a single lane.
+        max_pending (int): Maximum number of jobs waiting across all lanes.
+    """
+
+    def __init__(self, max_workers: int = 64, max_queue_size: int = 100,
+                 max_pending: int = 100_000) -> None:
+        """
+        Initializes the scheduler. Workers are started on the first submission.
+
+        Args:
+            max_workers (int): Number of jobs running at the same time.
+            max_queue_size (int): Maximum number of jobs waiting in a single lane.
+            max_pending (int): Maximum number of jobs waiting across all lanes.
+        """
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_pending = max_pending
+        self._lanes: dict[Hashable, deque] = {}
+        self._ready: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self.pending = 0
+        self.running = 0
+        self.detached = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _start(self) -> None:
+        """
+        Starts the worker tasks on the running event loop.
+        """
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker())
+            for _ in range(self.max_workers)
+        ]
+
+    def submit(self, key: Hashable, job: Callable[..., Awaitable], *args: Any) -> bool:
+        """
+        Queues a job in the lane of the given key.
+
+        Args:
+            key (Hashable): The lane key. Jobs with the same key never overlap.
+            job (Callable): Coroutine function to run.
+            *args: Arguments for the job.
+
+        Returns:
+            bool: False if the job was dropped because a queue limit was reached.
+        """
+        if self._ready is None:
+            self._start()
+
+        lane = self._lanes.get(key)
+        if (lane is not None and len(lane) >= self.max_queue_size) or self.pending >= self.max_pending:
+            self.dropped += 1
+            logging.warning(f"Update queue full for {key}, dropping update")
+            return False
+
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self._ready.put_nowait(key)
+
+        lane.append((time.monotonic(), job, args))
+        self.pending += 1
+        if len(lane) > self.max_depth:
+            self.max_depth = len(lane)
+        return True
+
+    async def _worker(self) -> None:
+        """
+        Takes ready lanes and runs their next job.
+        """
+        ready = self._ready
+        while True:
+            key = await ready.get()
+            lane = self._lanes[key]
+            enqueued_at, job, args = lane.popleft()
+            self.pending -= 1
+
+            wait = time.monotonic() - enqueued_at
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+            slot = _Slot(self, key)
+            token = _current.set(slot)
+            self.running += 1
+            try:
+                await job(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                logging.exception(f"Unhandled exception while processing update for {key}")
+            finally:
+                _current.reset(token)
+                if slot.released:
+                    self.detached -= 1
+                else:
+                    self.running -= 1
+                self.processed += 1
+
+            if slot.released:
+                # A replacement worker took over when the job was released
+                task = asyncio.current_task()
+                if task in self._workers:
+                    self._workers.remove(task)
+                return
+            if lane:
+                ready.put_nowait(key)
+            else:
+                del self._lanes[key]
+
+    def release(self) -> bool:
+        """
+        Detaches the running job from its worker and lane.
+
+        The job keeps running, but the next job of its lane may start and a
+        new worker replaces the one it held, so a job waiting for a long
+        time blocks neither its user nor the pool.
+
+        Returns:
+            bool: False if the current task is not a job of this scheduler,
+                or was already released.
+        """
+        slot = _current.get()
+        if slot is None or slot.scheduler is not self or slot.released or self._ready is None:
+            return False
+
+        slot.released = True
+        self.running -= 1
+        self.detached += 1
+        if self._lanes[slot.key]:
+            self._ready.put_nowait(slot.key)
+        else:
+            del self._lanes[slot.key]
+        self._workers.append(asyncio.create_task(self._worker()))
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the queue metrics.
+
+        Returns:
+            dict[str, Any]: Queue depth, throughput and wait time counters.
+        """
+        started = self.processed + self.running + self.detached
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "detached": self.detached,
+            "lanes": len(self._lanes),
+            "max_depth": self.max_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "avg_wait": self.total_wait / started if started else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    async def close(self) -> None:
+        """
+        Stops the workers. Jobs still waiting are discarded.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._ready = None
+        self._lanes.clear()
+        self.pending = 0
+        self.running = 0
+        self.detached = 0
@@ -0,0 +1,430 @@
+import heapq
+import bisect
+import pickle
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Iterable, Iterator
+
+
+class SessionStore(MutableMapping):
+    """
+    Base class for the storage backing `Client.user_sessions`.
+
+    A store behaves like a dictionary of user ID to session object. Sessions
+    are mutated in place by the client, so persistent backends are told about
+    changes through `save`, which may buffer the write until `flush`.
+
+    Attributes:
+        persistent (bool): Whether sessions survive a process restart.
+    """
+
+    persistent: bool = False
+    # Called instead of `flush` once enough changes are buffered, so the owner
+    # (e.g. the client write-behind task) writes them off the calling thread
+    flush_requested: Callable[[], None] | None = None
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of sessions buffered by the store and not written yet.
+        """
+        return 0
+
+    def page_user_ids(self, after: int | None = None, limit: int = 500) -> list[int]:
+        """
+        Return the next page of user IDs in ascending order.
+
+        Pages are keyed by the last ID of the previous page instead of an
+        offset, so users added or removed meanwhile do not shift the pages.
+
+        Args:
+            after (int | None): Last user ID of the previous page, None for the first page.
+            limit (int): Maximum number of IDs returned.
+
+        Returns:
+            list[int]: Up to `limit` user IDs greater than `after`.
+        """
+        user_ids = iter(self) if after is None else (user_id for user_id in self if user_id > after)
+        return heapq.nsmallest(limit, user_ids)
+
+    def save(self, session: Any) -> None:
+        """
+        Record that a session changed and must be persisted.
+
+        Args:
+            session (Any): The modified session.
+        """
+        self[session.user_id] = session
+
+    def save_many(self, sessions: Iterable[Any]) -> None:
+        """
+        Record several modified sessions at once.
+
+        Args:
+            sessions (Iterable[Any]): The modified sessions.
+        """
+        for session in sessions:
+            self.save(session)
+
+    def snapshot(self, sessions: Iterable[Any]) -> Any:
+        """
+        Capture the current content of modified sessions for `write_snapshot`.
+
+        This runs on the event loop thread, so the result must no longer
+        reference mutable session state.
+
+        Args:
+            sessions (Iterable[Any]): The modified sessions.
+
+        Returns:
+            Any: An opaque snapshot to pass to `write_snapshot`.
+        """
+        return list(sessions)
+
+    def write_snapshot(self, snapshot: Any) -> None:
+        """
+        Persist a snapshot made by `snapshot`. Safe to call from a worker thread.
+
+        Args:
+            snapshot (Any): The snapshot to write.
+        """
+        self.save_many(snapshot)
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Write every buffered change to the backend.
+        """
+
+    def close(self) -> None:
+        """
+        Flush pending changes and release the backend resources.
+        """
+        self.flush()
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Session store keeping every session in a process-local dictionary.
+
+    The user IDs are also kept sorted once `page_user_ids` is first called,
+    so each page costs O(limit) instead of a scan of every session.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty in-memory store.
+        """
+        self._sessions: dict[int, Any] = {}
+        self._sorted: list[int] | None = None
+
+    def __getitem__(self, user_id: int) -> Any:
+        return self._sessions[user_id]
+
+    def __setitem__(self, user_id: int, session: Any) -> None:
+        if self._sorted is not None and user_id not in self._sessions:
+            bisect.insort(self._sorted, user_id)
+        self._sessions[user_id] = session
+
+    def __delitem__(self, user_id: int) -> None:
+        del self._sessions[user_id]
+        if self._sorted is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, user_id)]
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._sessions
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._sessions)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, user_id: int, default: Any = None) -> Any:
+        return self._sessions.get(user_id, default)
+
+    def page_user_ids(self, after: int | None = None, limit: int = 500) -> list[int]:
+        """
+        Return the next page of user IDs in ascending order, from the sorted IDs.
+
+        Args:
+            after (int | None): Last user ID of the previous page, None for the first page.
+            limit (int): Maximum number of IDs returned.
+
+        Returns:
+            list[int]: Up to `limit` user IDs greater than `after`.
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self._sessions)
+        start = 0 if after is None else bisect.bisect_right(self._sorted, after)
+        return self._sorted[start:start + limit]
+
+    def save(self, session: Any) -> None:
+        # Sessions are mutated in place, there is nothing to write back.
+        pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store persisting sessions in a SQLite database.
+
+    The database runs in WAL mode. Recently used sessions are kept in an LRU
+    cache in front of the disk. Modified sessions are serialized on the
+    calling thread and written in a single transaction through a dedicated
+    writer connection, so a write can run in a worker thread while the event
+    loop keeps reading through its own connection.
+
+    Modified sessions stay buffered, even when evicted from the cache, until
+    they are written. Once `batch_size` of them are buffered, the store calls
+    `flush_requested` if set, and only flushes itself otherwise. Reads look
+    at the buffered and in-flight sessions before the database.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str, cache_size: int = 10_000, batch_size: int = 500) -> None:
+        """
+        Open (or create) the session database.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            cache_size (int): Maximum number of sessions kept in memory.
+            batch_size (int): Number of buffered sessions that requests a flush.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._cache: OrderedDict[int, Any] = OrderedDict()
+        self._dirty: dict[int, Any] = {}
+        # Sessions of the last snapshot, read while it is being written
+        self._writing: dict[int, Any] = {}
+        # Rows of failed writes, retried by the next snapshot
+        self._unwritten: dict[int, bytes] = {}
+        self._unwritten_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS user_sessions ("
+            "user_id INTEGER PRIMARY KEY, "
+            "payload BLOB NOT NULL)"
+        )
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the session database in autocommit mode.
+        """
+        return sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty) + len(self._unwritten)
+
+    def _remember(self, user_id: int, session: Any) -> None:
+        """
+        Put a session at the most recently used end of the cache,
+        evicting the least recently used ones over capacity.
+        Evicted sessions that are not written yet stay buffered.
+        """
+        cache = self._cache
+        cache[user_id] = session
+        cache.move_to_end(user_id)
+
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _unsaved(self, user_id: int) -> Any:
+        """
+        Return a session modified but not in the database yet, or None.
+        """
+        session = self._dirty.get(user_id)
+        if session is None:
+            session = self._writing.get(user_id)
+        if session is None and self._unwritten:
+            with self._unwritten_lock:
+                payload = self._unwritten.get(user_id)
+            if payload is not None:
+                session = pickle.loads(payload)
+        return session
+
+    def __getitem__(self, user_id: int) -> Any:
+        session = self._cache.get(user_id)
+        if session is not None:
+            self._cache.move_to_end(user_id)
+            return session
+
+        session = self._unsaved(user_id)
+        if session is not None:
+            self._remember(user_id, session)
+            return session
+
+        row = self._conn.execute(
+            "SELECT payload FROM user_sessions WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(user_id)
+
+        session = pickle.loads(row[0])
+        self._remember(user_id, session)
+        return session
+
+    def __setitem__(self, user_id: int, session: Any) -> None:
+        self._dirty[user_id] = session
+        self._remember(user_id, session)
+        if len(self._dirty) >= self.batch_size:
+            if self.flush_requested is not None:
+                self.flush_requested()
+            else:
+                self.flush()
+
+    def __delitem__(self, user_id: int) -> None:
+        cached = self._cache.pop(user_id, None)
+        if self._dirty.pop(user_id, None) is not None:
+            cached = True
+        if self._writing.pop(user_id, None) is not None:
+            cached = True
+        with self._unwritten_lock:
+            self._unwritten.pop(user_id, None)
+        with self._lock:
+            cursor = self._writer.execute(
+                "DELETE FROM user_sessions WHERE user_id = ?",
+                (user_id,)
+            )
+        if cached is None and cursor.rowcount == 0:
+            raise KeyError(user_id)
+
+    def __contains__(self, user_id: object) -> bool:
+        if user_id in self._cache or user_id in self._dirty or user_id in self._writing:
+            return True
+        if user_id in self._unwritten:
+            return True
+        return self._conn.execute(
+            "SELECT 1 FROM user_sessions WHERE user_id = ?",
+            (user_id,)
+        ).fetchone() is not None
+
+    def _unsaved_ids(self) -> set[int]:
+        """
+        Return the IDs of the sessions that may not be in the database yet.
+        """
+        with self._unwritten_lock:
+            unwritten = list(self._unwritten)
+        return {*self._dirty, *self._writing, *unwritten}
+
+    def __iter__(self) -> Iterator[int]:
+        rows = self._conn.execute(
+            "SELECT user_id FROM user_sessions ORDER BY user_id"
+        ).fetchall()
+        user_ids = [row[0] for row in rows]
+        unsaved = self._unsaved_ids().difference(user_ids)
+        if unsaved:
+            user_ids = sorted(unsaved.union(user_ids))
+        return iter(user_ids)
+
+    def __len__(self) -> int:
+        count = self._conn.execute(
+            "SELECT COUNT(*) FROM user_sessions"
+        ).fetchone()[0]
+        unsaved = list(self._unsaved_ids())
+        for start in range(0, len(unsaved), 500):
+            chunk = unsaved[start:start + 500]
+            stored = self._conn.execute(
+                f"SELECT COUNT(*) FROM user_sessions WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchone()[0]
+            count += len(chunk) - stored
+        return count
+
+    def page_user_ids(self, after: int | None = None, limit: int = 500) -> list[int]:
+        """
+        Return the next page of user IDs in ascending order, using the primary key index.
+
+        Sessions still buffered by `save` are not listed until they are
+        flushed, so nothing is written while paging.
+
+        Args:
+            after (int | None): Last user ID of the previous page, None for the first page.
+            limit (int): Maximum number of IDs returned.
+
+        Returns:
+            list[int]: Up to `limit` user IDs greater than `after`.
+        """
+        rows = self._conn.execute(
+            "SELECT user_id FROM user_sessions WHERE user_id > ? ORDER BY user_id LIMIT ?",
+            (after if after is not None else -(1 << 63), limit)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def snapshot(self, sessions: Iterable[Any]) -> list[tuple[int, bytes]]:
+        """
+        Serialize the given sessions, along with those buffered by `save`
+        and those of previous writes that failed.
+
+        Args:
+            sessions (Iterable[Any]): The modified sessions.
+
+        Returns:
+            list[tuple[int, bytes]]: Rows of user ID and pickled session.
+        """
+        pending = self._dirty
+        self._dirty = {}
+        for session in sessions:
+            pending[session.user_id] = session
+        self._writing = pending
+
+        with self._unwritten_lock:
+            rows, self._unwritten = self._unwritten, {}
+        for user_id, session in pending.items():
+            rows[user_id] = pickle.dumps(session, pickle.HIGHEST_PROTOCOL)
+        return list(rows.items())
+
+    def write_snapshot(self, snapshot: list[tuple[int, bytes]]) -> None:
+        """
+        Write serialized sessions in a single transaction.
+        If the write fails, the rows are kept for the next snapshot, where
+        newer versions of the same sessions take precedence.
+
+        Args:
+            snapshot (list[tuple[int, bytes]]): Rows made by `snapshot`.
+        """
+        if not snapshot:
+            return
+
+        with self._lock:
+            try:
+                self._writer.execute("BEGIN")
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO user_sessions (user_id, payload) VALUES (?, ?)",
+                    snapshot
+                )
+                self._writer.execute("COMMIT")
+            except Exception:
+                with self._unwritten_lock:
+                    for user_id, payload in snapshot:
+                        self._unwritten.setdefault(user_id, payload)
+                if self._writer.in_transaction:
+                    self._writer.execute("ROLLBACK")
+                logging.error(f"Failed to persist {len(snapshot)} user sessions", exc_info=True)
+                raise
+
+    def flush(self) -> None:
+        """
+        Write every session buffered by `save` in a single transaction,
+        on the calling thread.
+        """
+        self.write_snapshot(self.snapshot(()))
+
+    def close(self) -> None:
+        """
+        Flush pending sessions and close the database connections.
+        """
+        self.flush()
+        self._conn.close()
+        with self._lock:
+            self._writer.close()
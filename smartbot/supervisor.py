@@ -0,0 +1,266 @@
+import os
+import asyncio
+import logging
+from typing import Any, Callable
+
+from telethon.errors import AccessTokenExpiredError, AccessTokenInvalidError
+
+from smartbot.bot import Client
+from smartbot.metrics import export_metrics, start_metrics_server
+from smartbot.outbound import OutboundLimiter
+from smartbot.paths import CLIENTS_DIR, get_session_path
+from smartbot.utils.entities import EntityCache
+
+# Failures a restart cannot fix
+FATAL_ERRORS = (AccessTokenInvalidError, AccessTokenExpiredError)
+
+
+class SupervisedBot:
+    """
+    A bot hosted by a `Supervisor`.
+
+    Attributes:
+        name (str): Name of the bot, unique in the process.
+        client (Client): The client running the bot.
+        task (asyncio.Task | None): The task supervising the client.
+        restarts (int): Times the client was restarted after stopping.
+        error (str | None): The last failure of the client.
+        stopped (bool): Whether the bot was given up on after a fatal error.
+    """
+
+    __slots__ = ("name", "client", "task", "restarts", "error", "stopped")
+
+    def __init__(self, name: str, client: Client) -> None:
+        self.name = name
+        self.client = client
+        self.task: asyncio.Task | None = None
+        self.restarts = 0
+        self.error: str | None = None
+        self.stopped = False
+
+
+class Supervisor:
+    """
+    Hosts several bots in one process and event loop.
+
+    The bots share the imported plugin modules, one entity cache and one
+    outbound limiter, with their entries kept apart by bot, so each extra
+    bot costs a client instead of an interpreter with its own copy of
+    Telethon and of the plugins. Every bot keeps its own Telegram session
+    (inside `CLIENTS_DIR`), user sessions, handler metrics and traces.
+
+    A bot that fails is restarted with an exponential backoff, without
+    affecting the others; a bot whose token is rejected is stopped.
+    """
+
+    def __init__(
+            self,
+            plugins: Any | None = None,
+            entity_cache: EntityCache | None = None,
+            outbound_limiter: OutboundLimiter | None = None,
+            metrics_port: int | None = None,
+            restart_delay: float = 5,
+            max_restart_delay: float = 300,
+            client_class: Callable[..., Client] = Client,
+            **defaults: Any
+    ) -> None:
+        """
+        Initialize the supervisor.
+        Args:
+            plugins (Any | None): Plugin configuration of every bot
+            entity_cache (EntityCache | None): Entity cache shared by the bots, a new one by default
+            outbound_limiter (OutboundLimiter | None): Rate limiter shared by the bots, a new one by default
+            metrics_port (int | None): Local port serving the metrics of every bot to Prometheus, None to disable
+            restart_delay (float): Seconds before the first restart of a failed bot, doubled on each failure
+            max_restart_delay (float): Longest delay between restarts, a bot running this long is
+                restarted after `restart_delay` again
+            client_class (Callable[..., Client]): Builds the clients, `Client` by default
+            **defaults: Keyword arguments for every client, such as api_id and api_hash
+        """
+        self.plugins = plugins
+        self.entity_cache = entity_cache if entity_cache is not None else EntityCache()
+        self.outbound_limiter = outbound_limiter if outbound_limiter is not None else OutboundLimiter()
+        self.metrics_port = metrics_port
+        self.metrics_server: asyncio.Server | None = None
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.client_class = client_class
+        self.defaults = defaults
+        self.bots: dict[str, SupervisedBot] = {}
+
+    def add(self, bot_token: str, name: str | None = None, **kwargs: Any) -> Client:
+        """
+        Add a bot to the process.
+        Args:
+            bot_token (str): Token of the bot
+            name (str | None): Name of the bot, the ID in its token by default
+            **kwargs: Keyword arguments for this client, overriding the defaults
+        Returns:
+            Client: The client of the bot
+        Raises:
+            ValueError: If a bot with the same name was already added
+        """
+        name = name or bot_token.split(":", 1)[0]
+        if name in self.bots:
+            raise ValueError(f"Bot {name!r} added twice")
+
+        os.makedirs(CLIENTS_DIR, exist_ok=True)
+        options = {
+            "session": get_session_path(name),
+            "broadcast_checkpoint": os.path.join(CLIENTS_DIR, f"{name}.broadcast.json"),
+            **self.defaults,
+            **kwargs,
+        }
+        client = self.client_class(
+            bot_token=bot_token,
+            plugins=self.plugins,
+            entity_cache=self.entity_cache,
+            outbound_limiter=self.outbound_limiter,
+            scope=name,
+            **options
+        )
+        self.bots[name] = SupervisedBot(name, client)
+        return client
+
+    async def _supervise(self, bot: SupervisedBot) -> None:
+        """
+        Run a bot, restarting it whenever it stops, until cancelled.
+        Args:
+            bot (SupervisedBot): The bot to run
+        """
+        loop = asyncio.get_running_loop()
+        delay = self.restart_delay
+        while True:
+            started = loop.time()
+            try:
+                await bot.client.run()
+                logging.warning(f"[{bot.name}] Bot stopped")
+            except FATAL_ERRORS as e:
+                bot.error, bot.stopped = repr(e), True
+                logging.error(f"[{bot.name}] Bot rejected by Telegram, not restarting: {e}")
+                await self._disconnect(bot)
+                return
+            except Exception as e:
+                bot.error = repr(e)
+                logging.exception(f"[{bot.name}] Bot failed")
+
+            await self._disconnect(bot)
+            if loop.time() - started >= self.max_restart_delay:
+                delay = self.restart_delay
+            bot.restarts += 1
+            logging.info(f"[{bot.name}] Restarting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    @staticmethod
+    async def _disconnect(bot: SupervisedBot) -> None:
+        """
+        Drop the connection of a stopped bot before it is restarted.
+        """
+        try:
+            await bot.client.disconnect()
+        except Exception as e:
+            logging.debug(f"[{bot.name}] Error while disconnecting: {e!r}")
+
+    async def run(self) -> None:
+        """
+        Run every bot until cancelled.
+        """
+        if self.metrics_port is not None and self.metrics_server is None:
+            self.metrics_server = await start_metrics_server(self.export, port=self.metrics_port)
+
+        for bot in self.bots.values():
+            bot.task = asyncio.create_task(self._supervise(bot), name=f"bot-{bot.name}")
+        logging.info(f"Supervising {len(self.bots)} bots")
+        await asyncio.gather(*(bot.task for bot in self.bots.values()))
+
+    async def shutdown(self) -> None:
+        """
+        Stop every bot and shut its client down.
+        A bot failing to shut down does not keep the others from doing so.
+        """
+        tasks = [bot.task for bot in self.bots.values() if bot.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        results = await asyncio.gather(
+            *(bot.client.shutdown() for bot in self.bots.values()),
+            return_exceptions=True
+        )
+        for bot, result in zip(self.bots.values(), results):
+            if isinstance(result, Exception):
+                logging.error(f"[{bot.name}] Error while shutting down: {result!r}")
+
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        logging.info('All bots disconnected.')
+
+    def status(self) -> dict[str, dict[str, Any]]:
+        """
+        Get the state of every bot.
+        Returns:
+            dict[str, dict[str, Any]]: Connection, restarts, last error and outbound counters, by bot
+        """
+        return {
+            name: {
+                "connected": bot.client.is_connected(),
+                "stopped": bot.stopped,
+                "restarts": bot.restarts,
+                "error": bot.error,
+                "outbound": bot.client.outbound.stats(),
+            }
+            for name, bot in self.bots.items()
+        }
+
+    def export(self) -> str:
+        """
+        Get the metrics of every bot, labelled by bot.
+        Returns:
+            str: The metrics in the Prometheus text format
+        """
+        sources = {
+            name: bot.client.plugin_loader.metrics
+            for name, bot in self.bots.items()
+            if bot.client.plugin_loader is not None and bot.client.plugin_loader.metrics is not None
+        }
+        lines = [export_metrics(sources).rstrip("\n")]
+
+        def family(metric: str, kind: str, description: str, values: dict[str, Any]) -> None:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.extend(f"{metric}{{{labels}}} {value}" for labels, value in values.items())
+
+        bots = self.bots.items()
+        family("smartbot_bot_up", "gauge", "Whether the bot is connected.",
+               {f'bot="{name}"': int(bot.client.is_connected()) for name, bot in bots})
+        family("smartbot_bot_restarts_total", "counter", "Restarts of the bot after it stopped.",
+               {f'bot="{name}"': bot.restarts for name, bot in bots})
+        outbound = {name: bot.client.outbound.stats() for name, bot in bots}
+        for counter, description in (
+                ("sent", "Outbound requests completed."),
+                ("flood_waits", "FloodWait errors received."),
+                ("failed", "Outbound requests that gave up after a FloodWait."),
+        ):
+            family(f"smartbot_outbound_{counter}_total", "counter", description,
+                   {f'bot="{name}"': stats[counter] for name, stats in outbound.items()})
+        family("smartbot_users_in_state", "gauge", "Users in each conversation state.", {
+            f'bot="{name}",state="{state.name}"': count
+            for name, bot in bots
+            for state, count in bot.client.state_counts().items()
+        })
+        return "\n".join(lines) + "\n"
+
+    def start_service(self) -> None:
+        """
+        Run every bot until interrupted, then shut them down.
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(self.run())
+        except KeyboardInterrupt:
+            logging.info(
+                'Supervisor interrupted by user.\n'
+                'Disconnecting...'
+            )
+            loop.run_until_complete(self.shutdown())
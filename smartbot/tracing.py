@@ -0,0 +1,255 @@
+import json
+import random
+import logging
+import functools
+from collections import deque
+from contextvars import ContextVar
+from time import perf_counter_ns
+from typing import Any, Awaitable, Callable
+
+# Trace of the update being processed by the current task
+_current: ContextVar["Trace | None"] = ContextVar("smartbot_trace", default=None)
+
+
+class Span:
+    """
+    A timed step of the processing of an update.
+
+    Attributes:
+        name (str): What was timed, e.g. the handler or API method name.
+        category (str): The pipeline stage: queue, dispatch, middleware,
+            entity, handler, outbound or api.
+        start (int): Start time in `perf_counter_ns` nanoseconds.
+        end (int | None): End time, None while running.
+        attrs (dict): Extra details.
+    """
+
+    __slots__ = ("name", "category", "start", "end", "attrs")
+
+    def __init__(self, name: str, category: str, start: int, attrs: dict | None = None) -> None:
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.attrs = attrs
+
+
+class Trace:
+    """
+    The spans recorded while processing one update.
+
+    Attributes:
+        trace_id (int): Sequential ID of the trace.
+        name (str): The update type.
+        arrived (int): When the update reached the client, in `perf_counter_ns` nanoseconds.
+        spans (list[Span]): Recorded spans, in start order.
+        attrs (dict): Extra details, such as the user ID.
+    """
+
+    __slots__ = ("trace_id", "name", "arrived", "spans", "attrs")
+
+    def __init__(self, trace_id: int, name: str, attrs: dict) -> None:
+        self.trace_id = trace_id
+        self.name = name
+        self.arrived = perf_counter_ns()
+        self.spans: list[Span] = []
+        self.attrs = attrs
+
+    def to_dict(self, origin: int = 0) -> dict[str, Any]:
+        """
+        Returns the trace as plain data, with times in milliseconds since `origin`.
+        """
+        return {
+            "id": self.trace_id,
+            "name": self.name,
+            "arrived_ms": (self.arrived - origin) / 1e6,
+            "attrs": self.attrs,
+            "spans": [
+                {
+                    "name": span.name,
+                    "category": span.category,
+                    "start_ms": (span.start - origin) / 1e6,
+                    "duration_ms": None if span.end is None else (span.end - span.start) / 1e6,
+                    **({"attrs": span.attrs} if span.attrs else {}),
+                }
+                for span in self.spans
+            ],
+        }
+
+
+class _SpanContext:
+    __slots__ = ("span", "trace")
+
+    def __init__(self, trace: Trace, name: str, category: str, attrs: dict | None) -> None:
+        self.trace = trace
+        self.span = Span(name, category, 0, attrs)
+
+    def __enter__(self) -> Span:
+        self.span.start = perf_counter_ns()
+        self.trace.spans.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.span.end = perf_counter_ns()
+        if exc_type is not None:
+            self.span.attrs = {**(self.span.attrs or {}), "error": exc_type.__name__}
+
+
+class _NullSpan:
+    """Context manager used when the current update is not traced."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, category: str, **attrs: Any) -> Any:
+    """
+    Times a block as a span of the update being processed, if it is traced.
+
+    Costs a context variable lookup when the update is not sampled.
+
+    :param name: What is timed.
+    :param category: The pipeline stage.
+    :param attrs: Extra details.
+    :return: A context manager.
+    """
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return _SpanContext(trace, name, category, attrs or None)
+
+
+def traced(callback: Callable[[Any], Awaitable], name: str, category: str = "handler") -> Callable:
+    """
+    Wraps a handler to record its calls as spans of the traced updates.
+
+    :param callback: The handler function.
+    :param name: The span name.
+    :param category: The span category.
+    :return: The wrapped handler, keeping the name and attributes of the handler.
+    """
+
+    @functools.wraps(callback)
+    async def wrapper(event):
+        trace = _current.get()
+        if trace is None:
+            return await callback(event)
+        with _SpanContext(trace, name, category, None):
+            return await callback(event)
+
+    return wrapper
+
+
+class Tracer:
+    """
+    Samples incoming updates and keeps the traces of the latest ones.
+
+    A sampled update is stamped on arrival. The time it waits in the update
+    queue, its dispatch, and every span opened while it is processed, by the
+    middleware, the entity lookups, the handlers and the outbound API calls,
+    are recorded in its trace.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 1000) -> None:
+        """
+        Initializes the tracer.
+
+        :param sample_rate: Fraction of the updates traced, from 0 (off) to 1 (all).
+        :param capacity: Number of finished traces kept, older ones are dropped.
+        """
+        self.sample_rate = sample_rate
+        self.traces: deque[Trace] = deque(maxlen=capacity)
+        self.origin = perf_counter_ns()
+        self._next_id = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def begin(self, name: str, **attrs: Any) -> Trace | None:
+        """
+        Decides whether to trace an update that just arrived.
+
+        :param name: The update type.
+        :param attrs: Extra details, such as the user ID.
+        :return: The new trace, or None if the update is not sampled.
+        """
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        self._next_id += 1
+        return Trace(self._next_id, name, attrs)
+
+    async def run(self, trace: Trace, job: Callable[..., Awaitable], *args: Any) -> Any:
+        """
+        Runs the processing of a traced update, recording its spans.
+
+        :param trace: The trace returned by `begin`.
+        :param job: Coroutine function processing the update.
+        :param args: Arguments for `job`.
+        :return: The result of `job`.
+        """
+        queued = Span("queue", "queue", trace.arrived)
+        queued.end = perf_counter_ns()
+        trace.spans.append(queued)
+
+        token = _current.set(trace)
+        try:
+            with _SpanContext(trace, trace.name, "dispatch", None):
+                return await job(*args)
+        finally:
+            _current.reset(token)
+            self.traces.append(trace)
+
+    def to_json(self) -> list[dict[str, Any]]:
+        """
+        Returns the kept traces as plain data, times in milliseconds since the tracer started.
+        """
+        return [trace.to_dict(self.origin) for trace in self.traces]
+
+    def to_chrome(self) -> dict[str, Any]:
+        """
+        Returns the kept traces in the Chrome trace event format, one row per
+        update, for chrome://tracing or Perfetto.
+        """
+        events = []
+        for trace in self.traces:
+            label = " ".join([trace.name, *(f"{key}={value}" for key, value in trace.attrs.items())])
+            events.append({
+                "ph": "M", "name": "thread_name", "pid": 1, "tid": trace.trace_id,
+                "args": {"name": f"#{trace.trace_id} {label}"},
+            })
+            for item in trace.spans:
+                end = item.end if item.end is not None else item.start
+                events.append({
+                    "ph": "X",
+                    "name": item.name,
+                    "cat": item.category,
+                    "pid": 1,
+                    "tid": trace.trace_id,
+                    "ts": (item.start - self.origin) / 1000,
+                    "dur": (end - item.start) / 1000,
+                    "args": item.attrs or {},
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str, chrome: bool = True) -> int:
+        """
+        Writes the kept traces to a file.
+
+        :param path: Destination file.
+        :param chrome: Whether to write the Chrome trace format, or the plain JSON of `to_json`.
+        :return: Number of traces written.
+        """
+        data = self.to_chrome() if chrome else self.to_json()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        logging.info(f"Exported {len(self.traces)} update traces to {path}")
+        return len(self.traces)
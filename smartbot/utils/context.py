@@ -1,4 +1,5 @@
-from collections import defaultdict
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Callable, Iterable, Iterator
 
 DELETE_KEY = "delete_queue"
 MENU_KEY = "menu_stack"
@@ -14,18 +15,196 @@ BACK_TO_HOME = """
 """
 
 
-def get_user_driver(event) -> dict:
+class TrackedList(list):
     """
-    Returns the user's dictionary (driver).
-    Initializes it if it doesn't exist yet.
+    List calling `on_change` after every in-place change.
+
+    Used for the session containers handed out live (menu stack, delete
+    queue), so changing them marks the session modified while reading
+    them does not. Pickled as its items only.
     """
-    user_id = event.sender_id if hasattr(event, "sender_id") else event.chat_id
-    client = event.client
 
-    if not hasattr(client, "drivers"):
-        event.client.drivers = {}
+    __slots__ = ("on_change",)
+
+    def __init__(self, items: Iterable[Any] = (), on_change: Callable[[], None] | None = None) -> None:
+        super().__init__(items)
+        self.on_change = on_change
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
+
+    def append(self, item: Any) -> None:
+        super().append(item)
+        self._changed()
+
+    def extend(self, items: Iterable[Any]) -> None:
+        super().extend(items)
+        self._changed()
+
+    def insert(self, index: int, item: Any) -> None:
+        super().insert(index, item)
+        self._changed()
+
+    def pop(self, index: int = -1) -> Any:
+        item = super().pop(index)
+        self._changed()
+        return item
+
+    def remove(self, item: Any) -> None:
+        super().remove(item)
+        self._changed()
+
+    def clear(self) -> None:
+        if self:
+            super().clear()
+            self._changed()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index: Any) -> None:
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, items: Iterable[Any]) -> "TrackedList":
+        self.extend(items)
+        return self
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, (list(self),)
+
+
+class UserDriver(MutableMapping):
+    """
+    Dictionary view (driver) over a user session.
+
+    The menu stack and delete queue are exposed under `MENU_KEY` and
+    `DELETE_KEY`, every other key maps to the session's persistent data.
+    Nothing is copied: reads and writes go straight to the session. The
+    stack and queue are handed out live; changing them in place marks the
+    session modified, like any write, while reading them does not.
+    """
+
+    __slots__ = ("session", "_on_change")
+
+    def __init__(self, session: Any, on_change: Callable[[Any], None] | None = None) -> None:
+        """
+        Initializes the view.
+
+        :param session: The user session to expose.
+        :param on_change: Called with the session after a write.
+        """
+        self.session = session
+        self._on_change = on_change
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change(self.session)
+
+    def _watch(self, items: Any) -> Any:
+        """
+        Marks the session modified when a live container is changed.
+        """
+        if self._on_change is not None and isinstance(items, TrackedList):
+            items.on_change = self._changed
+        return items
 
-    if not isinstance(event.client.drivers.get(user_id), dict):
-        event.client.drivers[user_id] = defaultdict(list)
+    def __getitem__(self, key: str) -> Any:
+        if key == MENU_KEY:
+            return self._watch(self.session.menu_stack)
+        if key == DELETE_KEY:
+            return self._watch(self.session.delete_queue)
+        return self.session.data[key]
 
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == MENU_KEY:
+            self.session.menu_stack = value
+        elif key == DELETE_KEY:
+            self.session.delete_queue = value
+        else:
+            self.session.data[key] = value
+        self._changed()
+
+    def __delitem__(self, key: str) -> None:
+        if key == MENU_KEY:
+            self.session.menu_stack.clear()
+        elif key == DELETE_KEY:
+            self.session.delete_queue.clear()
+        else:
+            del self.session.data[key]
+        self._changed()
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.session.data
+        yield MENU_KEY
+        yield DELETE_KEY
+
+    def __len__(self) -> int:
+        return len(self.session.data) + 2
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == MENU_KEY or key == DELETE_KEY:
+            return self[key]
+        return self.session.get_data(key, default)
+
+    def clear(self) -> None:
+        self.session.clear_user_data()
+        self.session.menu_stack.clear()
+        self.session.delete_queue.clear()
+        self._changed()
+
+    def __repr__(self) -> str:
+        # Read the session containers without creating or watching them
+        session = self.session
+        items = dict(getattr(session, "_data", None) or {})
+        items[MENU_KEY] = list(getattr(session, "_menu_stack", None) or ())
+        items[DELETE_KEY] = list(getattr(session, "_delete_queue", None) or ())
+        return f"UserDriver({items!r})"
+
+
+class SessionDrivers(Mapping):
+    """
+    Read-only mapping of user ID to `UserDriver`, backed by the client sessions.
+
+    Looking up a user creates their session if needed, like the
+    `defaultdict` drivers used to.
+    """
+
+    def __init__(self, client: Any) -> None:
+        """
+        Initializes the view.
+
+        :param client: The client owning the user sessions.
+        """
+        self.client = client
+
+    def __getitem__(self, user_id: int) -> UserDriver:
+        return UserDriver(
+            self.client.get_user_session(user_id),
+            self.client._mark_session_dirty
+        )
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self.client.user_sessions
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.client.user_sessions)
+
+    def __len__(self) -> int:
+        return len(self.client.user_sessions)
+
+    def get(self, user_id: int, default: Any = None) -> Any:
+        if user_id not in self:
+            return default
+        return self[user_id]
+
+
+def get_user_driver(event) -> UserDriver:
+    """
+    Returns the user's dictionary (driver).
+    Initializes the user session if it doesn't exist yet.
+    """
+    user_id = event.sender_id if hasattr(event, "sender_id") else event.chat_id
     return event.client.drivers[user_id]
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from telethon.errors import BadRequestError, ForbiddenError
+
+
+class DeletionQueue:
+    """
+    Deletes messages in the background, in batches.
+
+    Message IDs queued with `add` are grouped by chat and deduplicated, then
+    deleted shortly after in requests of at most `batch_size` IDs, so the
+    handler that queued them does not wait for the round trip. Failures that
+    may be transient are retried with an exponential backoff; messages that
+    are gone or cannot be deleted are dropped.
+    """
+
+    def __init__(
+            self,
+            delete: Callable[[Any, list[int]], Awaitable[Any]],
+            batch_size: int = 100,
+            delay: float = 0.2,
+            max_retries: int = 3,
+            retry_delay: float = 1.0,
+    ) -> None:
+        """
+        Initializes the queue.
+
+        :param delete: Coroutine function deleting a list of message IDs from a chat.
+        :param batch_size: Maximum number of IDs per request (Telegram allows 100).
+        :param delay: Seconds to wait for more IDs before flushing.
+        :param max_retries: Retries of a failed batch before giving up.
+        :param retry_delay: Delay before the first retry, doubled on every attempt.
+        """
+        self.delete = delete
+        self.batch_size = batch_size
+        self.delay = delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.deleted = 0
+        self.requests = 0
+        self.failed = 0
+        self._pending: dict[Hashable, dict[int, None]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    def add(self, chat_id: Hashable, message_ids: int | Iterable[int]) -> None:
+        """
+        Queues messages for deletion. Returns immediately.
+
+        :param chat_id: The chat the messages belong to.
+        :param message_ids: A message ID or several.
+        """
+        ids = self._pending.setdefault(chat_id, {})
+        if isinstance(message_ids, int):
+            ids[message_ids] = None
+        else:
+            ids.update(dict.fromkeys(message_ids))
+
+        if not ids:
+            del self._pending[chat_id]
+        elif len(ids) >= self.batch_size:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        """
+        Takes every queued ID and deletes them in a background task.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._delete_all(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete_all(self, pending: dict[Hashable, dict[int, None]]) -> None:
+        batches = []
+        for chat_id, ids in pending.items():
+            ids = list(ids)
+            for start in range(0, len(ids), self.batch_size):
+                batches.append(self._delete_batch(chat_id, ids[start:start + self.batch_size]))
+        await asyncio.gather(*batches)
+
+    async def _delete_batch(self, chat_id: Hashable, message_ids: list[int]) -> None:
+        """
+        Deletes one batch, retrying failures that may be transient.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            try:
+                await self.delete(chat_id, message_ids)
+            except (BadRequestError, ForbiddenError) as e:
+                # The messages are gone or cannot be deleted, retrying would not help
+                self.failed += len(message_ids)
+                logging.info(f"[{chat_id}] Dropping {len(message_ids)} messages from the deletion queue: {e}")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += len(message_ids)
+                    logging.warning(f"[{chat_id}] Failed to delete {len(message_ids)} messages: {e}")
+                    return
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            else:
+                self.deleted += len(message_ids)
+                return
+
+    async def flush(self) -> None:
+        """
+        Deletes every queued message now and waits for the pending requests.
+        """
+        self._start_flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the queue counters.
+
+        :return: Queued, deleted and failed message counts and the number of requests made.
+        """
+        return {
+            "queued": len(self),
+            "deleted": self.deleted,
+            "failed": self.failed,
+            "requests": self.requests,
+        }
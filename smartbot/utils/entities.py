@@ -0,0 +1,168 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from smartbot.tracing import span
+
+
+class EntityCache:
+    """
+    Process-wide LRU cache of Telegram entities with a time-to-live.
+
+    Keeps hit and miss counters so the cache efficiency can be monitored.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 600) -> None:
+        """
+        Initializes the cache.
+
+        :param maxsize: Maximum number of entities kept.
+        :param ttl: Seconds after which a cached entity is refetched.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns a cached entity, or None if it is missing or stale.
+
+        :param key: The entity key (usually the user ID).
+        :return: The cached entity or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, entity = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entity
+
+    def put(self, key: Hashable, entity: Any) -> None:
+        """
+        Stores an entity, evicting the least recently used ones over capacity.
+
+        :param key: The entity key (usually the user ID).
+        :param entity: The entity to store.
+        """
+        entries = self._entries
+        entries[key] = (time.monotonic(), entity)
+        entries.move_to_end(key)
+        while len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns the cache counters.
+
+        :return: A dictionary with hits, misses, hit rate and size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+
+class EntityBatcher:
+    """
+    Coalesces concurrent entity lookups into a single `get_entity` call.
+
+    Lookups requested during the same event loop iteration are resolved
+    together, so a burst of cold users costs one round trip instead of many.
+    """
+
+    def __init__(self, client: Any) -> None:
+        """
+        Initializes the batcher.
+
+        :param client: The Telegram client used to fetch entities.
+        """
+        self.client = client
+        self.batches = 0
+        self._pending: dict[int, asyncio.Future] = {}
+
+    async def fetch(self, entity_id: int) -> Any:
+        """
+        Fetches an entity, sharing the request with concurrent lookups.
+
+        :param entity_id: The ID of the entity to fetch.
+        :return: The fetched entity.
+        """
+        future = self._pending.get(entity_id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._start_batch)
+            future = self._pending[entity_id] = loop.create_future()
+
+        return await asyncio.shield(future)
+
+    def _start_batch(self) -> None:
+        """
+        Takes every pending lookup and resolves it in a background task.
+        """
+        pending, self._pending = self._pending, {}
+        asyncio.ensure_future(self._resolve(pending))
+
+    async def _resolve(self, pending: dict[int, asyncio.Future]) -> None:
+        """
+        Resolves a batch of lookups, falling back to one request per entity
+        if the batched request fails.
+
+        :param pending: Futures to resolve, by entity ID.
+        """
+        self.batches += 1
+        ids = list(pending)
+        try:
+            entities = await self.client.get_entity(ids)
+        except Exception as e:
+            logging.debug(f"Batched entity lookup failed, resolving one by one: {e}")
+        else:
+            for entity_id, entity in zip(ids, entities):
+                if not pending[entity_id].done():
+                    pending[entity_id].set_result(entity)
+            return
+
+        for entity_id, future in pending.items():
+            try:
+                entity = await self.client.get_entity(entity_id)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(entity)
+
+
+async def get_sender(event) -> Any:
+    """
+    Returns the sender of an event, using the client entity cache when available.
+
+    The sender is memoized on the event, so later calls for the same event,
+    including `event.get_sender()`, do not trigger another lookup.
+
+    :param event: The Telegram event instance.
+    :return: The sender entity.
+    """
+    resolve_sender = getattr(event.client, "resolve_sender", None)
+    with span("get_sender", "entity"):
+        if resolve_sender is None:
+            return await event.get_sender()
+        return await resolve_sender(event)
@@ -0,0 +1,77 @@
+import heapq
+from typing import Any, Callable, Hashable
+
+
+class ExpiryIndex:
+    """
+    Lazy-deletion min-heap of session deadlines.
+
+    Each key has at most one entry in the heap. Activity updates do not touch
+    the heap: when an entry reaches the top, its real deadline is recomputed
+    and the key is either reported as expired or pushed back with the new
+    deadline. A sweep therefore only visits keys whose stored deadline passed.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty expiry index.
+        """
+
+        self._heap: list[tuple[Any, Hashable]] = []
+        self._scheduled: dict[Hashable, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._scheduled)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._scheduled
+
+    def schedule(self, key: Hashable, deadline: Any) -> None:
+        """
+        Tracks a key with the given deadline, unless it is already tracked.
+
+        :param key: The key to track (usually a user ID).
+        :param deadline: The earliest moment the key may expire.
+        """
+        if key in self._scheduled:
+            return
+
+        self._scheduled[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def discard(self, key: Hashable) -> None:
+        """
+        Stops tracking a key. Its heap entry is dropped on the next sweep.
+
+        :param key: The key to forget.
+        """
+        self._scheduled.pop(key, None)
+
+    def pop_expired(self, now: Any, get_deadline: Callable[[Hashable], Any]) -> list:
+        """
+        Removes and returns every key whose real deadline is not after `now`.
+
+        :param now: The current moment, comparable with the deadlines.
+        :param get_deadline: Returns the up-to-date deadline for a key,
+            or None if the key no longer exists.
+        :return: The list of expired keys.
+        """
+        heap = self._heap
+        expired = []
+
+        while heap and heap[0][0] <= now:
+            stored, key = heapq.heappop(heap)
+            if self._scheduled.get(key) != stored:
+                continue  # Stale entry left behind by discard()
+
+            deadline = get_deadline(key)
+            if deadline is None:
+                del self._scheduled[key]
+            elif deadline <= now:
+                del self._scheduled[key]
+                expired.append(key)
+            else:
+                self._scheduled[key] = deadline
+                heapq.heappush(heap, (deadline, key))
+
+        return expired
@@ -1,7 +1,6 @@
 import logging
 import functools
 from typing import Callable, Awaitable
-from collections import defaultdict
 from telethon import Button
 from telethon.events import CallbackQuery
 from telethon.tl.types import (
@@ -9,6 +8,9 @@ from telethon.tl.types import (
     MessageMediaPhoto,
     MessageMediaDocument
 )
+from smartbot.utils.entities import get_sender
+from smartbot.tracing import span
+from smartbot.utils.menu_registry import menu_registry
 from smartbot.utils.context import (
     get_user_driver,
     DELETE_KEY,
@@ -28,33 +30,32 @@ def with_stack_and_cleanup(push: bool = True, cleanup: bool | None = None):
     def decorator(handler: Callable[[any], Awaitable[None]]):
         @functools.wraps(handler)
         async def wrapper(event):
-            sender = await event.get_sender()
-            sender_id = sender.id
-
-            user_data = get_user_driver(event)
-            delete_queue = user_data[DELETE_KEY]
-
-            message = None
-            is_callback = isinstance(event, CallbackQuery.Event)
-            should_cleanup = cleanup if cleanup is not None else is_callback
-
-            if should_cleanup and delete_queue:
-                try:
-                    await event.client.delete_messages(sender_id, delete_queue)
-                except Exception as e:
-                    logging.warning(f"[{sender_id}] Failed to delete previous messages: {e}")
-                delete_queue.clear()
-
-            if is_callback:
-                message = await event.get_message()
-            elif hasattr(event, 'message'):
-                message = event.message
-
-            if push and message and message.text:
-                try:
-                    user_data[MENU_KEY].append((message.text, message.reply_markup))
-                except Exception as e:
-                    logging.warning(f"[{sender_id}] Failed to push to stack: {e}")
+            with span("with_stack_and_cleanup", "middleware"):
+                sender = await get_sender(event)
+                sender_id = sender.id
+
+                user_data = get_user_driver(event)
+                delete_queue = user_data[DELETE_KEY]
+
+                message = None
+                is_callback = isinstance(event, CallbackQuery.Event)
+                should_cleanup = cleanup if cleanup is not None else is_callback
+
+                if should_cleanup and delete_queue:
+                    # Deleted in the background, the handler does not wait for it
+                    event.client.deletion_queue.add(sender_id, delete_queue)
+                    delete_queue.clear()
+
+                if is_callback:
+                    message = await event.get_message()
+                elif hasattr(event, 'message'):
+                    message = event.message
+
+                if push and message and message.text:
+                    try:
+                        user_data[MENU_KEY].append((message.text, message.reply_markup))
+                    except Exception as e:
+                        logging.warning(f"[{sender_id}] Failed to push to stack: {e}")
 
             await handler(event)
 
@@ -65,28 +66,23 @@ def with_stack_and_cleanup(push: bool = True, cleanup: bool | None = None):
 
 async def clear_temp_messages(event, sender_id: int):
     """
-    Clears all temporary messages for a given user by deleting
-    the message IDs stored in the delete queue.
+    Clears all temporary messages for a given user by handing
+    the message IDs stored in the delete queue to the client
+    deletion queue, which deletes them in the background.
 
-    Initializes the user driver context if it doesn't exist.
+    Initializes the user session if it doesn't exist.
 
     :param event: The Telegram event instance.
     :param sender_id: The Telegram user ID whose messages should be deleted.
     """
-    if not isinstance(event.client.drivers.get(sender_id), dict):
-        event.client.drivers[sender_id] = defaultdict(list)
-
     user_data = event.client.drivers[sender_id]
     delete_queue = user_data[DELETE_KEY]
 
     if not delete_queue:
         return
 
-    try:
-        await event.client.delete_messages(sender_id, delete_queue)
-        delete_queue.clear()
-    except Exception as e:
-        logging.warning(f"Error while clearing messages for {sender_id}: {e}")
+    event.client.deletion_queue.add(sender_id, delete_queue)
+    delete_queue.clear()
 
 
 async def go_back(event):
@@ -94,23 +90,37 @@ async def go_back(event):
     Navigates back to the previous menu by popping from the user's menu stack.
 
     If the stack is empty, notifies the user that there is no previous menu.
+    Registered menus that no longer exist (renamed or removed by a plugin
+    reload, or restored from a persisted stack) are skipped.
     Also handles whether the event is a CallbackQuery or a regular message.
 
     :param event: The incoming event (either CallbackQuery or NewMessage).
     """
-    sender = await event.get_sender()
+    sender = await get_sender(event)
     sender_id = sender.id
     msg_recv = await event.get_message()
 
-    if not isinstance(event.client.drivers.get(sender_id), dict):
-        event.client.drivers[sender_id] = defaultdict(list)
-
     user_data = event.client.drivers[sender_id]
     stack = user_data[MENU_KEY]
 
-    if stack:
-        text, buttons = stack.pop()
+    text = buttons = None
+    missing = False
+    while stack and text is None:
+        entry = stack.pop()
+        if not isinstance(entry, str):
+            text, buttons = entry
+        elif (menu := menu_registry.get(entry)) is not None:
+            text, buttons = menu.title, menu.markup
+        else:
+            logging.warning(f"Skipping unknown menu {entry!r} in the stack of {sender_id}")
+            missing = True
 
+    if text is None and missing:
+        if isinstance(event, CallbackQuery.Event):
+            await event.answer("⚠️ Menu indisponível.", alert=True)
+        else:
+            await event.respond("⚠️ Menu indisponível.")
+    elif text is not None:
         if isinstance(event, CallbackQuery.Event):
             try:
                 if text.startswith("/"):
@@ -0,0 +1,215 @@
+import re
+import sys
+import logging
+from typing import Any, Iterator
+
+from telethon.client.buttons import ButtonMethods
+from telethon.events import CallbackQuery
+
+from smartbot.utils.buttons import build_inline_buttons
+from smartbot.utils.context import get_user_driver, MENU_KEY
+
+# Callback data prefix of the buttons opening a registered menu
+MENU_ROUTE_PREFIX = "menu"
+MENU_ID = re.compile(r"^[\w\-]+$")
+# Largest callback data Telegram accepts, in bytes
+CALLBACK_DATA_LIMIT = 64
+BACK_BUTTON = ("🔙 Voltar", b"back_menu")
+
+
+class MenuLink:
+    """
+    Button target opening another registered menu.
+    """
+
+    __slots__ = ("menu_id",)
+
+    def __init__(self, menu_id: str) -> None:
+        """
+        :param menu_id: The ID of the menu to open.
+        :raises ValueError: If the menu ID is not valid.
+        """
+        if not MENU_ID.match(menu_id):
+            raise ValueError(f"Invalid menu ID {menu_id!r}")
+        self.menu_id = menu_id
+
+    def data(self, source: str) -> bytes:
+        """
+        Returns the callback data of the link, carrying the menu it is shown in.
+
+        :param source: The ID of the menu holding the button.
+        :raises ValueError: If the data exceeds Telegram's callback data limit.
+        """
+        data = f"{MENU_ROUTE_PREFIX}:{self.menu_id}:{source}".encode()
+        if len(data) > CALLBACK_DATA_LIMIT:
+            raise ValueError(
+                f"Link from menu {source!r} to {self.menu_id!r} needs {len(data)} bytes "
+                f"of callback data, Telegram accepts {CALLBACK_DATA_LIMIT}"
+            )
+        return data
+
+
+class Menu:
+    """
+    A menu declared once and rendered from its cached markup.
+
+    Attributes:
+        menu_id (str): Unique identifier of the menu.
+        title (str): Message text shown with the keyboard.
+        buttons (list[tuple[str, Any]]): Button labels and callback data or `MenuLink`.
+        cols (int): Buttons per row.
+        back (bool): Whether a back button is added as the last row.
+    """
+
+    __slots__ = ("menu_id", "title", "buttons", "cols", "back", "_markup")
+
+    def __init__(self, menu_id: str, title: str, buttons: list[tuple[str, Any]],
+                 cols: int = 2, back: bool = True) -> None:
+        self.menu_id = menu_id
+        self.title = title
+        self.buttons = buttons
+        self.cols = cols
+        self.back = back
+        self._markup = None
+
+    def build(self) -> Any:
+        """
+        Builds the menu markup. Links carry the ID of this menu, so the
+        navigation handler knows which menu to stack.
+
+        :return: The ready to send reply markup.
+        """
+        options = [
+            (label, data.data(self.menu_id) if isinstance(data, MenuLink) else data)
+            for label, data in self.buttons
+        ]
+        rows = build_inline_buttons(options, cols=self.cols)
+        if self.back:
+            rows += build_inline_buttons([BACK_BUTTON], cols=1)
+        return ButtonMethods.build_reply_markup(rows, inline_only=True)
+
+    @property
+    def markup(self) -> Any:
+        """The reply markup, built on first use and cached."""
+        if self._markup is None:
+            self._markup = self.build()
+        return self._markup
+
+
+class MenuRegistry:
+    """
+    Menus declared by the plugins, by ID.
+
+    Navigating between registered menus stacks only their IDs, which are
+    interned strings, so back navigation costs one reference per level.
+
+    Menus remember the module declaring them, so a plugin reloaded by the
+    plugin loader replaces its own menus.
+    """
+
+    def __init__(self) -> None:
+        self._menus: dict[str, Menu] = {}
+        # Module that declared each menu, by ID
+        self._owners: dict[str, str | None] = {}
+
+    @staticmethod
+    def _caller() -> str | None:
+        return sys._getframe(2).f_globals.get("__name__")
+
+    def forget(self, module: str) -> dict[str, Menu]:
+        """
+        Removes the menus declared by a module, before it is reloaded.
+
+        :param module: The module path.
+        :return: The removed menus, for `restore`.
+        """
+        menus = {menu_id: menu for menu_id, menu in self._menus.items() if self._owners.get(menu_id) == module}
+        for menu_id in menus:
+            del self._menus[menu_id], self._owners[menu_id]
+        return menus
+
+    def restore(self, module: str, menus: dict[str, Menu]) -> None:
+        """
+        Puts back the menus removed by `forget`, when the module failed to reload.
+
+        :param module: The module path.
+        :param menus: The value returned by `forget`.
+        """
+        for menu_id, menu in menus.items():
+            self._menus.setdefault(menu_id, menu)
+            self._owners.setdefault(menu_id, module)
+
+    def __getitem__(self, menu_id: str) -> Menu:
+        return self._menus[menu_id]
+
+    def get(self, menu_id: str, default: Menu | None = None) -> Menu | None:
+        return self._menus.get(menu_id, default)
+
+    def __contains__(self, menu_id: object) -> bool:
+        return menu_id in self._menus
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._menus)
+
+    def __len__(self) -> int:
+        return len(self._menus)
+
+    def menu(self, menu_id: str, title: str, buttons: list[tuple[str, Any]],
+             cols: int = 2, back: bool = True) -> Menu:
+        """
+        Declares a menu. Declaring an existing ID replaces that menu.
+
+        :param menu_id: Unique identifier, made of letters, digits, "_" and "-".
+        :param title: Message text shown with the keyboard.
+        :param buttons: Button labels with their callback data, or `link(...)`
+            to open another menu.
+        :param cols: Buttons per row.
+        :param back: Whether to add a back button as the last row.
+        :return: The declared menu.
+        :raises ValueError: If the menu ID is not valid, or the callback data
+            of a link does not fit in Telegram's limit.
+        """
+        if not MENU_ID.match(menu_id):
+            raise ValueError(f"Invalid menu ID {menu_id!r}")
+        for _, data in buttons:
+            if isinstance(data, MenuLink):
+                data.data(menu_id)
+        module = self._caller()
+        if menu_id in self._menus and self._owners.get(menu_id) != module:
+            logging.warning(f"Menu {menu_id!r} declared twice, replacing it")
+
+        menu = self._menus[menu_id] = Menu(menu_id, title, buttons, cols, back)
+        self._owners[menu_id] = module
+        return menu
+
+    @staticmethod
+    def link(menu_id: str) -> MenuLink:
+        """
+        Returns a button target opening the given menu.
+
+        :param menu_id: The ID of the menu to open.
+        :raises ValueError: If the menu ID is not valid.
+        """
+        return MenuLink(menu_id)
+
+
+menu_registry = MenuRegistry()
+
+
+async def show_menu(event: Any, menu_id: str, source: str | None = None) -> Any:
+    """
+    Shows a registered menu, editing the message of a callback query
+    or sending a new message otherwise.
+
+    :param event: The Telegram event instance.
+    :param menu_id: The ID of the menu to show.
+    :param source: The ID of the menu being left, stacked for back navigation.
+    :return: The edited or sent message.
+    """
+    menu = menu_registry[menu_id]
+    if source is not None:
+        get_user_driver(event)[MENU_KEY].append(source)
+
+    if isinstance(event, CallbackQuery.Event):
+        return await event.edit(menu.title, buttons=menu.markup)
+    return await event.respond(menu.title, buttons=menu.markup)
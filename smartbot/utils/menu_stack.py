@@ -0,0 +1,134 @@
+import sys
+import weakref
+from typing import Any, Iterable, Iterator
+
+from telethon.extensions import BinaryReader
+
+from smartbot.utils.context import TrackedList
+
+# Interned menus by (text, serialized markup, compact), shared by every stack
+_interned: "weakref.WeakValueDictionary[tuple, MenuEntry]" = weakref.WeakValueDictionary()
+
+
+class MenuEntry:
+    """
+    A menu saved for back navigation: its text and reply markup.
+
+    Entries are immutable and interned, so a menu visited by many users is
+    stored once. A compact entry keeps the markup serialized and rebuilds
+    it on access, trading a little CPU for memory.
+
+    Unpacks like the `(text, markup)` tuples it replaces.
+    """
+
+    __slots__ = ("text", "_markup", "_data", "__weakref__")
+
+    def __init__(self, text: str, markup: Any = None, data: bytes | None = None) -> None:
+        self.text = text
+        self._markup = markup
+        self._data = data
+
+    @property
+    def markup(self) -> Any:
+        """The reply markup, deserialized on every access for compact entries."""
+        if self._markup is None and self._data:
+            return BinaryReader(self._data).tgread_object()
+        return self._markup
+
+    def __iter__(self) -> Iterator[Any]:
+        yield self.text
+        yield self.markup
+
+    def __reduce__(self) -> tuple:
+        data = self._data if self._data is not None else _serialize(self._markup)
+        return _restore_menu, (self.text, data, self._data is not None)
+
+    def __repr__(self) -> str:
+        return f"MenuEntry({self.text[:30]!r})"
+
+
+def _serialize(markup: Any) -> bytes:
+    return bytes(markup) if markup is not None else b""
+
+
+def _restore_menu(text: str, data: bytes, compact: bool) -> MenuEntry:
+    """
+    Rebuilds an interned entry from its pickled form.
+    """
+    key = (text, data, compact)
+    entry = _interned.get(key)
+    if entry is None:
+        markup = None if compact or not data else BinaryReader(data).tgread_object()
+        entry = _interned[key] = MenuEntry(text, markup, data if compact else None)
+    return entry
+
+
+def intern_menu(text: str, markup: Any = None, compact: bool = False) -> MenuEntry:
+    """
+    Returns the shared entry for a menu, creating it on first use.
+
+    :param text: The menu message text.
+    :param markup: The menu reply markup, if any.
+    :param compact: Whether to keep the markup serialized.
+    :return: The interned menu entry.
+    """
+    data = _serialize(markup)
+    key = (text, data, compact)
+    entry = _interned.get(key)
+    if entry is None:
+        entry = _interned[key] = MenuEntry(text, None if compact else markup, data if compact else None)
+    return entry
+
+
+class MenuStack(TrackedList):
+    """
+    Bounded stack of previously shown menus.
+
+    Pushed `(text, markup)` pairs are interned, and once `max_depth`
+    menus are stacked the oldest one is dropped. IDs of menus declared in
+    the menu registry are stacked as interned strings.
+    """
+
+    __slots__ = ("max_depth", "compact")
+
+    def __init__(self, entries: Iterable[Any] = (), max_depth: int = 20, compact: bool = False) -> None:
+        """
+        Initializes the stack.
+
+        :param entries: Initial `(text, markup)` pairs or menu entries, oldest first.
+        :param max_depth: Maximum number of menus kept.
+        :param compact: Whether to keep the markups serialized.
+        """
+        super().__init__()
+        self.max_depth = max_depth
+        self.compact = compact
+        for entry in entries:
+            self.append(entry)
+
+    def append(self, entry: Any) -> None:
+        """
+        Pushes a menu, dropping the oldest one over `max_depth`.
+
+        :param entry: A `(text, markup)` pair, a menu entry or a registered menu ID.
+        """
+        if isinstance(entry, str):
+            entry = sys.intern(entry)
+        elif not isinstance(entry, MenuEntry):
+            text, markup = entry
+            entry = intern_menu(text, markup, self.compact)
+        super().append(entry)
+        if len(self) > self.max_depth:
+            del self[:len(self) - self.max_depth]
+
+    def extend(self, entries: Iterable[Any]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def push(self, text: str, markup: Any = None) -> None:
+        """
+        Pushes a menu, see `append`.
+        """
+        self.append((text, markup))
+
+    def __reduce__(self) -> tuple:
+        return MenuStack, (list(self), self.max_depth, self.compact)
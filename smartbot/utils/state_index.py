@@ -0,0 +1,96 @@
+from typing import Hashable, Iterable, Iterator
+
+
+class StateIndex:
+    """
+    Reverse index of conversation states to the users in them.
+
+    Each user is kept in the set of its current state, so listing the users
+    in a state costs O(k) in the matching users and counting them O(1),
+    instead of a scan of every session.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty state index.
+        """
+
+        self._users: dict[Hashable, set[int]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._users.values())
+
+    def add(self, user_id: int, state: Hashable) -> None:
+        """
+        Indexes a user under a state.
+
+        :param user_id: Telegram user ID.
+        :param state: The current state of the user.
+        """
+        users = self._users.get(state)
+        if users is None:
+            users = self._users[state] = set()
+        users.add(user_id)
+
+    def move(self, user_id: int, source: Hashable, target: Hashable) -> None:
+        """
+        Moves a user between states.
+
+        :param user_id: Telegram user ID.
+        :param source: The state the user was indexed under.
+        :param target: The new state of the user.
+        """
+        if source == target and user_id in self._users.get(source, ()):
+            return
+        self.discard(user_id, source)
+        self.add(user_id, target)
+
+    def discard(self, user_id: int, state: Hashable) -> None:
+        """
+        Removes a user from a state, if it is indexed there.
+
+        :param user_id: Telegram user ID.
+        :param state: The state the user was indexed under.
+        """
+        users = self._users.get(state)
+        if users is None:
+            return
+        users.discard(user_id)
+        if not users:
+            del self._users[state]
+
+    def users(self, state: Hashable) -> Iterator[int]:
+        """
+        Iterates over the users in a state.
+
+        :param state: The state to look up.
+        :return: An iterator of user IDs.
+        """
+        return iter(self._users.get(state, ()))
+
+    def count(self, state: Hashable) -> int:
+        """
+        Returns the number of users in a state.
+
+        :param state: The state to look up.
+        """
+        return len(self._users.get(state, ()))
+
+    def counts(self) -> dict[Hashable, int]:
+        """
+        Returns the number of users in each state with at least one user.
+        """
+        return {state: len(users) for state, users in self._users.items()}
+
+    @classmethod
+    def build(cls, entries: Iterable[tuple[int, Hashable]]) -> "StateIndex":
+        """
+        Builds an index from (user ID, state) pairs.
+
+        :param entries: The users and their current states.
+        :return: The new index.
+        """
+        index = cls()
+        for user_id, state in entries:
+            index.add(user_id, state)
+        return index
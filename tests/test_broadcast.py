@@ -0,0 +1,67 @@
+import asyncio
+import json
+from collections import Counter
+
+from smartbot.broadcast import Broadcaster
+
+
+class Store:
+    def __init__(self, user_ids):
+        self.user_ids = sorted(user_ids)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def page_user_ids(self, after, limit):
+        return [user_id for user_id in self.user_ids if after is None or user_id > after][:limit]
+
+
+class BroadcastClient:
+    admin_ids = []
+
+    def __init__(self, user_ids):
+        self.user_sessions = Store(user_ids)
+        self.deliveries = Counter()
+        self.halfway = asyncio.Event()
+
+    async def flush_sessions(self):
+        return 0
+
+    async def send_message(self, user_id, message, priority=None):
+        # Sends complete out of order, some users cannot be reached
+        await asyncio.sleep(0.001 * (user_id % 4))
+        if user_id % 7 == 0:
+            raise ValueError("blocked")
+        self.deliveries[user_id] += 1
+        if sum(self.deliveries.values()) >= 23:
+            self.halfway.set()
+
+
+def test_resumed_broadcast_counts_every_user_once(tmp_path):
+    path = str(tmp_path / "broadcast.json")
+    user_ids = range(1, 61)
+
+    async def scenario():
+        client = BroadcastClient(user_ids)
+        broadcaster = Broadcaster(client, path, concurrency=6, page_size=10)
+        await broadcaster.start("hello")
+        await client.halfway.wait()
+        await broadcaster.stop()
+
+        with open(path) as f:
+            checkpoint = json.load(f)
+        assert checkpoint["status"] == "running"
+        handled = [user_id for user_id in user_ids if user_id <= checkpoint["cursor"]]
+        assert checkpoint["failed"] == sum(user_id % 7 == 0 for user_id in handled)
+        assert checkpoint["sent"] == len(handled) - checkpoint["failed"]
+
+        resumed = Broadcaster(client, path, concurrency=6, page_size=10)
+        job = await resumed.resume()
+        await resumed._task
+        return client, job
+
+    client, job = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert job.status == "done"
+    assert job.failed == 8
+    assert job.sent == 52
+    assert set(client.deliveries) == {user_id for user_id in user_ids if user_id % 7}
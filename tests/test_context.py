@@ -0,0 +1,38 @@
+import pickle
+from enum import Enum
+
+from smartbot.bot import UserSession
+from smartbot.utils.context import DELETE_KEY, MENU_KEY, UserDriver
+
+
+class State(Enum):
+    IDLE = 0
+
+
+def test_reading_a_session_does_not_mark_it_modified():
+    session = UserSession(1, State)
+    changes = []
+    driver = UserDriver(session, changes.append)
+
+    menu_stack = driver[MENU_KEY]
+    delete_queue = driver[DELETE_KEY]
+    repr(driver)
+    assert changes == []
+
+    menu_stack.append(("main", 0))
+    delete_queue.append(42)
+    delete_queue.pop()
+    assert changes == [session] * 3
+
+
+def test_tracked_containers_pickle_without_their_callback():
+    session = UserSession(1, State)
+    driver = UserDriver(session, lambda _: None)
+    driver[MENU_KEY].append("main")
+    driver[DELETE_KEY].append(42)
+
+    restored = pickle.loads(pickle.dumps(session))
+    assert list(restored.menu_stack) == ["main"]
+    assert restored.menu_stack.on_change is None
+    assert restored.delete_queue == [42]
+    assert restored.delete_queue.on_change is None
@@ -0,0 +1,71 @@
+import time
+import asyncio
+
+from telethon.errors import FloodWaitError
+from telethon.sessions import MemorySession
+from telethon.tl import functions, types
+
+from benchmarks.load_harness import FakeTransportClient
+from smartbot.bot import Client
+from smartbot.outbound import OutboundLimiter
+
+HOT_CHAT = 1
+
+
+class FloodingClient(FakeTransportClient):
+    """
+    Answers locally like the load harness, behind the real `Client.__call__`,
+    with Telethon's handling of the FloodWait of the first message to HOT_CHAT.
+    """
+
+    __call__ = Client.__call__
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flooded = False
+        self.slept = 0
+
+    async def _call(self, sender, request, ordered=False, flood_sleep_threshold=None):
+        if flood_sleep_threshold is None:
+            flood_sleep_threshold = self.flood_sleep_threshold
+        peer = getattr(request, "peer", None)
+        if isinstance(request, functions.messages.SendMessageRequest) and \
+                getattr(peer, "user_id", None) == HOT_CHAT and not self.flooded:
+            self.flooded = True
+            if 1 > flood_sleep_threshold:
+                raise FloodWaitError(request, capture=1)
+            # What Telethon does for waits under the threshold (60 s by default)
+            self.slept += 1
+            await asyncio.sleep(1)
+        return self._answer(request)
+
+
+def test_floodwait_under_the_sleep_threshold_reaches_the_limiter():
+    async def scenario():
+        users = {
+            user_id: types.User(id=user_id, access_hash=user_id, first_name=f"User {user_id}")
+            for user_id in range(1, 4)
+        }
+        limiter = OutboundLimiter(global_rate=1e9, chat_rate=1e9, chat_burst=1e9)
+        client = FloodingClient(
+            0, users, session=MemorySession(), api_id=1, api_hash="0" * 32, outbound_limiter=limiter
+        )
+        client._mb_entity_cache.extend(list(users.values()), [])
+        assert client.flood_sleep_threshold >= 1
+
+        started = time.monotonic()
+        done = {}
+
+        async def send(chat_id):
+            await client.send_message(chat_id, "oi")
+            done[chat_id] = time.monotonic() - started
+
+        await asyncio.gather(send(HOT_CHAT), send(2), send(3))
+        return client, limiter, done
+
+    client, limiter, done = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert client.slept == 0
+    assert limiter.flood_waits == 1
+    assert limiter.stats()["sent"] == 3
+    assert done[HOT_CHAT] >= 1
+    assert done[2] < 0.5 and done[3] < 0.5
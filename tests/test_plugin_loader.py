@@ -0,0 +1,86 @@
+import sys
+
+from smartbot.fsm import conversation_flow
+from smartbot.plugin_loader import PluginLoader
+from smartbot.utils.menu_registry import menu_registry
+
+PLUGIN = '''\
+import threading
+from smartbot.utils.handler import ClientHandler
+from ordered import loaded
+
+client = ClientHandler()
+loaded.append((__name__, threading.current_thread().name))
+'''
+
+
+class NullClient:
+    session = "test"
+
+    def add_event_handler(self, callback, event=None):
+        pass
+
+
+def test_threaded_load_runs_module_bodies_in_order(tmp_path, monkeypatch):
+    package = tmp_path / "ordered_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (tmp_path / "ordered.py").write_text("loaded = []\n")
+    names = [f"plugin{index:02d}" for index in range(20)]
+    for name in names:
+        (package / f"{name}.py").write_text(PLUGIN)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        PluginLoader(NullClient(), dict(root="ordered_plugins", manifest=None, import_workers=8)).load_plugins()
+        loaded = sys.modules["ordered"].loaded
+        assert [module for module, _ in loaded] == [f"ordered_plugins.{name}" for name in names]
+        assert {thread for _, thread in loaded} == {"MainThread"}
+    finally:
+        for module in [module for module in sys.modules if module.startswith("ordered")]:
+            del sys.modules[module]
+
+
+MENU_PLUGIN = '''\
+from smartbot.fsm import conversation_flow
+from smartbot.utils.handler import ClientHandler
+from smartbot.utils.menu_registry import menu_registry
+
+client = ClientHandler()
+menu_registry.menu("reloaded_menu", "{title}", [("Voltar", b"reloaded_back")])
+conversation_flow.transition("IDLE", "IDLE", on="/reloaded_{title}")
+'''
+
+
+def test_reload_replaces_the_module_menus(tmp_path, monkeypatch, caplog):
+    package = tmp_path / "menu_plugins"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    plugin = package / "menus.py"
+    plugin.write_text(MENU_PLUGIN.format(title="first"))
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        loader = PluginLoader(NullClient(), dict(root="menu_plugins", manifest=None))
+        loader.load_plugins()
+        assert menu_registry["reloaded_menu"].title == "first"
+
+        plugin.write_text(MENU_PLUGIN.format(title="second!"))
+        loader.reload_module("menu_plugins.menus")
+        assert menu_registry["reloaded_menu"].title == "second!"
+        assert "declared twice" not in caplog.text
+
+        plugin.write_text("raise RuntimeError('broken')\n")
+        loader.reload_module("menu_plugins.menus")
+        assert menu_registry["reloaded_menu"].title == "second!"
+
+        plugin.unlink()
+        loader.reload_module("menu_plugins.menus")
+        assert "reloaded_menu" not in menu_registry
+    finally:
+        menu_registry.forget("menu_plugins.menus")
+        conversation_flow.forget("menu_plugins.menus")
+        for module in [module for module in sys.modules if module.startswith("menu_plugins")]:
+            del sys.modules[module]
@@ -0,0 +1,40 @@
+from smartbot.plugin_manifest import scan_source
+
+HEADER = b"""
+import logging
+from telethon import events
+from smartbot.utils.handler import ClientHandler
+
+logging.basicConfig(level=logging.INFO)
+
+client: ClientHandler = ClientHandler()
+TIMEOUT = 120
+"""
+
+HANDLER = b"""
+
+@client.on(events.NewMessage(pattern="/ping"))
+async def handle_ping(event):
+    \"\"\"Answers /ping.\"\"\"
+    await event.reply("pong")
+"""
+
+
+def test_module_with_only_handlers_is_described():
+    specs = scan_source(HEADER + HANDLER)
+    assert [(spec.name, spec.pattern) for spec in specs] == [("handle_ping", "/ping")]
+
+
+def test_menu_declaration_needs_an_import():
+    source = HEADER + b'menu_registry.menu("home", "Home", [("A", b"a")])\n' + HANDLER
+    assert scan_source(source) is None
+
+
+def test_flow_declaration_needs_an_import():
+    source = HEADER + HANDLER + b'conversation_flow.state("WAITING", timeout=TIMEOUT)\n'
+    assert scan_source(source) is None
+
+
+def test_computed_assignment_needs_an_import():
+    source = HEADER + b"registry = register_everything()\n" + HANDLER
+    assert scan_source(source) is None
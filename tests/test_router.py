@@ -0,0 +1,82 @@
+from telethon import events
+
+from smartbot.router import CallbackRoute, CallbackRouter, CommandRouter
+
+
+class FakeClient:
+    def __init__(self):
+        self.handlers = []
+
+    def add_event_handler(self, callback, event):
+        self.handlers.append((callback, event))
+
+
+async def first(event):
+    pass
+
+
+async def second(event):
+    pass
+
+
+async def third(event):
+    pass
+
+
+def test_patterns_sharing_a_group_name_are_combined():
+    router = CommandRouter(FakeClient())
+    assert router.add(first, events.NewMessage(pattern=r"(?P<x>\d+) apples"))
+    assert router.add(second, events.NewMessage(pattern=r"(?P<x>\d+) pears"))
+    assert router.add(third, events.NewMessage(pattern=r"pick (?P<x>\w+)"))
+
+    assert len(router.patterns) == 3
+    assert router._prefilter is not None and not router._unfiltered
+
+    matched = router.match("3 pears")
+    assert [callback for callback, _ in matched] == [second]
+    assert matched[0][1]["x"] == "3"
+    assert router.match("pick plums")[0][1]["x"] == "plums"
+    assert router.match("nothing here") == []
+
+
+def test_escaped_parenthesis_is_not_rewritten():
+    router = CommandRouter(FakeClient())
+    router.add(first, events.NewMessage(pattern=r"\(?P<x>"))
+    router.add(second, events.NewMessage(pattern=r"[(?P<y>]+z"))
+
+    assert [callback for callback, _ in router.match("(P<x>")] == [first]
+    assert [callback for callback, _ in router.match("P<x>")] == [first]
+    assert [callback for callback, _ in router.match("<<z")] == [second]
+
+
+def test_removed_pattern_is_recompiled():
+    router = CommandRouter(FakeClient())
+    router.add(first, events.NewMessage(pattern=r"(?P<x>a)"))
+    router.add(second, events.NewMessage(pattern=r"(?P<x>b)"))
+
+    assert router.remove(first)
+    assert router.match("a") == []
+    assert [callback for callback, _ in router.match("b")] == [second]
+
+
+def test_trie_and_route_regex_agree_on_parameters():
+    routes = [CallbackRoute("grade:<id:int>"), CallbackRoute("page:<n:int>:<name>"), CallbackRoute("menu:*")]
+    router = CallbackRouter(FakeClient())
+    for route in routes:
+        router.add(first, route)
+
+    samples = [
+        b"grade:1", b"grade:-12", b"grade:007", b"grade: 1", b"grade:+1", b"grade:1_0",
+        b"grade:1\n", b"grade:", b"grade:1:2", b"page:3:news", b"page:+3:news",
+        b"page:3:", b"menu:", b"menu:a:b\n", b"menu",
+    ]
+    for data in samples:
+        by_regex = [route for route in routes if route.match(data)]
+        by_trie = router.match(data)
+        assert len(by_trie) == len(by_regex), data
+        for (_, params), route in zip(by_trie, by_regex):
+            groups = route.match(data).groupdict()
+            assert params == {
+                name: int(value) if name in ("id", "n") else value.decode()
+                for name, value in groups.items()
+            }, data
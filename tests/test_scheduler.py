@@ -0,0 +1,101 @@
+import asyncio
+from enum import Enum
+
+from telethon import events
+from telethon.sessions import MemorySession
+from telethon.tl import types
+
+from benchmarks.load_harness import FakeTransportClient, make_update
+from smartbot.scheduler import UpdateScheduler
+
+
+class State(Enum):
+    IDLE = "idle"
+    WAITING_NAME = "waiting_name"
+
+
+def test_released_job_frees_its_worker_and_lane():
+    async def scenario():
+        scheduler = UpdateScheduler(max_workers=1)
+        gate = asyncio.Event()
+        order = []
+
+        async def waiting(name):
+            order.append(f"{name} asks")
+            assert scheduler.release()
+            await gate.wait()
+            order.append(f"{name} answered")
+
+        async def quick(name):
+            order.append(name)
+
+        scheduler.submit(1, waiting, "first")
+        scheduler.submit(1, quick, "first cancels")
+        scheduler.submit(2, quick, "second")
+        while scheduler.pending:
+            await asyncio.sleep(0)
+        assert scheduler.stats()["detached"] == 1
+
+        gate.set()
+        while scheduler.detached:
+            await asyncio.sleep(0)
+        await scheduler.close()
+        return order
+
+    order = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert order.index("first cancels") < order.index("first answered")
+    assert order.index("second") < order.index("first answered")
+
+
+def test_more_waiting_users_than_workers():
+    async def scenario():
+        users = {
+            user_id: types.User(id=user_id, access_hash=user_id, first_name=f"User {user_id}")
+            for user_id in range(1, 9)
+        }
+        client = FakeTransportClient(
+            0, users, session=MemorySession(), api_id=1, api_hash="0" * 32,
+            conversation_state=State, update_workers=2
+        )
+        client._mb_entity_cache.extend(list(users.values()), [])
+        answers, pressed = {}, []
+
+        async def ask(event):
+            answer = await event.client.ask_user(
+                event.sender_id, "Nome?", State.WAITING_NAME, wait=True, timeout=5
+            )
+            answers[event.sender_id] = answer.message
+
+        async def cancel(event):
+            pressed.append(event.sender_id)
+
+        client.add_event_handler(ask, events.NewMessage(pattern="/ask"))
+        client.add_event_handler(cancel, events.CallbackQuery(data=b"cancel"))
+
+        update_id = 0
+        for user in users.values():
+            update_id += 1
+            await client._dispatch_update(make_update(user, "/ask", update_id))
+        scheduler = client.update_scheduler
+        while len(client._pending_answers) < len(users):
+            await asyncio.sleep(0.001)
+        assert scheduler.detached == len(users) > scheduler.max_workers
+
+        # Every worker is free: a waiting user's button press is still processed
+        update_id += 1
+        client.message_chats[update_id] = 1
+        await client._dispatch_update(make_update(users[1], b"cancel", update_id))
+        while scheduler.pending or scheduler.running:
+            await asyncio.sleep(0.001)
+        assert pressed == [1]
+
+        for user in users.values():
+            update_id += 1
+            await client._dispatch_update(make_update(user, f"name {user.id}", update_id))
+        while scheduler.detached:
+            await asyncio.sleep(0.001)
+        await scheduler.close()
+        return answers
+
+    answers = asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert answers == {user_id: f"name {user_id}" for user_id in range(1, 9)}
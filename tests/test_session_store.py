@@ -0,0 +1,48 @@
+import sqlite3
+
+from smartbot.session_store import SQLiteSessionStore
+
+
+class Session:
+    def __init__(self, user_id, value=None):
+        self.user_id = user_id
+        self.value = value
+
+
+def stored_ids(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT user_id FROM user_sessions")}
+
+
+def test_buffered_sessions_are_not_written_on_the_calling_thread(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, cache_size=2, batch_size=3)
+    requested = []
+    store.flush_requested = lambda: requested.append(store.pending)
+
+    for user_id in range(1, 6):
+        store[user_id] = Session(user_id, user_id * 10)
+
+    assert requested == [3, 4, 5]
+    assert stored_ids(path) == set()
+    # Evicted from the cache but not written yet, still readable
+    assert store[1].value == 10
+    assert 2 in store
+    assert list(store) == [1, 2, 3, 4, 5]
+    assert len(store) == 5
+
+    store.write_snapshot(store.snapshot(()))
+    assert store.pending == 0
+    assert stored_ids(path) == {1, 2, 3, 4, 5}
+    assert len(store) == 5
+    store.close()
+
+
+def test_store_without_owner_flushes_itself(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(path, cache_size=10, batch_size=2)
+    store[1] = Session(1)
+    assert stored_ids(path) == set()
+    store[2] = Session(2)
+    assert stored_ids(path) == {1, 2}
+    store.close()